@@ -0,0 +1,255 @@
+# Materialized aggregate cube answering the descriptive and weekly analyses by roll-up
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_cache import (
+    CACHE_DIR, cache_entry_path, drop_stale_entries, load_cached_flight_data, read_frame, write_frame_atomic
+)
+from fused_analysis import (
+    DELAY_COLUMNS, DESCRIBE_INDEX, DURATION_COLUMNS, build_group_table, finalize_sections, plan_aggregations,
+    print_analysis_results
+)
+from profiling import profiled
+from sketches import ValueHistogram
+from time_series import DAILY_MEAN_COLUMNS, day_of_week_analysis, finalize_daily_partials
+
+# Bump when the cube layout changes so stale files are rebuilt
+CUBE_VERSION = 1
+
+CUBE_KEYS = ['origin', 'month', 'day_of_week', 'fl_date', 'cancelled']
+
+# Every column a descriptive section or the daily time series averages or totals
+CUBE_MEASURES = list(dict.fromkeys(DAILY_MEAN_COLUMNS + DURATION_COLUMNS + DELAY_COLUMNS + ['dep_time']))
+
+DESCRIBED_COLUMNS = list(dict.fromkeys(DURATION_COLUMNS + DELAY_COLUMNS))
+
+class AggregateCube:
+    """
+    Count, sum and sum-of-squares aggregates over origin × month ×
+    day_of_week × fl_date × cancelled.
+
+    Built once from the preprocessed flights, the cube has one row per
+    occurring key combination (tens of thousands for a year, versus
+    millions of flights). Every perform_complete_analysis section is a
+    roll-up of it via fused_analysis.finalize_sections, and the daily time
+    series behind day_of_week_analysis is a roll-up to fl_date, so repeated
+    reports take milliseconds instead of passes over the rows.
+
+    The describe() sections get count, mean and std from the cube. Min,
+    quartiles and max cannot be rolled up from sums; they come from
+    ValueHistograms over the full data, so they are only reported for
+    unfiltered queries and are NaN for filtered ones.
+    """
+
+    def __init__(self, table, histograms=None, resolution=0.01):
+        self.table = table
+        self.histograms = histograms or {}
+        self.resolution = resolution
+
+    @classmethod
+    @profiled('build_aggregate_cube')
+    def build(cls, df, resolution=0.01):
+        """
+        Aggregate preprocessed flights into a cube.
+
+        Args:
+            df (pd.DataFrame): Preprocessed flight dataset
+            resolution (float): ValueHistogram resolution for the quartiles
+
+        Returns:
+            AggregateCube: The cube
+        """
+        measures = [col for col in CUBE_MEASURES if col in df.columns]
+        plan = {'keys': CUBE_KEYS, 'measures': measures, 'squares': measures}
+        table = build_group_table(df, plan)
+        histograms = {col: ValueHistogram(resolution).update(df[col])
+                      for col in DESCRIBED_COLUMNS if col in df.columns}
+        return cls(table, histograms, resolution)
+
+    def save(self, path):
+        """
+        Persist the cube (Parquet or pickle, plus a JSON sidecar of histograms).
+
+        Args:
+            path (str): Cube file path
+
+        Returns:
+            Path: The cube file written
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_frame_atomic(self.table, path)
+        sidecar = {
+            'version': CUBE_VERSION,
+            'resolution': self.resolution,
+            'histograms': {col: {'keys': h.counts.index.tolist(), 'counts': h.counts.tolist()}
+                           for col, h in self.histograms.items()}
+        }
+        _sidecar_path(path).write_text(json.dumps(sidecar))
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a cube written by save().
+
+        Args:
+            path (str): Cube file path
+
+        Returns:
+            AggregateCube: The cube
+        """
+        path = Path(path)
+        sidecar = json.loads(_sidecar_path(path).read_text())
+        if sidecar.get('version') != CUBE_VERSION:
+            raise ValueError(f"Cube {path} has version {sidecar.get('version')}, expected {CUBE_VERSION}")
+        histograms = {}
+        for col, stored in sidecar['histograms'].items():
+            histogram = ValueHistogram(sidecar['resolution'])
+            histogram.counts = pd.Series(stored['counts'], index=stored['keys'], dtype='int64')
+            histograms[col] = histogram
+        return cls(read_frame(path), histograms, sidecar['resolution'])
+
+    def slice(self, origins=None, start=None, end=None, months=None):
+        """
+        Cube cells matching the filters.
+
+        Args:
+            origins (list): Origin airport codes; None for all
+            start: First fl_date to include; None for open
+            end: Last fl_date to include; None for open
+            months (list): Month numbers (1-12); None for all
+
+        Returns:
+            pd.DataFrame: The matching rows of the cube table
+        """
+        index = self.table.index
+        keep = np.ones(len(self.table), dtype=bool)
+        if origins is not None:
+            keep &= index.get_level_values('origin').isin(list(origins))
+        if start is not None or end is not None:
+            dates = index.get_level_values('fl_date')
+            if start is not None:
+                keep &= dates >= pd.Timestamp(start)
+            if end is not None:
+                keep &= dates <= pd.Timestamp(end)
+        if months is not None:
+            keep &= index.get_level_values('month').isin(list(months))
+        return self.table if keep.all() else self.table[keep]
+
+    def describe(self, table, filtered=False):
+        """
+        describe()-shaped statistics of the described columns from cube cells.
+
+        Args:
+            table (pd.DataFrame): Cube cells, e.g. from slice()
+            filtered (bool): The cells are a subset, so the full-data
+                histograms do not apply and min/quartiles/max are NaN
+
+        Returns:
+            pd.DataFrame: Same layout as ``df[columns].describe()``
+        """
+        stats = {}
+        columns = [col for col in DESCRIBED_COLUMNS if f'{col}_sum' in table.columns]
+        for col in columns:
+            n = table[f'{col}_count'].sum()
+            total, squares = table[f'{col}_sum'].sum(), table[f'{col}_sumsq'].sum()
+            mean = total / n if n else np.nan
+            std = np.sqrt(max(squares - total * mean, 0) / (n - 1)) if n > 1 else np.nan
+            histogram = self.histograms.get(col)
+            if filtered or histogram is None or histogram.count == 0:
+                low = quartiles = high = None
+            else:
+                keys = histogram.counts.index
+                low, high = keys.min() / histogram.scale, keys.max() / histogram.scale
+                quartiles = [histogram.quantile(q) for q in (0.25, 0.5, 0.75)]
+            stats[col] = [n, mean, std, low, *(quartiles or [None] * 3), high]
+        return pd.DataFrame(stats, index=DESCRIBE_INDEX, columns=columns, dtype='float64')
+
+    def analysis(self, sections=None, origins=None, start=None, end=None, months=None, verbose=False):
+        """
+        The perform_complete_analysis results, rolled up from the cube.
+
+        Args:
+            sections (list): Sections to compute; None computes all of them
+            origins, start, end, months: Filters, see slice
+            verbose (bool): Print the results like the individual analyses do
+
+        Returns:
+            dict: Dictionary containing the requested analysis results
+        """
+        filtered = any(value is not None for value in (origins, start, end, months))
+        table = self.slice(origins, start, end, months)
+        plan = plan_aggregations(sections, [col[:-4] for col in table.columns if col.endswith('_sum')])
+        describe_stats = self.describe(table, filtered) if plan['describe'] else None
+        results = finalize_sections(table, plan, describe_stats)
+        if verbose:
+            print_analysis_results(results)
+        return results
+
+    def time_series(self, origins=None, start=None, end=None, months=None):
+        """
+        The prepare_time_series_data table of the preprocessed flights.
+
+        Args:
+            origins, start, end, months: Filters, see slice
+
+        Returns:
+            pd.DataFrame: Daily aggregated time series data
+        """
+        daily = self.slice(origins, start, end, months).groupby(level='fl_date').sum()
+        partials = daily.rename(columns={'rows': 'origin_count', 'air_time_sumsq': 'air_time_sq_sum'})
+        return finalize_daily_partials(partials)
+
+    def day_of_week_analysis(self, **filters):
+        """day_of_week_analysis over time_series(); takes the slice filters."""
+        return day_of_week_analysis(self.time_series(**filters))
+
+def _sidecar_path(path):
+    return path.with_name(path.stem + '.cube.json')
+
+def load_cube(file_path='data/flight_data_2024.csv', cache_dir=CACHE_DIR, refresh=False, typed=False):
+    """
+    Load the cube for a source file, building and persisting it on first use.
+
+    The cube is stored next to the preprocessed cache entry and shares its
+    key, so a changed source file or imputation setting rebuilds it.
+
+    Args:
+        file_path (str): Path to the CSV file
+        cache_dir (str): Directory holding cache entries
+        refresh (bool): Rebuild even when a cube exists
+        typed (bool): Use the typed loading mode on a rebuild
+
+    Returns:
+        AggregateCube: The cube
+    """
+    _, entry = cache_entry_path(file_path, cache_dir=cache_dir, typed=typed)
+    path = entry.with_name(f'{entry.stem}-cube{entry.suffix}')
+    if path.exists() and not refresh:
+        try:
+            return AggregateCube.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f'Rebuilding cube {path}: {e}')
+
+    df = load_cached_flight_data(file_path, cache_dir=cache_dir, typed=typed)
+    cube = AggregateCube.build(df)
+    try:
+        cube.save(path)
+    except OSError as e:
+        print(f'Warning: could not write cube {path}: {e}')
+        return cube
+
+    drop_stale_entries(entry, kind='-cube')
+    return cube
+
+# Main execution (only runs when script is executed directly)
+if __name__ == "__main__":
+    cube = load_cube('data/flight_data_2024.csv')
+    print(f"Cube cells: {len(cube.table):,}")
+    cube.analysis(verbose=True)
+    print(cube.day_of_week_analysis())
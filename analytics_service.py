@@ -0,0 +1,424 @@
+# Local HTTP service answering the analyses as JSON from a warm in-memory dataset
+
+import asyncio
+import json
+import math
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from aggregate_cube import AggregateCube
+from data_cache import load_cached_flight_data
+from data_preprocess import ANALYSIS_COLUMNS
+from descriptive_analysis import (
+    analyze_airport_performance, analyze_cancellations, analyze_delays, analyze_flight_duration_distance,
+    analyze_flights_by_airport, analyze_flights_by_time, analyze_monthly_delays, display_basic_stats,
+    perform_complete_analysis
+)
+from flight_index import FlightIndex
+from time_series import day_of_week_analysis, generate_seasonal_insights
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8050
+
+# Encoded responses kept in the LRU result cache
+CACHE_ENTRIES = 256
+
+# Descriptive endpoints run on an indexed view of the flights
+DESCRIPTIVE_ENDPOINTS = {
+    '/describe/basic-stats': display_basic_stats,
+    '/describe/flights-by-time': analyze_flights_by_time,
+    '/describe/flights-by-airport': analyze_flights_by_airport,
+    '/describe/cancellations': analyze_cancellations,
+    '/describe/duration-distance': analyze_flight_duration_distance,
+    '/describe/delays': analyze_delays,
+    '/describe/airport-performance': analyze_airport_performance,
+    '/describe/monthly-delays': analyze_monthly_delays,
+    '/describe/complete': lambda df, approximate=False, verbose=True: perform_complete_analysis(
+        df, fused=True, approximate=approximate, verbose=verbose),
+}
+
+# Endpoints whose describe() quartiles can be sketched with ?approximate=1
+APPROXIMATE_ENDPOINTS = {'/describe/duration-distance', '/describe/delays', '/describe/complete'}
+
+# Time-series endpoints run on the daily table rolled up from the aggregate cube
+TIME_SERIES_ENDPOINTS = {
+    '/time-series/daily': lambda ts_data: ts_data,
+    '/time-series/day-of-week': day_of_week_analysis,
+    # The insights only read the daily table, so no decomposition is run for them
+    '/time-series/insights': lambda ts_data: generate_seasonal_insights(ts_data, {}),
+}
+
+class ResultCache:
+    """Least-recently-used mapping of request keys to encoded responses."""
+
+    def __init__(self, max_entries=CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        body = self.entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key, body):
+        self.entries[key] = body
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+def to_jsonable(value):
+    """
+    Convert an analysis result into JSON-serializable Python objects.
+
+    DataFrames become ``{row: {column: value}}`` mappings, Series become
+    ``{label: value}``, numpy scalars become Python numbers, timestamps
+    become ISO strings and NaN becomes null.
+
+    Args:
+        value: Analysis result (DataFrame, Series, dict, scalar, ...)
+
+    Returns:
+        The JSON-serializable equivalent
+    """
+    if isinstance(value, pd.DataFrame):
+        return {_json_key(row): {_json_key(col): to_jsonable(item) for col, item in values.items()}
+                for row, values in value.to_dict('index').items()}
+    if isinstance(value, pd.Series):
+        return {_json_key(label): to_jsonable(item) for label, item in value.items()}
+    if isinstance(value, dict):
+        return {_json_key(key): to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(item) for item in value]
+    if isinstance(value, (pd.Timestamp, pd.Period)):
+        return str(value.date() if isinstance(value, pd.Timestamp) and value == value.normalize() else value)
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if value is pd.NaT or value is pd.NA:
+        return None
+    return value
+
+def _json_key(key):
+    if isinstance(key, tuple):
+        return '|'.join(str(to_jsonable(part)) for part in key)
+    return str(to_jsonable(key))
+
+def parse_filters(query):
+    """
+    Parse the filter parameters of a request's query string.
+
+    Args:
+        query (str): Query string, e.g. ``origins=ATL,DFW&start=2024-01-01&months=6,7``
+
+    Returns:
+        dict: 'origins' (sorted tuple), 'start' and 'end' (ISO dates),
+            'months' (sorted tuple of ints) and 'approximate' (bool); absent
+            filters are None
+
+    Raises:
+        ValueError: A parameter is unknown or malformed
+    """
+    params = parse_qs(query, keep_blank_values=False)
+    unknown = set(params) - {'origins', 'start', 'end', 'months', 'approximate'}
+    if unknown:
+        raise ValueError(f"Unknown parameters {sorted(unknown)}; expected origins, start, end, months, approximate")
+
+    def values(name):
+        return [part.strip() for value in params.get(name, []) for part in value.split(',') if part.strip()]
+
+    def date(name):
+        if name not in params:
+            return None
+        try:
+            return pd.Timestamp(params[name][-1]).date().isoformat()
+        except ValueError:
+            raise ValueError(f"{name} must be a date like 2024-01-31, got {params[name][-1]!r}") from None
+
+    filters = {
+        'origins': tuple(sorted({code.upper() for code in values('origins')})) or None,
+        'start': date('start'),
+        'end': date('end'),
+        'months': None,
+        'approximate': params.get('approximate', ['0'])[-1].lower() in ('1', 'true', 'yes'),
+    }
+    if 'months' in params:
+        try:
+            months = tuple(sorted({int(month) for month in values('months')}))
+        except ValueError:
+            raise ValueError("months must be month numbers, e.g. months=6,7,8") from None
+        if not months or not all(1 <= month <= 12 for month in months):
+            raise ValueError("months must be month numbers between 1 and 12")
+        filters['months'] = months
+    return filters
+
+class AnalyticsService:
+    """
+    Serves the descriptive and day-of-week analyses over HTTP from memory.
+
+    The preprocessed flights are loaded once. A FlightIndex answers the
+    origin/date/month filters of the descriptive endpoints by slicing, and
+    an AggregateCube built at startup rolls the daily time series up for
+    the time-series endpoints, so a filtered request costs milliseconds
+    rather than a pass over the data.
+
+    Requests are handled on an asyncio event loop. Analyses run on a small
+    thread pool, so cache hits, health checks and other requests are
+    answered while one computes, and identical requests in flight share one
+    computation. Encoded responses are kept in an LRU ResultCache; warm()
+    pre-computes the unfiltered endpoints so the first dashboard load is
+    already a cache hit.
+
+    Endpoints (GET, JSON):
+        /                         endpoint list
+        /health                   dataset size and cache statistics
+        /describe/<analysis>      see DESCRIPTIVE_ENDPOINTS
+        /time-series/<analysis>   see TIME_SERIES_ENDPOINTS
+
+    Every analysis endpoint takes ``origins``, ``start``, ``end`` and
+    ``months`` filters (see parse_filters); the describe() based ones also
+    take ``approximate=1``.
+    """
+
+    def __init__(self, df, cache_entries=CACHE_ENTRIES, threads=4):
+        """
+        Build the in-memory indexes.
+
+        Args:
+            df (pd.DataFrame): Preprocessed flight dataset
+            cache_entries (int): Responses kept in the LRU result cache
+            threads (int): Worker threads computing uncached results
+        """
+        self.rows = len(df)
+        self.index = FlightIndex(df)
+        self.cube = AggregateCube.build(df)
+        self.cache = ResultCache(cache_entries)
+        self.threads = threads
+        self._executor = None
+        self._pending = {}
+        self._started = time.time()
+
+    @classmethod
+    def from_file(cls, file_path='data/flight_data_2024.csv', typed=False, **kwargs):
+        """
+        Load the preprocessed flights through the preprocessing cache and build the service.
+
+        Args:
+            file_path (str): Path to the CSV file
+            typed (bool): Use the typed loading mode
+            **kwargs: Passed to AnalyticsService
+
+        Returns:
+            AnalyticsService: The service
+        """
+        return cls(load_cached_flight_data(file_path, typed=typed), **kwargs)
+
+    def endpoints(self):
+        """Paths of every analysis endpoint."""
+        return list(DESCRIPTIVE_ENDPOINTS) + list(TIME_SERIES_ENDPOINTS)
+
+    def compute(self, path, filters):
+        """
+        Run one endpoint's analysis synchronously.
+
+        Args:
+            path (str): Endpoint path, e.g. '/describe/delays'
+            filters (dict): Result of parse_filters
+
+        Returns:
+            The JSON-serializable analysis result
+
+        Raises:
+            LookupError: No flights match the filters
+        """
+        selection = {key: filters[key] for key in ('origins', 'start', 'end', 'months')}
+        if path in TIME_SERIES_ENDPOINTS:
+            ts_data = self.cube.time_series(**selection)
+            if ts_data.empty:
+                raise LookupError("No flights match the filters")
+            return to_jsonable(TIME_SERIES_ENDPOINTS[path](ts_data))
+
+        view = self.index.query(**selection, columns=ANALYSIS_COLUMNS['descriptive'])
+        if view.empty:
+            raise LookupError("No flights match the filters")
+        # The analyses run on worker threads, so they are told not to print rather than
+        # redirecting the process-wide sys.stdout
+        kwargs = {'verbose': False}
+        if filters['approximate'] and path in APPROXIMATE_ENDPOINTS:
+            kwargs['approximate'] = True
+        return to_jsonable(DESCRIPTIVE_ENDPOINTS[path](view, **kwargs))
+
+    def _encode(self, path, filters):
+        result = self.compute(path, filters)
+        return json.dumps({'endpoint': path, 'filters': filters, 'result': result}).encode()
+
+    def _executor_or_start(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.threads, thread_name_prefix='analytics-worker')
+        return self._executor
+
+    async def respond(self, target):
+        """
+        Answer one request target.
+
+        Args:
+            target (str): Request path and query string
+
+        Returns:
+            tuple: (HTTPStatus, JSON body bytes)
+        """
+        url = urlsplit(target)
+        path = url.path.rstrip('/') or '/'
+        if path == '/':
+            return HTTPStatus.OK, json.dumps({'endpoints': self.endpoints()}).encode()
+        if path == '/health':
+            return HTTPStatus.OK, json.dumps({
+                'rows': self.rows,
+                'uptime_seconds': round(time.time() - self._started, 1),
+                'cache_entries': len(self.cache),
+                'cache_hits': self.cache.hits,
+                'cache_misses': self.cache.misses,
+            }).encode()
+        if path not in DESCRIPTIVE_ENDPOINTS and path not in TIME_SERIES_ENDPOINTS:
+            return HTTPStatus.NOT_FOUND, _error(f"Unknown endpoint {path}; see / for the list")
+        try:
+            filters = parse_filters(url.query)
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, _error(e)
+
+        key = (path, *filters.values())
+        body = self.cache.get(key)
+        if body is not None:
+            return HTTPStatus.OK, body
+
+        # Identical requests arriving while this one computes await the same future
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor_or_start(), self._encode, path, filters)
+            self._pending[key] = future
+            future.add_done_callback(lambda done: self._finish(key, done))
+        try:
+            return HTTPStatus.OK, await asyncio.shield(future)
+        except LookupError as e:
+            return HTTPStatus.NOT_FOUND, _error(e)
+        except Exception as e:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, _error(f"{type(e).__name__}: {e}")
+
+    def _finish(self, key, future):
+        self._pending.pop(key, None)
+        if not future.cancelled() and future.exception() is None:
+            self.cache.put(key, future.result())
+
+    async def warm(self):
+        """Pre-compute every unfiltered endpoint into the result cache."""
+        for path in self.endpoints():
+            await self.respond(path)
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                if headers.get('content-length', '0').isdigit() and int(headers.get('content-length', '0')):
+                    await reader.readexactly(int(headers['content-length']))
+
+                started = time.perf_counter()
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    status, body = HTTPStatus.BAD_REQUEST, _error('Malformed request line')
+                elif parts[0] not in ('GET', 'HEAD'):
+                    status, body = HTTPStatus.METHOD_NOT_ALLOWED, _error(f'{parts[0]} is not supported; use GET')
+                else:
+                    status, body = await self.respond(parts[1])
+                elapsed_ms = (time.perf_counter() - started) * 1000
+
+                keep_alive = (len(parts) == 3 and parts[2] == 'HTTP/1.1'
+                              and headers.get('connection', '').lower() != 'close')
+                head = (f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+                        'Content-Type: application/json\r\n'
+                        f'Content-Length: {len(body)}\r\n'
+                        f'Server-Timing: app;dur={elapsed_ms:.1f}\r\n'
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+                writer.write(head.encode('latin-1') + (body if parts[:1] != ['HEAD'] else b''))
+                await writer.drain()
+                print(f"{' '.join(parts[:2])} -> {status.value} ({elapsed_ms:.1f} ms)")
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, warm=True):
+        """
+        Serve requests until cancelled.
+
+        Args:
+            host (str): Interface to bind
+            port (int): TCP port
+            warm (bool): Pre-compute the unfiltered endpoints before accepting requests
+        """
+        try:
+            if warm:
+                started = time.perf_counter()
+                await self.warm()
+                print(f"Warmed {len(self.cache)} endpoints in {time.perf_counter() - started:.1f}s")
+            server = await asyncio.start_server(self._handle_connection, host, port)
+            print(f"Serving {self.rows:,} flights on http://{host}:{port}/")
+            async with server:
+                await server.serve_forever()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+def _error(message):
+    return json.dumps({'error': str(message)}).encode()
+
+def run_service(file_path='data/flight_data_2024.csv', host=DEFAULT_HOST, port=DEFAULT_PORT, typed=False,
+                cache_entries=CACHE_ENTRIES, threads=4, warm=True):
+    """
+    Load the dataset and serve it until interrupted (Ctrl+C).
+
+    Args:
+        file_path (str): Path to the CSV file
+        host (str): Interface to bind
+        port (int): TCP port
+        typed (bool): Use the typed loading mode
+        cache_entries (int): Responses kept in the LRU result cache
+        threads (int): Worker threads computing uncached results
+        warm (bool): Pre-compute the unfiltered endpoints before accepting requests
+    """
+    service = AnalyticsService.from_file(file_path, typed=typed, cache_entries=cache_entries, threads=threads)
+    try:
+        asyncio.run(service.serve(host, port, warm=warm))
+    except KeyboardInterrupt:
+        print("\nService stopped")
+
+# Main execution (only runs when script is executed directly)
+if __name__ == "__main__":
+    run_service('data/flight_data_2024.csv')
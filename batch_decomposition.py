@@ -0,0 +1,214 @@
+# Vectorized seasonal decomposition of many per-airport daily series at once
+
+import numpy as np
+import pandas as pd
+
+# Per-origin daily metrics, named like the prepare_time_series_data columns:
+# metric -> (source column, aggregation)
+ORIGIN_DAILY_METRICS = {
+    'flight_count': ('origin', 'size'),
+    'cancellation_rate': ('cancelled', 'mean'),
+    'avg_air_time': ('air_time', 'mean'),
+    'avg_distance': ('distance', 'mean'),
+    'avg_weather_delay': ('weather_delay', 'mean'),
+    'avg_late_delay': ('late_aircraft_delay', 'mean'),
+    'avg_taxi_out': ('taxi_out', 'mean'),
+    'avg_taxi_in': ('taxi_in', 'mean')
+}
+
+def origin_daily_pivot(df, metrics=['flight_count', 'cancellation_rate', 'avg_air_time'], min_flights=0):
+    """
+    Pivot flights into one daily series per (metric, origin) pair.
+
+    All metrics come from a single groupby on origin and fl_date. Every
+    series covers the full date range of the data: days without flights
+    count as zero flights, and gaps in the mean metrics are forward then
+    back filled like seasonal_decomposition_analysis does. Series with no
+    values at all are dropped.
+
+    Args:
+        df (pd.DataFrame): Flight data with a datetime fl_date
+        metrics (list): Keys of ORIGIN_DAILY_METRICS
+        min_flights (int): Skip airports with fewer flights in total
+
+    Returns:
+        pd.DataFrame: (metric, origin) rows by fl_date columns
+    """
+    unknown = [metric for metric in metrics if metric not in ORIGIN_DAILY_METRICS]
+    if unknown:
+        raise ValueError(f"Unknown metrics {unknown}; expected some of {list(ORIGIN_DAILY_METRICS)}")
+
+    grouped = df.groupby(['origin', 'fl_date'], observed=True)
+    dates = pd.date_range(df['fl_date'].min(), df['fl_date'].max(), freq='D', name='fl_date')
+
+    sizes = grouped.size().unstack('fl_date').reindex(columns=dates).fillna(0)
+    sizes.index = sizes.index.astype(object)
+    keep = sizes.index[sizes.sum(axis=1) >= min_flights]
+
+    pivots = {}
+    for metric in metrics:
+        column, how = ORIGIN_DAILY_METRICS[metric]
+        if how == 'size':
+            pivot = sizes
+        else:
+            pivot = grouped[column].mean().unstack('fl_date').reindex(columns=dates)
+            pivot.index = pivot.index.astype(object)
+            pivot = pivot.ffill(axis=1).bfill(axis=1).dropna(how='all')
+        pivots[metric] = pivot.loc[pivot.index.intersection(keep, sort=False)]
+
+    return pd.concat(pivots, names=['metric', 'origin'])
+
+def centered_moving_average(values, period):
+    """
+    Centered moving average along the last axis, NaN where the window is short.
+
+    Uses the same filter as statsmodels' seasonal_decompose: a plain
+    ``period``-day mean for odd periods and a 2 x ``period`` mean (half
+    weights on the two end days) for even ones. Window sums come from one
+    cumulative sum, so the cost does not grow with the period.
+
+    Args:
+        values (np.ndarray): 2-D array, one series per row
+        period (int): Seasonal period in days
+
+    Returns:
+        np.ndarray: Trend array of the same shape
+    """
+    n = values.shape[1]
+    half = period // 2
+    trend = np.full(values.shape, np.nan)
+    if n <= 2 * half:
+        return trend
+
+    cumulative = np.zeros((values.shape[0], n + 1))
+    np.cumsum(values, axis=1, out=cumulative[:, 1:])
+    window = cumulative[:, 2 * half + 1:] - cumulative[:, :n - 2 * half]
+    if period % 2 == 0:
+        window = window - 0.5 * (values[:, :n - 2 * half] + values[:, 2 * half:])
+    trend[:, half:n - half] = window / period
+    return trend
+
+def _extrapolate_trend(trend, npoints):
+    # Least-squares lines through the npoints nearest defined values at each
+    # end, fitted for every series at once (statsmodels extrapolate_trend)
+    n = trend.shape[1]
+    defined = np.flatnonzero(~np.isnan(trend).any(axis=0))
+    front, back = defined[0], defined[-1]
+    front_last = min(front + npoints, back)
+    back_first = max(front, back - npoints)
+
+    for fit_start, fit_end, fill in ((front, front_last, np.arange(0, front)),
+                                     (back_first, back, np.arange(back + 1, n))):
+        design = np.c_[np.arange(fit_start, fit_end), np.ones(fit_end - fit_start)]
+        slope, intercept = np.linalg.lstsq(design, trend[:, fit_start:fit_end].T, rcond=-1)[0]
+        trend[:, fill] = np.outer(slope, fill) + intercept[:, None]
+    return trend
+
+def batch_seasonal_decompose(values, period=7, model='additive'):
+    """
+    Decompose every row of a (series x days) array in one vectorized pass.
+
+    Row for row this reproduces ``seasonal_decompose(series, model=model,
+    period=period, extrapolate_trend='freq')`` as used by
+    seasonal_decomposition_analysis, without a Python-level loop over
+    series.
+
+    Args:
+        values (np.ndarray): 2-D array, one complete daily series per row
+        period (int): Seasonal period (7 for weekly patterns)
+        model (str): 'additive' or 'multiplicative'
+
+    Returns:
+        dict: 'observed', 'trend', 'seasonal' and 'resid' arrays shaped like
+            ``values``, and a 'seasonal_strength' array with one value per row
+    """
+    if model not in ('additive', 'multiplicative'):
+        raise ValueError(f"Unknown model '{model}'; expected 'additive' or 'multiplicative'")
+    values = np.asarray(values, dtype='float64')
+    if values.ndim == 1:
+        values = values[None, :]
+    n = values.shape[1]
+    if n < 2 * period:
+        raise ValueError(f"Need at least {2 * period} days for period={period}, got {n}")
+    if np.isnan(values).any():
+        raise ValueError("Series contain missing values; fill them before decomposing")
+    if model == 'multiplicative' and (values <= 0).any():
+        raise ValueError("Multiplicative seasonality is not appropriate for zero and negative values")
+
+    trend = _extrapolate_trend(centered_moving_average(values, period), period)
+    detrended = values / trend if model == 'multiplicative' else values - trend
+
+    # Mean of each phase of the cycle, counted from the first day
+    padded = np.full((values.shape[0], -(-n // period) * period), np.nan)
+    padded[:, :n] = detrended
+    period_averages = np.nanmean(padded.reshape(values.shape[0], -1, period), axis=1)
+    if model == 'multiplicative':
+        period_averages /= period_averages.mean(axis=1, keepdims=True)
+    else:
+        period_averages -= period_averages.mean(axis=1, keepdims=True)
+    seasonal = np.tile(period_averages, -(-n // period))[:, :n]
+
+    resid = values / seasonal / trend if model == 'multiplicative' else detrended - seasonal
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        seasonal_strength = 1 - resid.var(axis=1, ddof=1) / (seasonal + resid).var(axis=1, ddof=1)
+
+    return {
+        'observed': values,
+        'trend': trend,
+        'seasonal': seasonal,
+        'resid': resid,
+        'seasonal_strength': seasonal_strength
+    }
+
+def decompose_origins(df, metrics=['flight_count', 'cancellation_rate', 'avg_air_time'], period=7,
+                      model='additive', min_flights=0, top_n=10, verbose=True):
+    """
+    Weekly decomposition of every origin airport's daily metrics at once.
+
+    Builds the (metric, origin) x day pivot with origin_daily_pivot and
+    decomposes all rows with batch_seasonal_decompose.
+
+    Args:
+        df (pd.DataFrame): Flight data with a datetime fl_date
+        metrics (list): Keys of ORIGIN_DAILY_METRICS
+        period (int): Seasonal period (7 for weekly patterns)
+        model (str): 'additive' or 'multiplicative'
+        min_flights (int): Skip airports with fewer flights in total
+        top_n (int): Airports listed per metric when printing
+        verbose (bool): Print the most seasonal airports per metric
+
+    Returns:
+        dict: 'observed', 'trend', 'seasonal' and 'resid' DataFrames with
+            (metric, origin) rows and fl_date columns, and a
+            'seasonal_strength' Series indexed by (metric, origin)
+    """
+    pivot = origin_daily_pivot(df, metrics, min_flights)
+    components = batch_seasonal_decompose(pivot.to_numpy(), period, model)
+
+    results = {
+        name: pd.DataFrame(components[name], index=pivot.index, columns=pivot.columns)
+        for name in ('observed', 'trend', 'seasonal', 'resid')
+    }
+    results['seasonal_strength'] = pd.Series(components['seasonal_strength'], index=pivot.index,
+                                             name='seasonal_strength')
+
+    if verbose:
+        print("=== BATCH SEASONAL DECOMPOSITION BY ORIGIN ===")
+        print(f"{len(pivot)} series over {pivot.shape[1]} days (period={period}, {model})")
+        for metric in metrics:
+            if metric not in results['seasonal_strength'].index.get_level_values('metric'):
+                continue
+            strength = results['seasonal_strength'].loc[metric]
+            print(f"\n{metric.replace('_', ' ').title()} - median seasonal strength "
+                  f"{strength.median():.3f} across {len(strength)} airports")
+            print(strength.sort_values(ascending=False).head(top_n).round(3).to_string())
+
+    return results
+
+# Main execution (only runs when script is executed directly)
+if __name__ == "__main__":
+    from data_cache import load_cached_flight_data
+
+    flights = load_cached_flight_data('data/flight_data_2024.csv', impute=False)
+    origin_decomposition = decompose_origins(flights, min_flights=1000)
@@ -0,0 +1,330 @@
+# Offline benchmark suite for the preprocessing, analysis and chart stages
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_cache import CACHE_DIR, file_fingerprint
+
+DEFAULT_SCALES = [100_000, 1_000_000, 10_000_000]
+
+BENCHMARK_DIR = f'{CACHE_DIR}/benchmark'
+
+# Exponent of time vs rows above which a stage is reported as superlinear
+SUPERLINEAR_EXPONENT = 1.2
+
+def scaled_dataset(source, rows, seed=0, work_dir=BENCHMARK_DIR):
+    """
+    Write a CSV of ``rows`` flights resampled (with replacement) from a source CSV.
+
+    Rows keep the source's columns and values and are ordered by fl_date like
+    the original file. The file is reused while the source is unchanged.
+    Without a source the rows come from synthetic_data instead.
+
+    Args:
+        source (str): Flight data CSV to resample, or None for synthetic data
+        rows (int): Number of rows wanted
+        seed (int): Resampling or generator seed
+        work_dir (str): Directory for the generated files
+
+    Returns:
+        str: Path of the scaled CSV
+    """
+    if source is None:
+        from synthetic_data import write_synthetic_flight_data
+        path = Path(work_dir) / f'synthetic-{rows}-{seed}.csv'
+        if not path.exists():
+            write_synthetic_flight_data(path, rows, seed, verbose=False)
+        return str(path)
+
+    fingerprint = file_fingerprint(source)['sha256'][:12]
+    path = Path(work_dir) / f'flights-{fingerprint}-{rows}-{seed}.csv'
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        base = pd.read_csv(source)
+        sample = base.sample(n=rows, replace=True, random_state=seed)
+        if 'fl_date' in sample.columns:
+            sample = sample.sort_values('fl_date', kind='stable')
+        tmp_path = path.with_name(path.name + '.tmp')
+        sample.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    return str(path)
+
+def _quiet(func, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+def measure(func, *args, repeats=3, **kwargs):
+    """
+    Time a call and measure its allocation high-water mark.
+
+    A first call traced by tracemalloc (which sees NumPy buffers) measures
+    the peak and doubles as a warm-up for lazy imports and caches; the timed
+    repeats then run without tracing. Output printed by the call is
+    suppressed.
+
+    Args:
+        func (callable): Stage to measure
+        *args: Positional arguments for ``func``
+        repeats (int): Timed calls
+        **kwargs: Keyword arguments for ``func``
+
+    Returns:
+        dict: 'wall_s_min', 'wall_s_median', 'cpu_s_median' and 'peak_mb'
+    """
+    tracemalloc.start()
+    try:
+        _quiet(func, *args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    walls, cpus = [], []
+    for _ in range(repeats):
+        cpu_before = time.process_time()
+        wall_before = time.perf_counter()
+        _quiet(func, *args, **kwargs)
+        walls.append(time.perf_counter() - wall_before)
+        cpus.append(time.process_time() - cpu_before)
+
+    return {
+        'wall_s_min': min(walls),
+        'wall_s_median': float(np.median(walls)),
+        'cpu_s_median': float(np.median(cpus)),
+        'peak_mb': peak / 1e6
+    }
+
+def benchmark_scale(data_file, repeats=3, charts=True):
+    """
+    Measure every pipeline stage on one dataset.
+
+    Each stage gets the output of the previous ones as input, so it is
+    measured on exactly what it sees in a real run.
+
+    Args:
+        data_file (str): Flight data CSV
+        repeats (int): Timed calls per stage
+        charts (bool): Include the descriptive_visualization chart functions
+
+    Returns:
+        list: One result dict per stage
+    """
+    from data_preprocess import fill_missing_values, load_flight_data
+    from descriptive_analysis import perform_complete_analysis
+    from time_series import prepare_time_series_data, seasonal_decomposition_analysis
+
+    raw = _quiet(load_flight_data, data_file)
+    df = fill_missing_values(raw)
+    analysis_results = _quiet(perform_complete_analysis, df)
+    ts_data = prepare_time_series_data(raw)
+
+    stages = [
+        ('load_flight_data', len(raw), load_flight_data, (data_file,)),
+        ('fill_missing_values', len(raw), fill_missing_values, (raw,)),
+        ('perform_complete_analysis', len(raw), perform_complete_analysis, (df,)),
+        ('prepare_time_series_data', len(raw), prepare_time_series_data, (raw,)),
+        ('seasonal_decomposition_analysis', len(raw), seasonal_decomposition_analysis, (ts_data, 'flight_count'))
+    ]
+
+    output_dir = None
+    if charts:
+        import matplotlib
+        matplotlib.use('Agg')
+        from descriptive_visualization import CHART_RENDERERS, set_plot_style
+        set_plot_style()
+        output_dir = tempfile.TemporaryDirectory(prefix='flight-bench-')
+        stages += [(render.__name__, len(raw), render, (analysis_results[section], output_dir.name, False))
+                   for render, section, _ in CHART_RENDERERS]
+
+    # Memoized stages would otherwise time their cache hits
+    from memoize import set_memoization
+    memoization = set_memoization(False)
+    results = []
+    try:
+        for name, rows, func, args in stages:
+            results.append({'benchmark': name, 'rows': rows, **measure(func, *args, repeats=repeats)})
+    finally:
+        set_memoization(memoization)
+        if output_dir is not None:
+            output_dir.cleanup()
+    return results
+
+def scaling_exponents(results):
+    """
+    Fit time ~ rows**k per benchmark across the measured scales.
+
+    Args:
+        results (pd.DataFrame): Benchmark results with 'benchmark', 'rows'
+            and 'wall_s_median'
+
+    Returns:
+        dict: Exponent k per benchmark; about 1 is linear, above
+            SUPERLINEAR_EXPONENT deserves a look
+    """
+    exponents = {}
+    for name, group in results.groupby('benchmark', sort=False):
+        if group['rows'].nunique() > 1:
+            slope = np.polyfit(np.log(group['rows']), np.log(group['wall_s_median']), 1)[0]
+            exponents[name] = round(float(slope), 3)
+    return exponents
+
+def _git_revision():
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True,
+                               text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return revision + ('-dirty' if dirty else '')
+
+def run_benchmarks(source=None, scales=DEFAULT_SCALES, repeats=3, seed=0, charts=True,
+                   output_path=None, work_dir=BENCHMARK_DIR, verbose=True):
+    """
+    Run the suite at several dataset scales and store the results as JSON.
+
+    Args:
+        source (str): Flight data CSV the scaled datasets are resampled from;
+            by default they are generated by synthetic_data
+        scales (list): Dataset sizes in rows
+        repeats (int): Timed calls per stage
+        seed (int): Resampling or generator seed, fixed so runs on two
+            commits compare
+        charts (bool): Include the chart functions
+        output_path (str): JSON file; defaults to
+            outputs/benchmarks/benchmark-<git revision>.json
+        work_dir (str): Directory for the scaled CSVs
+        verbose (bool): Print the results
+
+    Returns:
+        dict: 'meta', 'results' and 'scaling' as written to the JSON file
+    """
+    from data_preprocess import resolve_data_file
+
+    if source is not None:
+        source = resolve_data_file(source)
+    revision = _git_revision()
+    results = []
+    for rows in scales:
+        data_file = scaled_dataset(source, rows, seed, work_dir)
+        if verbose:
+            print(f"Benchmarking {rows:,} rows...")
+        results += benchmark_scale(data_file, repeats, charts)
+
+    frame = pd.DataFrame(results)
+    report = {
+        'meta': {
+            'revision': revision,
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'source': source,
+            'scales': list(scales),
+            'repeats': repeats,
+            'seed': seed
+        },
+        'results': json.loads(frame.round(6).to_json(orient='records')),
+        'scaling': scaling_exponents(frame)
+    }
+
+    output_path = Path(output_path or f"outputs/benchmarks/benchmark-{revision or 'local'}.json")
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(report, indent=2))
+
+    if verbose:
+        print(frame.set_index(['benchmark', 'rows'])[['wall_s_median', 'cpu_s_median', 'peak_mb']]
+              .round(4).to_string())
+        superlinear = {name: k for name, k in report['scaling'].items() if k > SUPERLINEAR_EXPONENT}
+        print(f"\nScaling exponents: {report['scaling']}")
+        if superlinear:
+            print(f"Superlinear stages: {superlinear}")
+        print(f"Results written to {output_path}")
+
+    return report
+
+def compare_benchmarks(baseline_path, candidate_path, threshold=0.10, min_delta_s=0.01, verbose=True):
+    """
+    Compare two benchmark JSON files stage by stage.
+
+    Uses the best (minimum) wall time of each stage, which is the least noisy
+    estimate on a shared machine.
+
+    Args:
+        baseline_path (str): JSON written by run_benchmarks, e.g. on main
+        candidate_path (str): JSON from the commit under test
+        threshold (float): Relative slowdown or memory growth that counts
+            as a regression
+        min_delta_s (float): Ignore slowdowns smaller than this many seconds,
+            which are timer noise for millisecond stages
+        verbose (bool): Print the comparison
+
+    Returns:
+        pd.DataFrame: Per (benchmark, rows) times, peaks, their ratios and a
+            'regression' flag
+    """
+    def load(path):
+        return pd.DataFrame(json.loads(Path(path).read_text())['results']).set_index(['benchmark', 'rows'])
+
+    baseline, candidate = load(baseline_path), load(candidate_path)
+    comparison = pd.DataFrame({
+        'baseline_s': baseline['wall_s_min'],
+        'candidate_s': candidate['wall_s_min'],
+        'baseline_mb': baseline['peak_mb'],
+        'candidate_mb': candidate['peak_mb']
+    }).dropna()
+    comparison['time_ratio'] = comparison['candidate_s'] / comparison['baseline_s']
+    comparison['memory_ratio'] = comparison['candidate_mb'] / comparison['baseline_mb']
+    slower = ((comparison['time_ratio'] > 1 + threshold)
+              & (comparison['candidate_s'] - comparison['baseline_s'] > min_delta_s))
+    comparison['regression'] = slower | (comparison['memory_ratio'] > 1 + threshold)
+
+    if verbose:
+        print(comparison.round(3).to_string())
+        regressions = comparison[comparison['regression']]
+        print(f"\n{len(regressions)} regression(s) beyond {threshold:.0%}")
+
+    return comparison
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Flight pipeline benchmark suite')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run = subparsers.add_parser('run', help='run the suite and write a JSON result file')
+    run.add_argument('--source', help='CSV the scaled datasets are resampled from (default: synthetic data)')
+    run.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES, help='dataset sizes in rows')
+    run.add_argument('--repeats', type=int, default=3, help='timed calls per stage')
+    run.add_argument('--seed', type=int, default=0, help='resampling or generator seed')
+    run.add_argument('--no-charts', action='store_true', help='skip the chart functions')
+    run.add_argument('--output', help='result JSON (default: outputs/benchmarks/benchmark-<revision>.json)')
+
+    compare = subparsers.add_parser('compare', help='compare two result files; exit 1 on regressions')
+    compare.add_argument('baseline')
+    compare.add_argument('candidate')
+    compare.add_argument('--threshold', type=float, default=0.10, help='allowed relative slowdown')
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        run_benchmarks(args.source, args.scales, args.repeats, args.seed, not args.no_charts, args.output)
+        return 0
+    comparison = compare_benchmarks(args.baseline, args.candidate, args.threshold)
+    return 1 if comparison['regression'].any() else 0
+
+# Main execution (only runs when script is executed directly)
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+# Content-addressed cache of rendered chart PNGs
+
+import hashlib
+import inspect
+import os
+import shutil
+import types
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_cache import CACHE_DIR
+
+# Bump when shared plotting code (styles, save_figure) changes the output
+CHART_CACHE_VERSION = 1
+
+def _update_digest(digest, obj):
+    # Feed a chart input (pandas/NumPy data, decomposition results,
+    # containers and plain parameters) into the hash
+    if isinstance(obj, (pd.Series, pd.DataFrame)):
+        layout = (type(obj).__name__, obj.shape, list(obj.index.names),
+                  getattr(obj, 'name', None), list(getattr(obj, 'columns', [])),
+                  str(obj.dtypes.to_dict() if isinstance(obj, pd.DataFrame) else obj.dtype))
+        digest.update(repr(layout).encode())
+        digest.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, np.ndarray):
+        digest.update(repr((obj.dtype.str, obj.shape)).encode())
+        digest.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        digest.update(f'dict{len(obj)}'.encode())
+        for key in sorted(obj, key=repr):
+            digest.update(repr(key).encode())
+            _update_digest(digest, obj[key])
+    elif isinstance(obj, (list, tuple)):
+        digest.update(f'{type(obj).__name__}{len(obj)}'.encode())
+        for item in obj:
+            _update_digest(digest, item)
+    elif hasattr(obj, 'seasonal') and hasattr(obj, 'resid'):
+        # statsmodels DecomposeResult
+        for component in ('observed', 'trend', 'seasonal', 'resid'):
+            _update_digest(digest, getattr(obj, component))
+    else:
+        digest.update(repr(obj).encode())
+
+def _update_code_digest(digest, code):
+    # Bytecode, referenced names and constants; nested code objects (lambdas,
+    # comprehensions, genexprs) are hashed the same way, never by their repr,
+    # which embeds a per-process memory address
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        _update_const_digest(digest, const)
+
+def _update_const_digest(digest, const):
+    if isinstance(const, types.CodeType):
+        digest.update(b'code')
+        _update_code_digest(digest, const)
+    elif isinstance(const, tuple):
+        digest.update(f'tuple{len(const)}'.encode())
+        for item in const:
+            _update_const_digest(digest, item)
+    elif isinstance(const, frozenset):
+        # Iteration order of a frozenset of strings varies with hash seeding
+        digest.update(repr(('frozenset', sorted(map(repr, const)))).encode())
+    else:
+        digest.update(repr((type(const).__name__, const)).encode())
+
+def code_digest(func):
+    """
+    Address-free hash of a function's code, stable across processes.
+
+    Args:
+        func (callable): Function, possibly wrapped by decorators
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    _update_code_digest(digest, inspect.unwrap(func).__code__)
+    return digest.hexdigest()
+
+def chart_key(renderer, data, **params):
+    """
+    Content hash identifying one rendered chart.
+
+    Covers the plotting function (its name and bytecode), the data it is
+    given, the plot parameters and the matplotlib version, so any change
+    that could alter the PNG produces a new key.
+
+    Args:
+        renderer (callable): Function that draws the chart
+        data: Aggregate the chart is drawn from, e.g. a Series, DataFrame,
+            dict of them or a decomposition result
+        **params: Plot parameters such as title, figsize or dpi
+
+    Returns:
+        str: Hex digest
+    """
+    import matplotlib
+
+    digest = hashlib.sha256()
+    _update_digest(digest, (CHART_CACHE_VERSION, matplotlib.__version__,
+                            f'{renderer.__module__}.{renderer.__qualname__}',
+                            code_digest(renderer), params))
+    _update_digest(digest, data)
+    return digest.hexdigest()
+
+class ChartCache:
+    """
+    Size-bounded store of rendered PNGs addressed by chart_key.
+
+    A hit copies the stored PNG to the requested output path instead of
+    re-rendering it. Entries are evicted least recently used first once the
+    directory grows past ``max_bytes``. Writes go through a temporary file,
+    so worker processes can share one cache directory.
+    """
+
+    def __init__(self, cache_dir=f'{CACHE_DIR}/charts', max_bytes=256 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _entry(self, key):
+        return self.cache_dir / f'{key}.png'
+
+    def fetch(self, key, output_path):
+        """
+        Copy a cached chart to output_path.
+
+        Args:
+            key (str): Result of chart_key
+            output_path (str): Where the PNG is expected
+
+        Returns:
+            bool: True on a hit, False when the chart must be rendered
+        """
+        entry = self._entry(key)
+        try:
+            output_path = Path(output_path)
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = output_path.with_name(output_path.name + '.tmp')
+            shutil.copyfile(entry, tmp_path)
+            os.replace(tmp_path, output_path)
+            os.utime(entry)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def store(self, key, output_path):
+        """
+        Add a freshly rendered chart and evict old entries if over budget.
+
+        Args:
+            key (str): Result of chart_key
+            output_path (str): The rendered PNG
+        """
+        entry = self._entry(key)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = entry.with_name(f'{entry.name}.{os.getpid()}.tmp')
+            shutil.copyfile(output_path, tmp_path)
+            os.replace(tmp_path, entry)
+        except OSError as e:
+            print(f'Warning: could not write chart cache entry {entry}: {e}')
+            return
+        self.evict()
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache fits max_bytes.
+
+        Returns:
+            int: Number of entries removed
+        """
+        entries = []
+        for path in self.cache_dir.glob('*.png'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def render(self, key, output_path, render):
+        """
+        Serve a chart from the cache, rendering and storing it on a miss.
+
+        Args:
+            key (str): Result of chart_key
+            output_path (str): Where the PNG is expected
+            render (callable): No-argument function that writes output_path
+
+        Returns:
+            str: output_path
+        """
+        if not self.fetch(key, output_path):
+            render()
+            self.store(key, output_path)
+        return str(output_path)
@@ -0,0 +1,213 @@
+# Out-of-core descriptive analysis over chunks with mergeable partial state
+
+import numpy as np
+import pandas as pd
+
+from data_preprocess import fill_missing_values
+from fused_analysis import DESCRIBE_INDEX, build_group_table, finalize_sections, plan_aggregations, print_analysis_results
+from sketches import KLLSketch, ValueHistogram
+from streaming_preprocess import compute_fill_statistics, iter_flight_chunks
+
+def _plain_levels(table):
+    # Chunks infer their own category sets, so merge on the plain key values
+    if isinstance(table.index, pd.MultiIndex):
+        levels = [level.astype(object) if isinstance(level, pd.CategoricalIndex) else level
+                  for level in table.index.levels]
+        table.index = table.index.set_levels(levels)
+    return table
+
+class DescriptiveState:
+    """
+    Mergeable partial aggregates for perform_complete_analysis.
+
+    Holds the fused group table (sizes, sums and counts per origin, month
+    and day_of_week), per-column moments (count, mean, M2, min, max) and a
+    ValueHistogram per described column for the quartiles, or a KLLSketch
+    when ``approximate`` is set. States built over different chunks, files
+    or shards merge exactly (the sketches within their error bound);
+    finalize() turns the state into the perform_complete_analysis result dict.
+
+    Each chunk's sketches are seeded with (``seed``, chunk number), so their
+    compaction errors are independent and cancel when merged. States built
+    in parallel must be given distinct seeds, e.g. their shard index.
+    """
+
+    def __init__(self, sections=None, resolution=0.01, approximate=False, seed=0):
+        self.sections = sections
+        self.resolution = resolution
+        self.approximate = approximate
+        self.seed = seed
+        self.chunks = 0
+        self.plan = None
+        self.table = None
+        self.moments = {}
+        self.histograms = {}
+
+    def update(self, chunk):
+        """
+        Fold one chunk of (preprocessed) flight rows into the state.
+
+        Args:
+            chunk (pd.DataFrame): Flight rows
+
+        Returns:
+            DescriptiveState: self, for chaining
+        """
+        if self.plan is None:
+            self.plan = plan_aggregations(self.sections, chunk.columns)
+
+        other = DescriptiveState(self.sections, self.resolution, self.approximate)
+        other.plan = self.plan
+        other.table = _plain_levels(build_group_table(chunk, self.plan))
+        for col in self.plan['describe']:
+            values = chunk[col].to_numpy(dtype='float64')
+            values = values[~np.isnan(values)]
+            if len(values):
+                mean = values.mean()
+                other.moments[col] = {
+                    'count': len(values),
+                    'mean': mean,
+                    'm2': ((values - mean) ** 2).sum(),
+                    'min': values.min(),
+                    'max': values.max()
+                }
+            quantiles = (KLLSketch(seed=[self.seed, self.chunks]) if self.approximate
+                         else ValueHistogram(self.resolution))
+            other.histograms[col] = quantiles.update(values)
+        self.chunks += 1
+        return self.merge(other)
+
+    def merge(self, other):
+        """
+        Fold another state into this one.
+
+        Args:
+            other (DescriptiveState): State built over other rows
+
+        Returns:
+            DescriptiveState: self, for chaining
+        """
+        if other.plan is None:
+            return self
+        if self.plan is None:
+            self.plan = other.plan
+        elif self.plan != other.plan:
+            raise ValueError("Cannot merge states planned for different sections or columns")
+        if self.approximate != other.approximate:
+            raise ValueError("Cannot merge sketched and histogram quartiles")
+
+        if self.table is None:
+            self.table = other.table
+        elif other.table is not None:
+            merged = pd.concat([self.table, other.table])
+            self.table = merged.groupby(level=list(merged.index.names), dropna=False, sort=True).sum()
+
+        for col, theirs in other.moments.items():
+            mine = self.moments.get(col)
+            if mine is None:
+                self.moments[col] = dict(theirs)
+                continue
+            # Chan et al. parallel update of count, mean and M2
+            n = mine['count'] + theirs['count']
+            delta = theirs['mean'] - mine['mean']
+            mine['m2'] += theirs['m2'] + delta ** 2 * mine['count'] * theirs['count'] / n
+            mine['mean'] += delta * theirs['count'] / n
+            mine['count'] = n
+            mine['min'] = min(mine['min'], theirs['min'])
+            mine['max'] = max(mine['max'], theirs['max'])
+
+        for col, histogram in other.histograms.items():
+            if col in self.histograms:
+                self.histograms[col].merge(histogram)
+            else:
+                self.histograms[col] = histogram
+        return self
+
+    def describe(self):
+        """
+        Finalize the moments and quartile summaries into a describe()-shaped frame.
+
+        Returns:
+            pd.DataFrame: Same layout as ``df[columns].describe()``
+        """
+        stats = {}
+        for col in self.plan['describe']:
+            m = self.moments.get(col)
+            if m is None:
+                stats[col] = [0] + [np.nan] * 7
+                continue
+            std = np.sqrt(m['m2'] / (m['count'] - 1)) if m['count'] > 1 else np.nan
+            quartiles = [self.histograms[col].quantile(q) for q in (0.25, 0.5, 0.75)]
+            stats[col] = [m['count'], m['mean'], std, m['min'], *quartiles, m['max']]
+        return pd.DataFrame(stats, index=DESCRIBE_INDEX, columns=self.plan['describe'], dtype='float64')
+
+    def finalize(self):
+        """
+        Build the perform_complete_analysis result dict from the state.
+
+        Returns:
+            dict: Dictionary containing the requested analysis results
+        """
+        if self.plan is None:
+            raise ValueError("No rows have been added to the state")
+        describe_stats = self.describe() if self.plan['describe'] else None
+        return finalize_sections(self.table, self.plan, describe_stats)
+
+def analyze_chunks(chunks, sections=None, verbose=True, resolution=0.01):
+    """
+    Run the descriptive analysis over an iterable of DataFrame chunks.
+
+    Only one chunk and the (small) partial state are held in memory, so the
+    chunks can come from a file larger than RAM or from a live stream.
+
+    Args:
+        chunks (iterable): Preprocessed flight DataFrames
+        sections (list): Sections to compute; None computes all of them
+        verbose (bool): Print the results like the individual analyses do
+        resolution (float): Histogram resolution for the quartiles
+
+    Returns:
+        dict: Dictionary containing the requested analysis results
+    """
+    state = DescriptiveState(sections, resolution)
+    for chunk in chunks:
+        state.update(chunk)
+    results = state.finalize()
+
+    if verbose:
+        print_analysis_results(results)
+
+    return results
+
+def analyze_csv_in_chunks(file_path='data/flight_data_2024.csv', memory_budget_mb=512, chunksize=None,
+                          preprocess=True, typed=True, sections=None, verbose=True):
+    """
+    Out-of-core equivalent of preprocess_flight_data + perform_complete_analysis.
+
+    With ``preprocess=True`` a first pass computes the imputation statistics
+    (see streaming_preprocess) and the second pass imputes each chunk before
+    it is folded into the analysis state.
+
+    Args:
+        file_path (str): Path to the CSV file
+        memory_budget_mb (float): Peak memory allowed for chunk processing
+        chunksize (int): Rows per chunk; derived from the budget when omitted
+        preprocess (bool): Impute missing values; False for already
+            preprocessed files
+        typed (bool): Read with the explicit dtype map
+        sections (list): Sections to compute; None computes all of them
+        verbose (bool): Print the results like the individual analyses do
+
+    Returns:
+        dict: Dictionary containing the requested analysis results
+    """
+    def chunks():
+        return iter_flight_chunks(file_path, chunksize, memory_budget_mb, typed=typed)
+
+    if preprocess:
+        fill_values = compute_fill_statistics(chunks())
+        source = (fill_missing_values(chunk, fill_values) for chunk in chunks())
+    else:
+        source = chunks()
+
+    return analyze_chunks(source, sections, verbose)
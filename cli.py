@@ -0,0 +1,227 @@
+# Command-line entry point for the preprocessing and analysis stages
+#
+# Only argparse is imported up front; each subcommand imports the pandas,
+# matplotlib, seaborn or statsmodels based modules it needs when it runs, so
+# quick checks from cron start in a fraction of a second.
+
+import argparse
+import sys
+
+DATA_FILE = 'data/flight_data_2024.csv'
+
+def _chart_cache(args):
+    if args.no_chart_cache:
+        return None
+    from chart_cache import ChartCache
+    return ChartCache()
+
+def _month_filter(args):
+    if not args.months:
+        return None
+    return args.months[0] if len(args.months) == 1 else tuple(args.months)
+
+def _load_flights(args, impute=True):
+    # Partitioned directories and filtered loads read only the requested slice,
+    # so they skip the whole-file cache
+    import os
+    months = _month_filter(args)
+    if os.path.isdir(args.file) or months or args.origins:
+        from data_preprocess import load_flight_data, preprocess_flight_data
+        if impute:
+            return preprocess_flight_data(args.file, verbose=False, typed=args.typed, months=months,
+                                          origins=args.origins)
+        return load_flight_data(args.file, typed=args.typed, months=months, origins=args.origins)
+
+    from data_cache import load_cached_flight_data
+    return load_cached_flight_data(args.file, impute=impute, typed=args.typed)
+
+def _select_backend(show):
+    # Must run before pyplot is first imported
+    if not show:
+        import matplotlib
+        matplotlib.use('Agg')
+
+def run_preprocess(args):
+    """Preprocess the dataset into the cache, a streamed file or just check the cache."""
+    if args.check:
+        from data_cache import cache_entry_path
+        data_file, cache_path = cache_entry_path(args.file, typed=args.typed)
+        cached = cache_path.exists()
+        print(f"{data_file}: {'cached' if cached else 'not cached'} ({cache_path})")
+        return 0 if cached else 1
+
+    if args.output:
+        from streaming_preprocess import stream_preprocess_flight_data
+        stream_preprocess_flight_data(args.file, args.output, memory_budget_mb=args.memory_budget,
+                                      typed=args.typed)
+        return 0
+
+    if args.no_cache:
+        from data_preprocess import preprocess_flight_data
+        df = preprocess_flight_data(args.file, typed=args.typed)
+    else:
+        from data_cache import load_cached_flight_data
+        df = load_cached_flight_data(args.file, refresh=args.refresh, verbose=True, typed=args.typed)
+
+    print("\nPreprocessing completed successfully!")
+    print(f"Final dataset shape: {df.shape}")
+    return 0
+
+def run_describe(args):
+    """Run the descriptive analysis in memory, fused, sharded or out of core."""
+    if args.chunked:
+        from chunked_analysis import analyze_csv_in_chunks
+        analyze_csv_in_chunks(args.file, memory_budget_mb=args.memory_budget, typed=args.typed)
+        return 0
+
+    if args.cube:
+        from aggregate_cube import load_cube
+        cube = load_cube(args.file, refresh=args.refresh_cube, typed=args.typed)
+        start = end = None
+        if args.months:
+            from partitioned_dataset import month_bounds
+            first, last = month_bounds(_month_filter(args))
+            start, end = first.start_time, last.end_time
+        cube.analysis(origins=args.origins, start=start, end=end, verbose=True)
+        return 0
+
+    from descriptive_analysis import perform_complete_analysis
+
+    df = _load_flights(args)
+    perform_complete_analysis(df, fused=args.fused, workers=args.workers, approximate=args.approximate)
+    return 0
+
+def run_timeseries(args):
+    """Run the seasonal decomposition analysis and save its charts."""
+    _select_backend(args.show)
+    from time_series import comprehensive_seasonal_analysis, prepare_time_series_data
+
+    raw_data = _load_flights(args, impute=False)
+    ts_data = prepare_time_series_data(raw_data, workers=args.workers)
+    comprehensive_seasonal_analysis(ts_data, workers=args.workers, cache=_chart_cache(args))
+    return 0
+
+def run_visualize(args):
+    """Render the descriptive analysis charts."""
+    _select_backend(args.show)
+    from descriptive_analysis import perform_complete_analysis
+    from descriptive_visualization import visualize_complete_analysis
+
+    df = _load_flights(args)
+    analysis_results = perform_complete_analysis(df, fused=args.fused)
+    paths = visualize_complete_analysis(analysis_results, workers=args.workers, output_dir=args.output_dir,
+                                        cache=_chart_cache(args))
+
+    print("\nAll visualizations generated successfully:")
+    for path in paths:
+        print(f"  {path}")
+    return 0
+
+def run_serve(args):
+    """Serve the analyses as JSON endpoints from a warm in-memory dataset."""
+    from analytics_service import run_service
+    run_service(args.file, host=args.host, port=args.port, typed=args.typed, cache_entries=args.cache_entries,
+                threads=args.threads, warm=not args.no_warm)
+    return 0
+
+def build_parser():
+    """Build the argument parser with one subcommand per stage."""
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--file', default=DATA_FILE,
+                        help='flight data CSV or year/month partitioned directory (default: %(default)s)')
+    common.add_argument('--typed', action='store_true', help='read with the explicit dtype map')
+
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument('--months', nargs='+', metavar='YYYY-MM',
+                         help='only load this month or inclusive month range')
+    filters.add_argument('--origins', nargs='+', metavar='CODE', help='only load these origin airports')
+    common.add_argument('--profile', nargs='?', const='outputs/profiles', metavar='DIR',
+                        help='write a per-stage JSON/CSV profile to DIR (default: %(const)s)')
+    common.add_argument('--cprofile', action='store_true',
+                        help='with --profile, also dump cProfile stats of the slowest stage')
+
+    workers = argparse.ArgumentParser(add_help=False)
+    workers.add_argument('--workers', type=int, help='worker processes (default: run in this process)')
+
+    charts = argparse.ArgumentParser(add_help=False)
+    charts.add_argument('--show', action='store_true', help='display figures instead of rendering headless')
+    charts.add_argument('--no-chart-cache', action='store_true', help='re-render every chart')
+
+    parser = argparse.ArgumentParser(description='Flight data preprocessing and analysis')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    preprocess = subparsers.add_parser('preprocess', parents=[common], help='preprocess the dataset')
+    preprocess.add_argument('--check', action='store_true',
+                            help='only report whether a cached result exists (exit code 1 if not)')
+    preprocess.add_argument('--refresh', action='store_true', help='rebuild the cache entry')
+    preprocess.add_argument('--no-cache', action='store_true', help='preprocess without the cache')
+    preprocess.add_argument('--output', help='stream the preprocessed rows to this CSV/Parquet file')
+    preprocess.add_argument('--memory-budget', type=float, default=512, help='MB per chunk when streaming')
+    preprocess.set_defaults(handler=run_preprocess)
+
+    describe = subparsers.add_parser('describe', parents=[common, filters, workers], help='descriptive analysis')
+    describe.add_argument('--fused', action='store_true', help='single fused aggregation pass')
+    describe.add_argument('--chunked', action='store_true', help='out-of-core analysis over CSV chunks')
+    describe.add_argument('--memory-budget', type=float, default=512, help='MB per chunk with --chunked')
+    describe.add_argument('--approximate', action='store_true',
+                          help='sketch the describe() quartiles instead of sorting every column')
+    describe.add_argument('--cube', action='store_true',
+                          help='roll up the persisted aggregate cube (built on first use)')
+    describe.add_argument('--refresh-cube', action='store_true', help='rebuild the aggregate cube')
+    describe.set_defaults(handler=run_describe)
+
+    timeseries = subparsers.add_parser('timeseries', parents=[common, filters, workers, charts],
+                                       help='seasonal decomposition analysis')
+    timeseries.set_defaults(handler=run_timeseries)
+
+    visualize = subparsers.add_parser('visualize', parents=[common, filters, workers, charts],
+                                      help='descriptive analysis charts')
+    visualize.add_argument('--fused', action='store_true', help='single fused aggregation pass')
+    visualize.add_argument('--output-dir', default='outputs', help='directory for the PNGs')
+    visualize.set_defaults(handler=run_visualize)
+
+    serve = subparsers.add_parser('serve', parents=[common], help='local JSON analytics service')
+    serve.add_argument('--host', default='127.0.0.1', help='interface to bind (default: %(default)s)')
+    serve.add_argument('--port', type=int, default=8050, help='TCP port (default: %(default)s)')
+    serve.add_argument('--cache-entries', type=int, default=256, help='responses kept in the LRU result cache')
+    serve.add_argument('--threads', type=int, default=4, help='worker threads computing uncached results')
+    serve.add_argument('--no-warm', action='store_true', help='skip pre-computing the unfiltered endpoints')
+    serve.set_defaults(handler=run_serve)
+
+    return parser
+
+def run_profiled(args):
+    """Run a subcommand under PipelineProfiler and write its profile."""
+    import os
+    from profiling import PipelineProfiler
+
+    with PipelineProfiler(cprofile=args.cprofile) as profiler:
+        status = args.handler(args)
+    data_bytes = os.path.getsize(args.file) if os.path.isfile(args.file) else None
+    paths = profiler.write(args.profile, label=args.command, data_file=args.file, data_bytes=data_bytes,
+                           typed=args.typed, workers=getattr(args, 'workers', None))
+
+    print("\nStage profile:")
+    print(profiler.summary().to_string())
+    for kind, path in paths.items():
+        print(f"Profile {kind}: {path}")
+    return status
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if len(getattr(args, 'months', None) or []) > 2:
+        parser.error('--months takes one month or a first and last month')
+    if getattr(args, 'approximate', False) and (args.chunked or args.cube):
+        parser.error('--approximate cannot be combined with --chunked or --cube')
+    try:
+        if args.profile:
+            return run_profiled(args)
+        return args.handler(args)
+    except FileNotFoundError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+# Main execution (only runs when script is executed directly)
+if __name__ == "__main__":
+    sys.exit(main())
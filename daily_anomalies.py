@@ -0,0 +1,298 @@
+# Online anomaly detection over the daily time-series metrics
+
+import json
+import math
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_cache import CACHE_DIR
+
+# Bump when the persisted state layout changes
+DETECTOR_VERSION = 1
+
+# Metrics scored by default and which deviations count as anomalies:
+# 'up' flags only surges, 'both' flags drops as well
+DEFAULT_METRICS = {
+    'flight_count': 'both',
+    'cancellation_rate': 'up',
+    'delay_intensity': 'up',
+    'avg_air_time': 'both',
+}
+
+# Scale of a normal distribution's mean absolute deviation relative to its std
+MAD_TO_STD = math.sqrt(math.pi / 2)
+
+# Floor of the score's standard deviation: a fraction of the expected value,
+# and an absolute minimum for metrics that sit at zero. A flat metric has a
+# zero residual scale, and any move away from it should still be scored.
+SIGMA_FLOOR_RELATIVE = 0.01
+SIGMA_FLOOR = 1e-3
+
+class MetricBaseline:
+    """
+    O(1) weekly-seasonal EWMA baseline of one daily metric.
+
+    The expected value of a day is ``level + seasonal[weekday]``: ``level``
+    is an EWMA of the deseasonalized values and ``seasonal`` an EWMA per
+    weekday of the value minus the level. ``scale`` is an EWMA of the
+    absolute residual, times MAD_TO_STD to estimate a standard deviation,
+    so the score is a z-like robust deviation. The standard deviation is
+    floored (see SIGMA_FLOOR_RELATIVE), so a metric that has been flat can
+    still be flagged when it moves. Residuals are clipped to
+    ``clip`` scales before they update the state, so one extreme day
+    cannot drag the baseline after itself.
+
+    Early updates use the running mean (weight 1/n instead of alpha) so
+    the first days do not anchor the averages.
+    """
+
+    def __init__(self, alpha=0.1, seasonal_alpha=0.2, scale_alpha=0.1, clip=3.0):
+        self.alpha = alpha
+        self.seasonal_alpha = seasonal_alpha
+        self.scale_alpha = scale_alpha
+        self.clip = clip
+        self.level = None
+        self.seasonal = [0.0] * 7
+        self.seasonal_counts = [0] * 7
+        self.scale = 0.0
+        self.count = 0
+
+    def expected(self, weekday):
+        """Baseline forecast for a day falling on ``weekday`` (0=Monday), or NaN before any update."""
+        return np.nan if self.level is None else self.level + self.seasonal[weekday]
+
+    def score(self, value, weekday):
+        """
+        Robust deviation of a value from the baseline.
+
+        Args:
+            value (float): Observed metric
+            weekday (int): 0=Monday .. 6=Sunday
+
+        Returns:
+            tuple: (expected value, score); the score is NaN until two
+                days were seen
+        """
+        expected = self.expected(weekday)
+        if self.count < 2:
+            return expected, np.nan
+        sigma = max(self.scale * MAD_TO_STD, SIGMA_FLOOR_RELATIVE * abs(expected), SIGMA_FLOOR)
+        return expected, (value - expected) / sigma
+
+    def update(self, value, weekday):
+        """
+        Fold one day's value into the baseline.
+
+        Args:
+            value (float): Observed metric
+            weekday (int): 0=Monday .. 6=Sunday
+        """
+        self.count += 1
+        if self.level is None:
+            self.level = float(value)
+            return
+
+        residual = value - self.expected(weekday)
+        limit = self.clip * self.scale * MAD_TO_STD
+        if self.count > 2 and limit > 0:
+            residual = min(max(residual, -limit), limit)
+        self.scale += max(self.scale_alpha, 1 / (self.count - 1)) * (abs(residual) - self.scale)
+
+        # Split the (clipped) surprise between the level and this weekday's offset
+        self.seasonal_counts[weekday] += 1
+        seasonal_weight = max(self.seasonal_alpha, 1 / self.seasonal_counts[weekday])
+        self.level += max(self.alpha, 1 / self.count) * (1 - seasonal_weight) * residual
+        self.seasonal[weekday] += seasonal_weight * residual
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in ('alpha', 'seasonal_alpha', 'scale_alpha', 'clip', 'level',
+                                                     'seasonal', 'seasonal_counts', 'scale', 'count')}
+
+    @classmethod
+    def from_dict(cls, state):
+        baseline = cls(state['alpha'], state['seasonal_alpha'], state['scale_alpha'], state['clip'])
+        for key in ('level', 'seasonal', 'seasonal_counts', 'scale', 'count'):
+            setattr(baseline, key, state[key])
+        return baseline
+
+class DailyAnomalyDetector:
+    """
+    Scores each new day of the daily time series against per-metric baselines.
+
+    Every day is scored against the state built from the days before it and
+    then folded into that state, so scoring a day costs O(1) per metric and
+    never revisits history. A day is anomalous when any metric's score
+    exceeds ``threshold`` in its flagged direction (see DEFAULT_METRICS),
+    once ``warmup`` days have been seen. The state is a few numbers per
+    metric; save() and load() persist it as JSON, so a daily job can resume
+    where the previous run stopped.
+    """
+
+    def __init__(self, metrics=None, threshold=4.0, warmup=28, alpha=0.1, seasonal_alpha=0.2, clip=3.0):
+        """
+        Args:
+            metrics (dict): Metric name -> 'up' or 'both'; DEFAULT_METRICS when None
+            threshold (float): Score beyond which a metric is anomalous
+            warmup (int): Days seen before anything is flagged
+            alpha (float): EWMA weight of the level and the residual scale
+            seasonal_alpha (float): EWMA weight of the weekday offsets
+            clip (float): Residuals are clipped to this many scales before updating
+        """
+        self.metrics = dict(DEFAULT_METRICS if metrics is None else metrics)
+        self.threshold = threshold
+        self.warmup = warmup
+        self.baselines = {metric: MetricBaseline(alpha, seasonal_alpha, alpha, clip) for metric in self.metrics}
+        self.days_seen = 0
+        self.last_date = None
+
+    def update(self, date, values):
+        """
+        Score one day and fold it into the baselines.
+
+        Args:
+            date (str | pd.Timestamp): The day
+            values (dict | pd.Series): Metric values of that day, e.g. a row
+                of the prepare_time_series_data table
+
+        Returns:
+            dict: 'fl_date', per metric '<metric>', '<metric>_expected' and
+                '<metric>_score', 'anomaly' (bool) and 'anomalous_metrics';
+                None when the day is not after the last scored day
+        """
+        date = pd.Timestamp(date).normalize()
+        if self.last_date is not None and date <= self.last_date:
+            return None
+
+        weekday = date.dayofweek
+        flagged = []
+        result = {'fl_date': date}
+        for metric, direction in self.metrics.items():
+            value = values.get(metric, np.nan)
+            value = np.nan if value is None else float(value)
+            baseline = self.baselines[metric]
+            expected, score = baseline.score(value, weekday)
+            result.update({metric: value, f'{metric}_expected': expected, f'{metric}_score': score})
+            if math.isnan(value):
+                continue
+            if self.days_seen >= self.warmup and (score > self.threshold
+                                                  or direction == 'both' and score < -self.threshold):
+                flagged.append(metric)
+            baseline.update(value, weekday)
+
+        self.days_seen += 1
+        self.last_date = date
+        result['anomaly'] = bool(flagged)
+        result['anomalous_metrics'] = ','.join(flagged)
+        return result
+
+    def update_many(self, ts_data):
+        """
+        Score every day of a daily table that is newer than the last scored day.
+
+        Args:
+            ts_data (pd.DataFrame): Daily table indexed by date, e.g. from
+                prepare_time_series_data or DailyRollupStore.time_series()
+
+        Returns:
+            pd.DataFrame: One row of update() results per new day, indexed by fl_date
+        """
+        ts_data = ts_data.sort_index()
+        if self.last_date is not None:
+            ts_data = ts_data[ts_data.index > self.last_date]
+        rows = [self.update(date, values) for date, values in
+                zip(ts_data.index, ts_data.reindex(columns=list(self.metrics)).to_dict('records'))]
+        columns = ['fl_date'] + [f'{metric}{suffix}' for metric in self.metrics
+                                 for suffix in ('', '_expected', '_score')] + ['anomaly', 'anomalous_metrics']
+        return pd.DataFrame(rows, columns=columns).set_index('fl_date')
+
+    def to_dict(self):
+        """JSON-serializable detector state."""
+        return {
+            'version': DETECTOR_VERSION,
+            'metrics': self.metrics,
+            'threshold': self.threshold,
+            'warmup': self.warmup,
+            'days_seen': self.days_seen,
+            'last_date': None if self.last_date is None else self.last_date.date().isoformat(),
+            'baselines': {metric: baseline.to_dict() for metric, baseline in self.baselines.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        """Rebuild a detector from to_dict() output."""
+        if state.get('version') != DETECTOR_VERSION:
+            raise ValueError(f"Detector state has version {state.get('version')}, expected {DETECTOR_VERSION}")
+        detector = cls(state['metrics'], state['threshold'], state['warmup'])
+        detector.baselines = {metric: MetricBaseline.from_dict(baseline)
+                              for metric, baseline in state['baselines'].items()}
+        detector.days_seen = state['days_seen']
+        detector.last_date = None if state['last_date'] is None else pd.Timestamp(state['last_date'])
+        return detector
+
+    def save(self, path):
+        """
+        Persist the state as JSON via a temporary file.
+
+        Args:
+            path (str): State file path
+
+        Returns:
+            Path: The file written
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        tmp_path.write_text(json.dumps(self.to_dict(), indent=2))
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a state written by save().
+
+        Args:
+            path (str): State file path
+
+        Returns:
+            DailyAnomalyDetector: The resumed detector
+        """
+        return cls.from_dict(json.loads(Path(path).read_text()))
+
+def detect_daily_anomalies(ts_data, state_path=f'{CACHE_DIR}/daily_anomalies.json', verbose=True, **kwargs):
+    """
+    Score the days of ts_data not yet seen by the persisted detector, then save it.
+
+    Args:
+        ts_data (pd.DataFrame): Daily table indexed by date
+        state_path (str): Detector state file; a new detector is started
+            (with ``**kwargs``) when it does not exist
+        verbose (bool): Print the anomalous days
+        **kwargs: DailyAnomalyDetector settings for a new detector
+
+    Returns:
+        pd.DataFrame: Scores of the newly scored days
+    """
+    state_path = Path(state_path)
+    detector = DailyAnomalyDetector.load(state_path) if state_path.exists() else DailyAnomalyDetector(**kwargs)
+    scores = detector.update_many(ts_data)
+    detector.save(state_path)
+
+    if verbose:
+        anomalies = scores[scores['anomaly']]
+        through = '' if detector.last_date is None else f" through {detector.last_date:%Y-%m-%d}"
+        print(f"Scored {len(scores)} new days{through}; {len(anomalies)} anomalous")
+        if len(anomalies):
+            score_columns = [f'{metric}_score' for metric in detector.metrics]
+            print(anomalies[['anomalous_metrics'] + score_columns].round(2))
+    return scores
+
+# Main execution (only runs when script is executed directly)
+if __name__ == "__main__":
+    from daily_rollup import DailyRollupStore
+
+    # Score the days added to the rollup since the previous run
+    detect_daily_anomalies(DailyRollupStore().time_series())
@@ -0,0 +1,104 @@
+# Incrementally maintained daily rollup store for the time-series analysis
+
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from data_cache import CACHE_DIR, parquet_available, read_frame, write_frame_atomic
+from time_series import aggregate_daily_partials, finalize_daily_partials
+
+class DailyRollupStore:
+    """
+    Persisted per-date partial aggregates behind prepare_time_series_data.
+
+    Each row holds the sums, counts and air_time sum of squares for one
+    ``fl_date`` (see time_series.aggregate_daily_partials), so a new batch of
+    flights is folded in by adding its partials to the affected dates only.
+    time_series() finalizes the stored partials into the same table
+    prepare_time_series_data builds from raw rows, ready for
+    seasonal_decomposition_analysis and day_of_week_analysis.
+
+    Batches appended with a ``batch_id`` are recorded, and appending the same
+    id again is a no-op, so a retried ingest job does not double count.
+    """
+
+    def __init__(self, path=f'{CACHE_DIR}/daily_rollup'):
+        path = Path(path)
+        suffix = '.parquet' if parquet_available() else '.pkl'
+        self.path = path if path.suffix in ('.parquet', '.pkl') else path.with_suffix(suffix)
+        self.batches_path = self.path.with_name(self.path.stem + '.batches.json')
+        self.partials = read_frame(self.path) if self.path.exists() else None
+        self.batch_ids = (set(json.loads(self.batches_path.read_text()))
+                          if self.batches_path.exists() else set())
+
+    def __len__(self):
+        return 0 if self.partials is None else len(self.partials)
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        write_frame_atomic(self.partials, self.path)
+        self.batches_path.write_text(json.dumps(sorted(self.batch_ids)))
+
+    def append(self, flights, batch_id=None):
+        """
+        Fold a batch of flight rows into the store and persist it.
+
+        Args:
+            flights (pd.DataFrame): New flight rows with a datetime fl_date
+            batch_id (str): Identifier recorded to make the append idempotent
+
+        Returns:
+            pd.DatetimeIndex: Dates whose aggregates changed
+        """
+        if batch_id is not None and batch_id in self.batch_ids:
+            print(f"Batch '{batch_id}' already in the rollup; skipping")
+            return pd.DatetimeIndex([], name='fl_date')
+
+        new = aggregate_daily_partials(flights)
+        if self.partials is None or self.partials.empty:
+            self.partials = new
+        else:
+            # Stores written before the sums were float64 may hold narrow integer sums
+            self.partials = self.partials.astype(new.dtypes.to_dict())
+            existing = new.index.intersection(self.partials.index)
+            added = new.index.difference(self.partials.index)
+            if len(existing):
+                self.partials.loc[existing] = self.partials.loc[existing] + new.loc[existing]
+            if len(added):
+                self.partials = pd.concat([self.partials, new.loc[added]]).sort_index()
+
+        if batch_id is not None:
+            self.batch_ids.add(batch_id)
+        self._save()
+        return new.index
+
+    def rebuild(self, flights):
+        """
+        Replace the store with partials computed from a full set of flights.
+
+        Args:
+            flights (pd.DataFrame): All flight rows
+
+        Returns:
+            DailyRollupStore: self, for chaining
+        """
+        self.partials = aggregate_daily_partials(flights)
+        self.batch_ids = set()
+        self._save()
+        return self
+
+    def time_series(self, start=None, end=None):
+        """
+        Finalize the stored partials into the prepare_time_series_data table.
+
+        Args:
+            start (str | pd.Timestamp): First date to include
+            end (str | pd.Timestamp): Last date to include
+
+        Returns:
+            pd.DataFrame: Daily aggregated time series data
+        """
+        if self.partials is None:
+            raise ValueError(f"Rollup store {self.path} is empty; append or rebuild first")
+        return finalize_daily_partials(self.partials.loc[start:end])
@@ -0,0 +1,236 @@
+# Columnar cache for the preprocessed flight dataset
+#
+# pandas and data_preprocess are imported inside the functions that load or
+# save frames, so locating an entry (cli.py preprocess --check) stays cheap.
+
+import hashlib
+import importlib.util
+import json
+import os
+import re
+from pathlib import Path
+
+import dataset_settings
+from dataset_settings import resolve_data_file
+from profiling import profile_stage
+
+CACHE_DIR = 'data/.cache'
+
+# Bump when the cached frame layout changes so old entries are ignored
+CACHE_VERSION = 1
+
+# Bytes hashed from each end of the source file for the quick fingerprint
+HASH_BLOCK_SIZE = 1 << 20
+
+def parquet_available():
+    """Whether pyarrow is installed for Parquet reads and writes."""
+    # find_spec avoids importing pyarrow just to name a cache entry
+    return importlib.util.find_spec('pyarrow') is not None
+
+def file_fingerprint(file_path, full_hash=False):
+    """
+    Fingerprint a source file by size, modification time and content hash.
+
+    By default only the first and last HASH_BLOCK_SIZE bytes are hashed, which
+    catches appended or rewritten files without reading a multi-GB CSV.
+
+    Args:
+        file_path (str): Path to the source file
+        full_hash (bool): Hash the whole file instead of its two end blocks
+
+    Returns:
+        dict: Fingerprint with 'size', 'mtime_ns' and 'sha256' keys
+    """
+    stat = os.stat(file_path)
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        if full_hash or stat.st_size <= 2 * HASH_BLOCK_SIZE:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+        else:
+            digest.update(f.read(HASH_BLOCK_SIZE))
+            f.seek(-HASH_BLOCK_SIZE, os.SEEK_END)
+            digest.update(f.read(HASH_BLOCK_SIZE))
+
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': digest.hexdigest()
+    }
+
+def imputation_settings():
+    """
+    Collect the imputation settings that shape fill_missing_values output.
+
+    Returns:
+        dict: Column lists for each imputation strategy
+    """
+    return {
+        'essential': dataset_settings.ESSENTIAL_COLUMNS,
+        'zero': dataset_settings.ZERO_FILL_COLUMNS,
+        'mean': dataset_settings.MEAN_FILL_COLUMNS,
+        'median': dataset_settings.MEDIAN_FILL_COLUMNS
+    }
+
+def cache_key(fingerprint, impute=True, typed=False, analyses=None):
+    """
+    Build the cache key for a source fingerprint and preprocessing options.
+
+    Args:
+        fingerprint (dict): Result of file_fingerprint
+        impute (bool): Whether missing values are filled
+        typed (bool): Whether the typed loading mode is used
+        analyses (list): Column pruning passed to load_flight_data
+
+    Returns:
+        str: Hex digest identifying the cached frame
+    """
+    payload = {
+        'version': CACHE_VERSION,
+        'fingerprint': fingerprint,
+        'imputation': imputation_settings() if impute else None,
+        'typed': typed,
+        'analyses': sorted(analyses) if analyses is not None else None
+    }
+    encoded = json.dumps(payload, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+def write_frame_atomic(df, path):
+    """Write a frame as Parquet or pickle (by suffix) via a temporary file."""
+    tmp_path = path.with_name(path.name + '.tmp')
+    if path.suffix == '.parquet':
+        df.to_parquet(tmp_path)
+    else:
+        df.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+
+def read_frame(path):
+    """Read a frame written by write_frame_atomic."""
+    import pandas as pd
+
+    if path.suffix == '.parquet':
+        return pd.read_parquet(path)
+    return pd.read_pickle(path)
+
+def cache_entry_path(file_path='data/flight_data_2024.csv', impute=True, cache_dir=CACHE_DIR, typed=False,
+                     analyses=None, full_hash=False):
+    """
+    Locate the cache entry for a source file and options without loading it.
+
+    Args:
+        file_path (str): Path to the CSV file
+        impute (bool): Preprocessed (True) or raw (False) entry
+        cache_dir (str): Directory holding cache entries
+        typed (bool): Whether the typed loading mode is used
+        analyses (list): Column pruning passed to load_flight_data
+        full_hash (bool): Fingerprint the whole file rather than its end blocks
+
+    Returns:
+        tuple: (resolved data file, Path of the entry, which may not exist yet)
+    """
+    data_file = resolve_data_file(file_path)
+    fingerprint = file_fingerprint(data_file, full_hash)
+    key = cache_key(fingerprint, impute, typed, analyses)
+    # The source tag lets drop_stale_entries tell other versions of the file
+    # apart from entries for other options of the same version
+    source = hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()
+    suffix = '.parquet' if parquet_available() else '.pkl'
+    stem = Path(data_file).stem + ('' if impute else '-raw')
+    return data_file, Path(cache_dir) / f'{stem}-{source[:8]}-{key[:16]}{suffix}'
+
+def drop_stale_entries(entry, kind=''):
+    """
+    Remove entries built from other versions of an entry's source file.
+
+    Entries for the same source version with other options (typed,
+    analyses, imputation) are kept, and so are in-flight ``.tmp`` files.
+
+    Args:
+        entry (Path): Current entry from cache_entry_path
+        kind (str): Name suffix of derived entries and their sidecars, e.g. '-cube'
+
+    Returns:
+        int: Number of files removed
+    """
+    stem, source, _ = entry.stem.rsplit('-', 2)
+    pattern = re.compile(rf'{re.escape(stem)}-([0-9a-f]{{8}})-[0-9a-f]{{16}}{re.escape(kind)}\.')
+    removed = 0
+    for path in entry.parent.glob(f'{stem}-*{kind}.*'):
+        match = pattern.match(path.name)
+        if match and match.group(1) != source and not path.name.endswith('.tmp'):
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+def load_cached_flight_data(file_path='data/flight_data_2024.csv', impute=True, cache_dir=CACHE_DIR,
+                            refresh=False, verbose=False, typed=False, analyses=None, engine=None,
+                            full_hash=False):
+    """
+    Load the flight dataset through a persistent fingerprinted cache.
+
+    On a miss the data is loaded (and imputed when ``impute=True``) exactly as
+    preprocess_flight_data / load_flight_data would, then written to
+    ``cache_dir`` as Parquet (pickle when pyarrow is not installed). A changed
+    file or changed imputation settings give a new key, so they invalidate
+    the cache automatically; entries built from older versions of the file
+    are then removed.
+
+    Args:
+        file_path (str): Path to the CSV file
+        impute (bool): Return preprocessed data; False caches the raw load
+        cache_dir (str): Directory holding cache entries
+        refresh (bool): Ignore any existing entry and rebuild it
+        verbose (bool): Print the cache entry on a hit and dataset information on a miss
+        typed (bool): Use the typed loading mode
+        analyses (list): Only load the columns these analyses need
+        engine (str): pandas CSV parser engine used on a miss
+        full_hash (bool): Fingerprint the whole file rather than its end blocks
+
+    Returns:
+        pd.DataFrame: Preprocessed (or raw) flight dataset
+    """
+    from data_preprocess import load_flight_data, preprocess_flight_data
+    # The cache key doubles as the frame's fingerprint for memoized analyses
+    from memoize import register_frame
+
+    data_file, cache_path = cache_entry_path(file_path, impute, cache_dir, typed, analyses, full_hash)
+
+    if cache_path.exists() and not refresh:
+        if verbose:
+            print(f'Using cached data: {cache_path}')
+        with profile_stage('read_cache') as stage:
+            df = read_frame(cache_path)
+            stage['rows'] = len(df)
+        return register_frame(df, cache_path.stem)
+
+    if impute:
+        df = preprocess_flight_data(data_file, verbose=verbose, typed=typed, analyses=analyses, engine=engine)
+    else:
+        df = load_flight_data(data_file, typed=typed, analyses=analyses, engine=engine)
+
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        write_frame_atomic(df, cache_path)
+    except OSError as e:
+        print(f'Warning: could not write cache entry {cache_path}: {e}')
+        return register_frame(df, cache_path.stem)
+
+    drop_stale_entries(cache_path)
+    return register_frame(df, cache_path.stem)
+
+def clear_cache(cache_dir=CACHE_DIR):
+    """
+    Remove every cache entry.
+
+    Args:
+        cache_dir (str): Directory holding cache entries
+
+    Returns:
+        int: Number of files removed
+    """
+    removed = 0
+    for path in Path(cache_dir).glob('*'):
+        if path.is_file():
+            path.unlink()
+            removed += 1
+    return removed
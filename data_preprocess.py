@@ -1,61 +1,333 @@
+import numpy as np
 import pandas as pd
 import os
-import glob
-from pathlib import Path
+import contextlib
 
-def load_flight_data(file_path='data/flight_data_2024.csv'):
+from dataset_settings import (
+    ESSENTIAL_COLUMNS, MEAN_FILL_COLUMNS, MEDIAN_FILL_COLUMNS, ZERO_FILL_COLUMNS, resolve_data_file
+)
+from profiling import profile_stage, profiled
+
+# Explicit column types used by the typed loading mode
+FLIGHT_DTYPES = {
+    'year': 'int16',
+    'month': 'int8',
+    'day_of_month': 'int8',
+    'day_of_week': 'int8',
+    'op_unique_carrier': 'category',
+    'op_carrier_fl_num': 'float64',
+    'origin': 'category',
+    'origin_city_name': 'category',
+    'origin_state_nm': 'category',
+    'dest': 'category',
+    'dest_city_name': 'category',
+    'dest_state_nm': 'category',
+    'crs_dep_time': 'float64',
+    'dep_time': 'float64',
+    'dep_delay': 'float64',
+    'taxi_out': 'float64',
+    'wheels_off': 'float64',
+    'wheels_on': 'float64',
+    'taxi_in': 'float64',
+    'crs_arr_time': 'float64',
+    'arr_time': 'float64',
+    'arr_delay': 'float64',
+    'cancelled': 'int8',
+    'cancellation_code': 'category',
+    'diverted': 'int8',
+    'crs_elapsed_time': 'float64',
+    'actual_elapsed_time': 'float64',
+    'air_time': 'float64',
+    'distance': 'float64',
+    'carrier_delay': 'float64',
+    'weather_delay': 'float64',
+    'nas_delay': 'float64',
+    'security_delay': 'float64',
+    'late_aircraft_delay': 'float64',
+}
+
+# Columns each analysis stage reads from the raw file
+ANALYSIS_COLUMNS = {
+    'preprocess': [
+        'fl_date', 'month', 'day_of_week', 'origin', 'dep_time', 'taxi_out',
+        'wheels_off', 'wheels_on', 'taxi_in', 'air_time', 'distance',
+        'weather_delay', 'late_aircraft_delay'
+    ],
+    'descriptive': [
+        'month', 'day_of_week', 'origin', 'cancelled', 'air_time', 'taxi_out',
+        'taxi_in', 'distance', 'weather_delay', 'late_aircraft_delay'
+    ],
+    'time_series': [
+        'fl_date', 'origin', 'cancelled', 'dep_time', 'air_time', 'distance',
+        'weather_delay', 'late_aircraft_delay', 'taxi_out', 'taxi_in'
+    ],
+}
+
+DAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+# fl_date layouts seen in BTS and Kaggle exports, tried in order
+DATE_FORMATS = ['%Y-%m-%d', '%m/%d/%Y %I:%M:%S %p', '%m/%d/%Y', '%Y-%m-%d %H:%M:%S', '%Y%m%d']
+
+# Clock times stored as hhmm numbers, in the order they happen
+HHMM_COLUMNS = ['dep_time', 'wheels_off', 'wheels_on']
+
+# hhmm columns in the origin airport's local time; wheels_on is in the
+# destination's, so it cannot be placed on the departure's timeline
+ORIGIN_CLOCK_COLUMNS = ['dep_time', 'wheels_off']
+
+def select_columns(available, analyses=None):
+    """
+    Select the columns needed by the requested analyses.
+    
+    Args:
+        available (list): Column names present in the source file
+        analyses (list): Keys of ANALYSIS_COLUMNS, or None for every column
+    
+    Returns:
+        list: Columns to read, in file order
+    """
+    if analyses is None:
+        return list(available)
+    
+    unknown = [name for name in analyses if name not in ANALYSIS_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown analyses {unknown}; expected any of {list(ANALYSIS_COLUMNS)}")
+    
+    wanted = set(ANALYSIS_COLUMNS['preprocess'])
+    for name in analyses:
+        wanted.update(ANALYSIS_COLUMNS[name])
+    return [col for col in available if col in wanted]
+
+def load_flight_data(file_path='data/flight_data_2024.csv', typed=False, analyses=None, engine=None,
+                     months=None, origins=None, time_features=False):
     """
     Load flight dataset from CSV file with Kaggle environment auto-detection.
     
+    With ``typed=True`` the file is read against FLIGHT_DTYPES instead of
+    letting pandas infer every column: airport codes and ``day_name`` become
+    categoricals and ``cancelled`` is stored as int8.
+    
+    A directory is read as a year/month partitioned dataset (see
+    partitioned_dataset), with the month and origin filters pushed down to
+    the partitions and Parquet row groups. A single file is read whole and
+    then filtered.
+    
     Args:
-        file_path (str): Path to the CSV file
+        file_path (str): Path to the CSV file or partitioned dataset directory
+        typed (bool): Read with the explicit dtype map
+        analyses (list): Only read the columns these analyses need
+            (keys of ANALYSIS_COLUMNS); None reads every column
+        engine (str): pandas CSV parser engine, e.g. 'pyarrow'
+        months: Month or inclusive (first, last) month range such as
+            ('2024-01', '2024-03'); None loads every month
+        origins (list): Origin airport codes to keep; None keeps all
+        time_features (bool): Add the minutes-since-midnight, timestamp and
+            dep_hour columns of add_time_features
     
     Returns:
         pd.DataFrame: Loaded and processed dataset
     """
-    # Auto-detect data file (Kaggle mount or local)
-    data_file = None
-    if os.path.exists('/kaggle/input'):
-        matches = glob.glob('/kaggle/input/**/flight_data_2024.csv', recursive=True)
-        if matches:
-            data_file = matches[0]
-    if data_file is None:
-        local_path = Path(file_path)
-        if local_path.exists():
-            data_file = str(local_path)
-        else:
-            # Fallback to original parameter
-            data_file = file_path
+    data_file = resolve_data_file(file_path)
+    
+    if os.path.isdir(data_file):
+        from partitioned_dataset import load_partitioned_flight_data
+        return load_partitioned_flight_data(data_file, months, origins, typed, analyses, time_features)
     
     print(f'Using data file: {data_file}')
-    df = pd.read_csv(data_file)
+    with profile_stage('read_csv') as stage:
+        df = pd.read_csv(data_file, **build_read_kwargs(data_file, typed, analyses, engine))
+        stage['rows'] = len(df)
+    
+    df = add_temporal_columns(df, typed, time_features)
+    if months is not None or origins is not None:
+        from partitioned_dataset import filter_flights
+        df = filter_flights(df, months, origins)
+    return df
+
+def build_read_kwargs(data_file, typed=False, analyses=None, engine=None):
+    """
+    Build the pd.read_csv keyword arguments for the requested loading mode.
     
-    # Enhanced data processing
+    Args:
+        data_file (str): Resolved path to the CSV file
+        typed (bool): Read with the explicit dtype map
+        analyses (list): Only read the columns these analyses need
+        engine (str): pandas CSV parser engine
+    
+    Returns:
+        dict: Keyword arguments for pd.read_csv
+    """
+    read_kwargs = {}
+    if engine is not None:
+        read_kwargs['engine'] = engine
+    if typed or analyses is not None:
+        header = pd.read_csv(data_file, nrows=0).columns
+        usecols = select_columns(header, analyses)
+        read_kwargs['usecols'] = usecols
+        if typed:
+            read_kwargs['dtype'] = {col: FLIGHT_DTYPES[col] for col in usecols if col in FLIGHT_DTYPES}
+    return read_kwargs
+
+def parse_flight_dates(values):
+    """
+    Parse flight dates, converting each distinct value only once.
+    
+    A year of flights has a few hundred distinct dates among millions of
+    rows, so the distinct values are parsed with the first DATE_FORMATS
+    layout that fits all of them (falling back to per-value inference) and
+    the result is broadcast back to the rows.
+    
+    Args:
+        values (pd.Series): Date strings, or already parsed datetimes
+    
+    Returns:
+        pd.Series: datetime64[ns] dates; unparseable values become NaT
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    
+    codes, uniques = pd.factorize(values)
+    parsed = None
+    for date_format in DATE_FORMATS:
+        candidate = pd.to_datetime(uniques, format=date_format, errors='coerce')
+        if not candidate.isna().any():
+            parsed = candidate
+            break
+    if parsed is None:
+        parsed = pd.to_datetime(uniques, format='mixed', errors='coerce')
+    
+    # Code -1 (missing) picks the NaT appended at the end
+    lookup = np.append(parsed.to_numpy(dtype='datetime64[ns]'), np.datetime64('NaT', 'ns'))
+    return pd.Series(lookup[codes], index=values.index, name=values.name)
+
+def hhmm_to_minutes(values):
+    """
+    Convert hhmm clock times (e.g. 1330.0, or 2400 for midnight) to minutes since midnight.
+    
+    Args:
+        values (pd.Series): hhmm numbers
+    
+    Returns:
+        pd.Series: Minutes in [0, 1440) as float64; missing or invalid
+            times (minutes >= 60, hours > 24) are NaN
+    """
+    hhmm = pd.to_numeric(values, errors='coerce').to_numpy(dtype='float64')
+    hours, minutes = np.divmod(hhmm, 100)
+    valid = (hhmm >= 0) & (hours <= 24) & (minutes < 60)
+    return pd.Series(np.where(valid, (hours * 60 + minutes) % 1440, np.nan), index=values.index)
+
+@profiled()
+def add_time_features(df, timestamps=True):
+    """
+    Add minutes-since-midnight, timestamp and departure-hour columns for the hhmm clock fields.
+    
+    For each of HHMM_COLUMNS present, ``<col>_minutes`` holds the local
+    clock time in minutes. For ORIGIN_CLOCK_COLUMNS, ``<col>_ts`` is the
+    time-zone-naive timestamp in the origin's local time, on ``fl_date``.
+    Events after midnight roll over to the next day by a heuristic: a
+    departure more than 12 hours before its scheduled ``crs_dep_time`` (a
+    delay past midnight), or wheels off earlier than the departure.
+    wheels_on is in the destination's local time and the data has no time
+    zones, so it only gets minutes. ``dep_hour`` (0-23, nullable) supports
+    hour-level analyses.
+    
+    Run it before fill_missing_values, so imputed hhmm values (which are
+    means, not clock times) stay NaN here.
+    
+    Args:
+        df (pd.DataFrame): Flight rows with parsed ``fl_date``
+        timestamps (bool): Also add the ``<col>_ts`` columns
+    
+    Returns:
+        pd.DataFrame: The same frame with the time columns added
+    """
+    timestamps = timestamps and 'fl_date' in df.columns
+    previous = hhmm_to_minutes(df['crs_dep_time']).to_numpy() if 'crs_dep_time' in df.columns else None
+    day_offset = np.zeros(len(df))
+    if timestamps:
+        days = df['fl_date'].to_numpy(dtype='datetime64[ns]')
+    
+    for col in HHMM_COLUMNS:
+        if col not in df.columns:
+            continue
+        minutes = hhmm_to_minutes(df[col]).to_numpy()
+        df[f'{col}_minutes'] = minutes
+        if col not in ORIGIN_CLOCK_COLUMNS:
+            continue
+        
+        if previous is not None:
+            gap = minutes - previous
+            if col == 'dep_time':
+                # Against the schedule a departure can slip past midnight or leave early the day before
+                day_offset += (gap < -720).astype('float64') - (gap > 720)
+            else:
+                day_offset += gap < 0
+        if timestamps:
+            # NaN minutes cast to NaT nanoseconds, and NaT plus anything stays NaT
+            offsets = ((minutes + day_offset * 1440) * 60e9).astype('timedelta64[ns]')
+            df[f'{col}_ts'] = days + offsets
+        previous = np.where(np.isnan(minutes), previous, minutes) if previous is not None else minutes
+    
+    if 'dep_time_minutes' in df.columns:
+        df['dep_hour'] = pd.array(df['dep_time_minutes'] // 60, dtype='Int8')
+    return df
+
+@profiled()
+def add_temporal_columns(df, typed=False, time_features=False):
+    """
+    Parse ``fl_date`` and add the month, day_of_week and day_name columns.
+    
+    Args:
+        df (pd.DataFrame): Flight rows as read from the source file
+        typed (bool): Store day_name as a categorical
+        time_features (bool): Also run add_time_features on the hhmm columns
+    
+    Returns:
+        pd.DataFrame: The same frame with the temporal columns added
+    """
     # Convert date column
     if 'fl_date' in df.columns:
-        df['fl_date'] = pd.to_datetime(df['fl_date'], errors='coerce')
+        df['fl_date'] = parse_flight_dates(df['fl_date'])
         
         # Ensure month column exists
         if 'month' not in df.columns:
-            df['month'] = df['fl_date'].dt.month
+            month = df['fl_date'].dt.month
+            df['month'] = month.astype('int8') if typed else month
         
         # Ensure day_of_week column exists
         if 'day_of_week' not in df.columns:
-            df['day_of_week'] = df['fl_date'].dt.dayofweek + 1
+            day_of_week = df['fl_date'].dt.dayofweek + 1
+            df['day_of_week'] = day_of_week.astype('int8') if typed else day_of_week
     
-    # Create readable day names
-    dow_map = {1:'Mon', 2:'Tue', 3:'Wed', 4:'Thu', 5:'Fri', 6:'Sat', 7:'Sun'}
-    df['day_name'] = df['day_of_week'].map(dow_map).fillna('Unknown')
+    # Create readable day names from the day_of_week codes (1=Mon .. 7=Sun); anything else is 'Unknown'
+    codes = df['day_of_week'].fillna(0).to_numpy(dtype='int64') - 1
+    codes = np.where((codes >= 0) & (codes <= 6), codes, len(DAY_NAMES))
+    if typed:
+        df['day_name'] = pd.Categorical.from_codes(codes, categories=DAY_NAMES + ['Unknown'])
+    else:
+        df['day_name'] = np.array(DAY_NAMES + ['Unknown'], dtype=object)[codes]
     
+    if time_features:
+        add_time_features(df)
     return df
 
-def display_dataset_info(df):
+def display_dataset_info(df, approximate=False):
     print("Dataset Information:")
     print(df.info())
     print("\nFirst 5 Rows of the Dataset:")
     print(df.head())
-    print("\nStatistical Summary:")
-    print(df.describe().round(2))
+    if approximate:
+        from sketches import HyperLogLog, approximate_describe
+        
+        # Sketched quartiles and distinct counts instead of sorting or hashing every value exactly
+        numeric = df.select_dtypes('number').columns
+        print("\nStatistical Summary (approximate quartiles):")
+        print(approximate_describe(df, numeric).round(2))
+        print("\nApproximate Distinct Values:")
+        print(pd.Series({col: HyperLogLog().update(df[col]).estimate() for col in df.columns}))
+    else:
+        print("\nStatistical Summary:")
+        print(df.describe().round(2))
 
 def check_missing_values(df):
     missing_values = df.isnull().sum()
@@ -63,47 +335,121 @@ def check_missing_values(df):
     print(missing_values)
     return missing_values
 
-def fill_missing_values(df):
+def copy_on_write(enabled=True):
+    """
+    Context manager running its body under pandas copy-on-write semantics.
+    
+    Under copy-on-write, derived frames share memory with their parent until
+    one of them is modified, which makes shallow copies safe. The previous
+    setting is restored on exit, but pandas 2.x does not support switching
+    modes mid-process: frames built inside the block may still share memory
+    with each other afterwards, so do not modify them in place outside it.
+    
+    Args:
+        enabled (bool): False returns a no-op context
+    
+    Returns:
+        contextlib.AbstractContextManager: The scope
+    """
+    if not enabled:
+        return contextlib.nullcontext()
+    return pd.option_context('mode.copy_on_write', True)
+
+def drop_incomplete_rows(df, subset):
+    """
+    Drop rows missing any ``subset`` column, in place and one column at a time.
+    
+    Each column is popped from ``df`` and filtered, and the filtered
+    columns are assigned back once all of them are done. Whether a popped
+    column's memory is released before the next one is filtered depends on
+    pandas' block layout (columns consolidated into one block are freed
+    together), so this does not guarantee a lower peak than ``dropna``.
+    
+    Args:
+        df (pd.DataFrame): Dataset to filter in place
+        subset (list): Columns that must be present
+    """
+    keep = df[subset].notna().all(axis=1).to_numpy()
+    if keep.all():
+        return
+    
+    columns = list(df.columns)
+    kept = {}
+    for col in columns:
+        # Filter the underlying array so no per-column index is built
+        kept[col] = df.pop(col).array[keep]
+    df.index = df.index[keep]
+    for col in columns:
+        df[col] = kept.pop(col)
+
+@profiled()
+def fill_missing_values(df, fill_values=None, inplace=False, approximate=False):
     """
     Fill missing values with mean and median strategies with enhanced error handling.
     
     Args:
         df (pd.DataFrame): Dataset with missing values
+        fill_values (dict): Precomputed column fill values; when omitted the
+            means and medians are computed from ``df`` itself
+        inplace (bool): Drop and fill rows of ``df`` itself instead of
+            working on a copy
+        approximate (bool): Estimate the medians with a KLL sketch instead
+            of an exact median (see sketches.KLLSketch for the error bound)
     
     Returns:
-        pd.DataFrame: Dataset with filled missing values
+        pd.DataFrame: Dataset with filled missing values (``df`` itself
+        when ``inplace=True``)
     """
-    # Create a copy to avoid modifying the original
-    df_filled = df.copy()
+    if inplace:
+        df_filled = df
+    elif pd.options.mode.copy_on_write:
+        # Copy-on-write makes a shallow copy safe: columns are only copied when modified
+        df_filled = df.copy(deep=False)
+    else:
+        # Create a copy to avoid modifying the original
+        df_filled = df.copy()
     
     # Drop rows missing essential data (only columns that exist)
-    essential_cols = ['origin', 'dep_time', 'distance', 'air_time']
-    existing_essentials = [c for c in essential_cols if c in df_filled.columns]
+    existing_essentials = [c for c in ESSENTIAL_COLUMNS if c in df_filled.columns]
     if existing_essentials:
-        df_filled = df_filled.dropna(subset=existing_essentials)
+        if inplace:
+            drop_incomplete_rows(df_filled, existing_essentials)
+        else:
+            df_filled = df_filled.dropna(subset=existing_essentials)
     
     # Fill NaN delay values with 0 (no delay) — defensive check
-    for col in ['weather_delay', 'late_aircraft_delay']:
+    for col in ZERO_FILL_COLUMNS:
         if col in df_filled.columns:
             df_filled[col] = df_filled[col].fillna(0)
         else:
             df_filled[col] = 0
     
     # Fill missing values with appropriate strategies
-    fill_values = {}
-    
-    # Fill with mean for these columns
-    for col in ['dep_time', 'taxi_out', 'wheels_off', 'wheels_on', 'taxi_in']:
-        if col in df_filled.columns:
-            fill_values[col] = df_filled[col].mean()
-    
-    # Fill with median for these columns
-    for col in ['air_time']:
-        if col in df_filled.columns:
-            fill_values[col] = df_filled[col].median()
+    if fill_values is None:
+        fill_values = {}
+        
+        # Fill with mean for these columns
+        for col in MEAN_FILL_COLUMNS:
+            if col in df_filled.columns:
+                fill_values[col] = df_filled[col].mean()
+        
+        # Fill with median for these columns
+        for col in MEDIAN_FILL_COLUMNS:
+            if col in df_filled.columns:
+                if approximate:
+                    from sketches import KLLSketch
+                    fill_values[col] = KLLSketch(seed=0).update(df_filled[col]).median()
+                else:
+                    fill_values[col] = df_filled[col].median()
     
-    # Fill all at once
-    df_filled = df_filled.fillna(value=fill_values)
+    if inplace:
+        # Fill and reassign one column at a time rather than building a filled frame
+        for col, value in fill_values.items():
+            if col in df_filled.columns:
+                df_filled[col] = df_filled[col].fillna(value)
+    else:
+        # Fill all at once
+        df_filled = df_filled.fillna(value=fill_values)
     
     return df_filled
 
@@ -113,19 +459,28 @@ def verify_imputation(df):
     print(missing_after)
     return missing_after
 
-def preprocess_flight_data(file_path='data/flight_data_2024.csv', verbose=True):
-    # Load the dataset
-    df = load_flight_data(file_path)
-    
-    if verbose:
-        # Display basic information
-        display_dataset_info(df)
+def preprocess_flight_data(file_path='data/flight_data_2024.csv', verbose=True, typed=False,
+                           analyses=None, engine=None, copy_free=False, months=None, origins=None,
+                           approximate=False, time_features=False):
+    # copy_free: copy-on-write plus in-place imputation, so no full-frame
+    # copies after loading. The returned frame is built under copy-on-write
+    # and may share memory with intermediate frames, so callers must not
+    # modify it in place (``inplace=True``, ``df.loc[...] = ...``); assign
+    # new columns or work on a ``.copy()`` instead
+    with copy_on_write(copy_free):
+        # Load the dataset
+        df = load_flight_data(file_path, typed=typed, analyses=analyses, engine=engine, months=months,
+                              origins=origins, time_features=time_features)
         
-        # Check for missing values
-        check_missing_values(df)
-    
-    # Fill missing values
-    df_processed = fill_missing_values(df)
+        if verbose:
+            # Display basic information
+            display_dataset_info(df, approximate)
+            
+            # Check for missing values
+            check_missing_values(df)
+        
+        # Fill missing values
+        df_processed = fill_missing_values(df, inplace=copy_free, approximate=approximate)
     
     if verbose:
         # Verify imputation
@@ -135,9 +490,11 @@ def preprocess_flight_data(file_path='data/flight_data_2024.csv', verbose=True):
 
 # Main execution (only runs when script is executed directly)
 if __name__ == "__main__":
-    # Run the complete preprocessing pipeline
+    from data_cache import load_cached_flight_data
+    
+    # Run the complete preprocessing pipeline (reuses the cached result when the source is unchanged)
     file_path = 'data/flight_data_2024.csv'
-    processed_df = preprocess_flight_data(file_path)
+    processed_df = load_cached_flight_data(file_path, verbose=True)
     
     print("\nPreprocessing completed successfully!")
     print(f"Final dataset shape: {processed_df.shape}")
\ No newline at end of file
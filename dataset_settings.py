@@ -0,0 +1,37 @@
+# Dataset location and imputation settings shared by preprocessing and the cache
+#
+# Kept free of pandas so cache probes (cli.py preprocess --check) can locate
+# entries without importing it.
+
+import glob
+import os
+from pathlib import Path
+
+# Imputation settings used by fill_missing_values
+ESSENTIAL_COLUMNS = ['origin', 'dep_time', 'distance', 'air_time']
+ZERO_FILL_COLUMNS = ['weather_delay', 'late_aircraft_delay']
+MEAN_FILL_COLUMNS = ['dep_time', 'taxi_out', 'wheels_off', 'wheels_on', 'taxi_in']
+MEDIAN_FILL_COLUMNS = ['air_time']
+
+def resolve_data_file(file_path='data/flight_data_2024.csv'):
+    """
+    Resolve the flight data file, falling back to a Kaggle input mount.
+    
+    A file that exists at file_path (e.g. one written by synthetic_data) is
+    used as is; otherwise the Kaggle input directory is searched.
+    
+    Args:
+        file_path (str): Path to the CSV file
+    
+    Returns:
+        str: Path of the file to read
+    """
+    local_path = Path(file_path)
+    if local_path.exists():
+        return str(local_path)
+    if os.path.exists('/kaggle/input'):
+        matches = glob.glob('/kaggle/input/**/flight_data_2024.csv', recursive=True)
+        if matches:
+            return matches[0]
+    # Fallback to original parameter
+    return file_path
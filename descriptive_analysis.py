@@ -1,38 +1,48 @@
-from data_preprocess import preprocess_flight_data
+from data_cache import load_cached_flight_data
+from fused_analysis import perform_fused_analysis
+from memoize import memoized
+from profiling import profile_stage, profiled
+from sketches import approximate_describe
 
 
 # Descriptive Analysis
-def analyze_flights_by_time(df):
-    flights_per_dow = df.groupby('day_of_week').size()
-    flights_per_month = df.groupby('month').size()
+@profiled()
+def analyze_flights_by_time(df, verbose=True):
+    flights_per_dow = df.groupby('day_of_week', observed=True).size()
+    flights_per_month = df.groupby('month', observed=True).size()
     
-    print("\nFlights per Day of Week:")
-    print(flights_per_dow)
-    print("\nFlights per Month:")
-    print(flights_per_month)
+    if verbose:
+        print("\nFlights per Day of Week:")
+        print(flights_per_dow)
+        print("\nFlights per Month:")
+        print(flights_per_month)
     
     return {
         'flights_per_dow': flights_per_dow,
         'flights_per_month': flights_per_month
     }
 
-def analyze_flights_by_airport(df):
+@profiled()
+def analyze_flights_by_airport(df, verbose=True):
     flights_per_airport = df['origin'].value_counts()
-    print("\nFlights per Airport:")
-    print(flights_per_airport)
+    if verbose:
+        print("\nFlights per Airport:")
+        print(flights_per_airport)
     
     return flights_per_airport
 
-def analyze_cancellations(df):
+@profiled()
+def analyze_cancellations(df, verbose=True):
     cancel_rate = df['cancelled'].mean() * 100
-    cancel_by_month = df[df['cancelled'] == 1].groupby('month').size()
-    cancel_by_origin = df[df['cancelled'] == 1].groupby('origin').size()
+    cancel_by_month = df[df['cancelled'] == 1].groupby('month', observed=True).size()
+    cancel_by_origin = df[df['cancelled'] == 1].groupby('origin', observed=True).size()
     
-    print(f"\nCancellation Rate: {cancel_rate:.2f}%")
-    print("\nCancellations by Month:")
-    print(cancel_by_month)
-    print("\nCancellations by Origin:")
-    print(cancel_by_origin)
+    if verbose:
+        print(f"\nCancellation Rate: {cancel_rate:.2f}%")
+        print("\nCancellations by Month:")
+        print(cancel_by_month)
+        print("\nCancellations by Origin:")
+        print(cancel_by_origin)
     
     return {
         'cancel_rate': cancel_rate,
@@ -40,57 +50,82 @@ def analyze_cancellations(df):
         'cancel_by_origin': cancel_by_origin
     }
 
-def analyze_flight_duration_distance(df):
+@profiled()
+def analyze_flight_duration_distance(df, approximate=False, verbose=True):
     duration_cols = ['air_time', 'taxi_out', 'taxi_in', 'distance']
-    summary_stats = df[duration_cols].describe().round(2)
+    if approximate:
+        # Sketched quartiles instead of full sorts (see sketches.KLLSketch for the error bound)
+        summary_stats = approximate_describe(df, duration_cols).round(2)
+    else:
+        summary_stats = df[duration_cols].describe().round(2)
     
-    print("\nFlight Duration & Distance Distribution:")
-    print(summary_stats)
+    if verbose:
+        print("\nFlight Duration & Distance Distribution:")
+        print(summary_stats)
     
     return summary_stats
 
-def analyze_delays(df):
+@profiled()
+def analyze_delays(df, approximate=False, verbose=True):
     delay_cols = ['weather_delay', 'late_aircraft_delay']
-    delay_summary = df[delay_cols].describe().round(2)
+    if approximate:
+        delay_summary = approximate_describe(df, delay_cols).round(2)
+    else:
+        delay_summary = df[delay_cols].describe().round(2)
     total_delay = df[delay_cols].sum()
     
-    print("\nDelay Descriptive Statistics:")
-    print(delay_summary)
-    print("\nTotal Delays:")
-    print(total_delay)
+    if verbose:
+        print("\nDelay Descriptive Statistics:")
+        print(delay_summary)
+        print("\nTotal Delays:")
+        print(total_delay)
     
     return {
         'delay_summary': delay_summary,
         'total_delay': total_delay
     }
 
-def analyze_airport_performance(df):
-    airport_summary = df.groupby('origin').agg({
+@memoized()
+def _airport_summary(df):
+    return df.groupby('origin', observed=True).agg({
         'air_time': 'mean',
         'taxi_out': 'mean',
         'weather_delay': 'mean',
         'late_aircraft_delay': 'mean'
     }).round(2).sort_values('weather_delay', ascending=False)
+
+@profiled()
+def analyze_airport_performance(df, verbose=True):
+    airport_summary = _airport_summary(df)
     
-    print("\nAirport Performance Summary:")
-    print(airport_summary)
+    if verbose:
+        print("\nAirport Performance Summary:")
+        print(airport_summary)
     
     return airport_summary
 
-def analyze_monthly_delays(df):
-    monthly_delay = df.groupby('month')[['weather_delay', 'late_aircraft_delay']].mean().round(2)
+@memoized()
+def _monthly_delay_means(df):
+    return df.groupby('month', observed=True)[['weather_delay', 'late_aircraft_delay']].mean().round(2)
+
+@profiled()
+def analyze_monthly_delays(df, verbose=True):
+    monthly_delay = _monthly_delay_means(df)
     
-    print("\nMonthly Delay Analysis:")
-    print(monthly_delay)
+    if verbose:
+        print("\nMonthly Delay Analysis:")
+        print(monthly_delay)
     
     return monthly_delay
 
-def display_basic_stats(df):
+@profiled()
+def display_basic_stats(df, verbose=True):
     """
     Display basic statistics about the flight dataset.
     
     Args:
         df (pd.DataFrame): Flight dataset
+        verbose (bool): Print the statistics
     
     Returns:
         dict: Dictionary containing basic statistics
@@ -101,34 +136,52 @@ def display_basic_stats(df):
         'average_distance': round(df['distance'].mean(), 2) if 'distance' in df.columns else 0
     }
     
-    print(f"Total flights: {stats['total_flights']}")
-    print(f"Cancelled flights: {stats['cancelled_flights']}")
-    print(f"Average distance: {stats['average_distance']} miles")
+    if verbose:
+        print(f"Total flights: {stats['total_flights']}")
+        print(f"Cancelled flights: {stats['cancelled_flights']}")
+        print(f"Average distance: {stats['average_distance']} miles")
     
     return stats
 
-def perform_complete_analysis(df):
+def perform_complete_analysis(df, fused=False, workers=None, shard_by='month', approximate=False, verbose=True):
     """
     Perform complete descriptive analysis of flight dataset.
     
     Args:
         df (pd.DataFrame): Flight dataset
+        fused (bool): Compute every section from one shared groupby instead
+            of running each analysis function separately
+        workers (int): Analyse shards in this many processes and merge the
+            partial results (see parallel_pipeline)
+        shard_by (str): 'month', 'rows' or 'origin' when workers is set
+        approximate (bool): Estimate the describe() quartiles with KLL
+            sketches instead of sorting every column; with workers, the
+            shards' sketches are merged
+        verbose (bool): Print the results
     
     Returns:
         dict: Dictionary containing all analysis results
     """
+    if workers is not None:
+        from parallel_pipeline import parallel_complete_analysis
+        with profile_stage('parallel_complete_analysis', rows=len(df)):
+            return parallel_complete_analysis(df, workers, shard_by, verbose=verbose, approximate=approximate)
+    if fused:
+        with profile_stage('perform_fused_analysis', rows=len(df)):
+            return perform_fused_analysis(df, verbose=verbose, approximate=approximate)
+    
     results = {}
     
     # Display basic statistics first
-    results['basic_stats'] = display_basic_stats(df)
+    results['basic_stats'] = display_basic_stats(df, verbose)
     
-    results['time_analysis'] = analyze_flights_by_time(df)
-    results['airport_analysis'] = analyze_flights_by_airport(df)
-    results['cancellation_analysis'] = analyze_cancellations(df)
-    results['duration_analysis'] = analyze_flight_duration_distance(df)
-    results['delay_analysis'] = analyze_delays(df)
-    results['airport_performance'] = analyze_airport_performance(df)
-    results['monthly_delays'] = analyze_monthly_delays(df)
+    results['time_analysis'] = analyze_flights_by_time(df, verbose)
+    results['airport_analysis'] = analyze_flights_by_airport(df, verbose)
+    results['cancellation_analysis'] = analyze_cancellations(df, verbose)
+    results['duration_analysis'] = analyze_flight_duration_distance(df, approximate, verbose)
+    results['delay_analysis'] = analyze_delays(df, approximate, verbose)
+    results['airport_performance'] = analyze_airport_performance(df, verbose)
+    results['monthly_delays'] = analyze_monthly_delays(df, verbose)
     
     return results
 
@@ -136,7 +189,7 @@ def perform_complete_analysis(df):
 if __name__ == "__main__":
     # Run the complete preprocessing pipeline
     file_path = 'data/flight_data_2024.csv'
-    processed_df = preprocess_flight_data(file_path)
+    processed_df = load_cached_flight_data(file_path, verbose=True)
     
     print("\nPreprocessing completed successfully!")
     print(f"Final dataset shape: {processed_df.shape}")
@@ -1,22 +1,47 @@
 import matplotlib.pyplot as plt
 import seaborn as sns
 import warnings
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-from data_preprocess import perform_complete_analysis, preprocess_flight_data
-
-# Set visualization style
-sns.set(style="whitegrid", palette="pastel")
-plt.rcParams['figure.figsize'] = (10, 6)
-
-# Create outputs folder for saved plots
-Path('outputs').mkdir(parents=True, exist_ok=True)
+from chart_cache import ChartCache, chart_key
+from data_cache import load_cached_flight_data
+from descriptive_analysis import perform_complete_analysis
+from profiling import profile_stage, profiled
 
 # Silence warnings in visualization output
 warnings.filterwarnings('ignore')
 
+def set_plot_style():
+    """Apply the seaborn style and default figure size used by every chart."""
+    sns.set(style="whitegrid", palette="pastel")
+    plt.rcParams['figure.figsize'] = (10, 6)
+
+def save_figure(fig, filename, output_dir='outputs', show=True):
+    """
+    Save a figure, optionally show it, and always close it.
+    
+    Args:
+        fig (matplotlib.figure.Figure): Figure to save
+        filename (str): PNG file name inside output_dir
+        output_dir (str): Directory for the saved plot
+        show (bool): Call plt.show() before closing
+        
+    Returns:
+        str: Path of the saved PNG
+    """
+    path = Path(output_dir) / filename
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with profile_stage('savefig'):
+        fig.savefig(path, dpi=150, bbox_inches='tight')
+    if show:
+        plt.show()
+    plt.close(fig)
+    return str(path)
+
 # Visualization functions
-def visualize_flights_by_time(time_analysis):
+@profiled()
+def visualize_flights_by_time(time_analysis, output_dir='outputs', show=True):
     """Visualize flights by day of week and month with enhanced styling"""
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
     
@@ -44,12 +69,12 @@ def visualize_flights_by_time(time_analysis):
     ax2.set_ylabel("Number of Flights")
     
     plt.tight_layout()
-    plt.savefig('outputs/flights_by_dow.png', dpi=150, bbox_inches='tight')
-    plt.show()
+    return save_figure(fig, 'flights_by_dow.png', output_dir, show)
     
-def visualize_flights_by_airport(airport_analysis):
+@profiled()
+def visualize_flights_by_airport(airport_analysis, output_dir='outputs', show=True):
     """Visualize flights by origin airport (top 10)"""
-    plt.figure(figsize=(12, 6))
+    fig = plt.figure(figsize=(12, 6))
     # Show only top 10 airports for better readability
     top_airports = airport_analysis.head(10)
     sns.barplot(x=top_airports.index, y=top_airports.values, palette='magma')
@@ -58,10 +83,10 @@ def visualize_flights_by_airport(airport_analysis):
     plt.ylabel("Number of Flights")
     plt.xticks(rotation=45)
     plt.tight_layout()
-    plt.savefig('outputs/flights_by_airport.png', dpi=150, bbox_inches='tight')
-    plt.show()
+    return save_figure(fig, 'flights_by_airport.png', output_dir, show)
     
-def visualize_cancellations(cancellation_analysis):
+@profiled()
+def visualize_cancellations(cancellation_analysis, output_dir='outputs', show=True):
     """Visualize cancellation patterns"""
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
     
@@ -85,12 +110,12 @@ def visualize_cancellations(cancellation_analysis):
         ax2.tick_params(axis='x', rotation=45)
     
     plt.tight_layout()
-    plt.savefig('outputs/cancellation_analysis.png', dpi=150, bbox_inches='tight')
-    plt.show()
+    return save_figure(fig, 'cancellation_analysis.png', output_dir, show)
 
-def visualize_flight_duration_distance(duration_analysis):
+@profiled()
+def visualize_flight_duration_distance(duration_analysis, output_dir='outputs', show=True):
     """Visualize flight duration and distance statistics"""
-    plt.figure(figsize=(12, 8))
+    fig = plt.figure(figsize=(12, 8))
     
     # Create heatmap of the statistics
     sns.heatmap(duration_analysis, annot=True, cmap='YlOrRd', fmt='.1f')
@@ -98,12 +123,12 @@ def visualize_flight_duration_distance(duration_analysis):
     plt.xlabel("Metrics")
     plt.ylabel("Statistics")
     plt.tight_layout()
-    plt.savefig('outputs/duration_distance_heatmap.png', dpi=150, bbox_inches='tight')
-    plt.show()
+    return save_figure(fig, 'duration_distance_heatmap.png', output_dir, show)
     
-def visualize_delays(delay_analysis):
+@profiled()
+def visualize_delays(delay_analysis, output_dir='outputs', show=True):
     """Visualize delay statistics"""
-    plt.figure(figsize=(12, 6))
+    fig = plt.figure(figsize=(12, 6))
     
     delay_summary = delay_analysis['delay_summary']
     sns.heatmap(delay_summary, annot=True, cmap='Reds', fmt='.1f')
@@ -111,13 +136,11 @@ def visualize_delays(delay_analysis):
     plt.xlabel("Delay Types")
     plt.ylabel("Statistics")
     plt.tight_layout()
-    plt.savefig('outputs/delay_heatmap.png', dpi=150, bbox_inches='tight')
-    plt.show()
+    return save_figure(fig, 'delay_heatmap.png', output_dir, show)
 
-def visualize_airport_performance(airport_performance):
+@profiled()
+def visualize_airport_performance(airport_performance, output_dir='outputs', show=True):
     """Visualize airport performance metrics"""
-    plt.figure(figsize=(14, 8))
-    
     # Show top 10 airports by weather delay
     top_airports = airport_performance.head(10)
     
@@ -149,40 +172,86 @@ def visualize_airport_performance(airport_performance):
     axes[1,1].tick_params(axis='x', rotation=45)
     
     plt.tight_layout()
-    plt.show()
+    return save_figure(fig, 'airport_performance.png', output_dir, show)
 
-def visualize_monthly_delays(monthly_delays):
+@profiled()
+def visualize_monthly_delays(monthly_delays, output_dir='outputs', show=True):
     """Visualize monthly delay patterns"""
-    plt.figure(figsize=(12, 6))
+    fig, ax = plt.subplots(figsize=(12, 6))
     
-    monthly_delays.plot(kind='bar', figsize=(12, 6), color=['skyblue', 'lightcoral'])
+    monthly_delays.plot(kind='bar', color=['skyblue', 'lightcoral'], ax=ax)
     plt.title("Average Monthly Delays")
     plt.xlabel("Month")
     plt.ylabel("Average Delay (minutes)")
     plt.legend(['Weather Delay', 'Late Aircraft Delay'])
     plt.xticks(rotation=0)
     plt.tight_layout()
-    plt.savefig('outputs/monthly_delays_comparison.png', dpi=150, bbox_inches='tight')
-    plt.show()
+    return save_figure(fig, 'monthly_delays_comparison.png', output_dir, show)
     
-def visualize_complete_analysis(analysis_results):
-    """Generate all visualizations from analysis results"""
+# Chart renderers, the analysis_results section each one draws and its file
+CHART_RENDERERS = [
+    (visualize_flights_by_time, 'time_analysis', 'flights_by_dow.png'),
+    (visualize_flights_by_airport, 'airport_analysis', 'flights_by_airport.png'),
+    (visualize_cancellations, 'cancellation_analysis', 'cancellation_analysis.png'),
+    (visualize_flight_duration_distance, 'duration_analysis', 'duration_distance_heatmap.png'),
+    (visualize_delays, 'delay_analysis', 'delay_heatmap.png'),
+    (visualize_airport_performance, 'airport_performance', 'airport_performance.png'),
+    (visualize_monthly_delays, 'monthly_delays', 'monthly_delays_comparison.png')
+]
+
+def _init_render_worker():
+    # Worker processes render off-screen only
+    plt.switch_backend('Agg')
+    set_plot_style()
+
+def visualize_complete_analysis(analysis_results, workers=None, output_dir='outputs', cache=None):
+    """
+    Generate all visualizations from analysis results.
+    
+    Args:
+        analysis_results (dict): Results of perform_complete_analysis
+        workers (int): Render every chart in a pool of this many processes
+            (Agg backend, no plt.show()), so the set takes about as long as
+            the slowest chart; None renders and shows them one after another
+        output_dir (str): Directory for the saved plots
+        cache (chart_cache.ChartCache): Copy charts whose section data is
+            unchanged from this cache instead of rendering (and showing) them
+        
+    Returns:
+        list: Paths of the saved PNGs, in CHART_RENDERERS order
+    """
     print("Generating visualizations...")
+    set_plot_style()
+    
+    paths = [str(Path(output_dir) / filename) for _, _, filename in CHART_RENDERERS]
+    keys = [None] * len(CHART_RENDERERS)
+    pending = list(range(len(CHART_RENDERERS)))
+    if cache is not None:
+        keys = [chart_key(render, analysis_results[section])
+                for render, section, _ in CHART_RENDERERS]
+        pending = [i for i in pending if not cache.fetch(keys[i], paths[i])]
+        print(f"Chart cache: {len(CHART_RENDERERS) - len(pending)} reused, {len(pending)} to render")
+    
+    if workers is not None and pending:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker) as pool:
+            futures = {i: pool.submit(CHART_RENDERERS[i][0], analysis_results[CHART_RENDERERS[i][1]],
+                                      output_dir, False)
+                       for i in pending}
+            rendered = {i: future.result() for i, future in futures.items()}
+    else:
+        rendered = {i: CHART_RENDERERS[i][0](analysis_results[CHART_RENDERERS[i][1]], output_dir)
+                    for i in pending}
     
-    visualize_flights_by_time(analysis_results['time_analysis'])
-    visualize_flights_by_airport(analysis_results['airport_analysis'])
-    visualize_cancellations(analysis_results['cancellation_analysis'])
-    visualize_flight_duration_distance(analysis_results['duration_analysis'])
-    visualize_delays(analysis_results['delay_analysis'])
-    visualize_airport_performance(analysis_results['airport_performance'])
-    visualize_monthly_delays(analysis_results['monthly_delays'])
+    if cache is not None:
+        for i, path in rendered.items():
+            cache.store(keys[i], path)
     
-    return "All visualizations generated successfully."
+    return paths
 
 if __name__ == "__main__":
     # Run the complete visualization pipeline
     file_path = 'data/flight_data_2024.csv'
-    processed_df = preprocess_flight_data(file_path, verbose=False)
+    processed_df = load_cached_flight_data(file_path)
     
     print("\n" + "="*50)
     print("DESCRIPTIVE ANALYSIS VISUALIZATION")
@@ -191,6 +260,8 @@ if __name__ == "__main__":
     # Perform descriptive analysis
     analysis_results = perform_complete_analysis(processed_df)
     
-    # Generate visualizations
-    result = visualize_complete_analysis(analysis_results)
-    print(f"\n{result}")
\ No newline at end of file
+    # Generate visualizations, reusing charts whose data is unchanged
+    paths = visualize_complete_analysis(analysis_results, cache=ChartCache())
+    print("\nAll visualizations generated successfully:")
+    for path in paths:
+        print(f"  {path}")
\ No newline at end of file
@@ -0,0 +1,173 @@
+# Sorted indexes over the preprocessed flights for fast filtered analyses
+
+import numpy as np
+import pandas as pd
+
+from profiling import profiled
+
+class FlightIndex:
+    """
+    Serves origin, date and month filtered views of a flight frame by slicing.
+
+    The rows are sorted once by (origin, fl_date), so each airport is a
+    contiguous block and each date range within it a sub-slice found by
+    binary search. Date-only and month-only queries use a date-sorted and a
+    month-sorted permutation of the same rows. A query therefore costs
+    O(log n) per origin plus the size of the result, instead of a boolean
+    mask over the whole frame.
+
+    Views come back in (origin, fl_date) row order. A query that resolves to
+    one contiguous block (a single origin, optionally a date range) is an
+    ``iloc`` slice that shares memory with the index; anything else is
+    gathered by position, restricted to ``columns`` when given. Results
+    feed straight into the descriptive_analysis functions; treat views as
+    read-only.
+    """
+
+    @profiled('build_flight_index')
+    def __init__(self, df):
+        """
+        Build the indexes.
+
+        Args:
+            df (pd.DataFrame): Preprocessed flights with 'origin', 'fl_date'
+                (datetime) and 'month' columns
+        """
+        origin = pd.Categorical(df['origin'])
+        dates = df['fl_date'].to_numpy(dtype='datetime64[ns]').view('int64')
+        order = np.lexsort((dates, origin.codes))
+
+        self.data = df.take(order)
+        self.origins = origin.categories
+        codes = origin.codes[order]
+        self._dates = dates[order]
+        # Block of origin code i is rows _origin_offsets[i]:_origin_offsets[i + 1]
+        self._origin_offsets = np.searchsorted(codes, np.arange(len(self.origins) + 1))
+
+        self._date_order = np.argsort(self._dates, kind='stable')
+        self._sorted_dates = self._dates[self._date_order]
+
+        self._months = self.data['month'].to_numpy(dtype='int64')
+        self._month_order = np.argsort(self._months, kind='stable')
+        self._sorted_months = self._months[self._month_order]
+
+    def __len__(self):
+        return len(self.data)
+
+    @staticmethod
+    def _date_bounds(start, end):
+        # Inclusive calendar dates -> half-open int64 nanosecond range. NaT is
+        # stored as the int64 minimum and sorts first, so an open start begins
+        # just after it, leaving rows without a date out as a mask would
+        lo = pd.NaT.value + 1 if start is None else pd.Timestamp(start).value
+        hi = np.iinfo('int64').max if end is None else pd.Timestamp(end).value + pd.Timedelta(days=1).value
+        return lo, hi
+
+    def _ranges(self, origins=None, start=None, end=None):
+        # Contiguous row ranges of the (origin, fl_date) order matching origins and dates
+        if origins is None:
+            blocks = [(0, len(self.data))]
+        else:
+            codes = self.origins.get_indexer(list(origins))
+            codes = np.unique(codes[codes >= 0])
+            blocks = list(zip(self._origin_offsets[codes], self._origin_offsets[codes + 1]))
+        if start is None and end is None:
+            return blocks
+
+        lo, hi = self._date_bounds(start, end)
+        ranges = []
+        for first, last in blocks:
+            dates = self._dates[first:last]
+            ranges.append((first + np.searchsorted(dates, lo, 'left'), first + np.searchsorted(dates, hi, 'left')))
+        return ranges
+
+    def positions(self, origins=None, start=None, end=None, months=None):
+        """
+        Row positions in ``self.data`` matching every given filter.
+
+        Args:
+            origins (list): Origin airport codes; None for all
+            start: First fl_date to include (str or Timestamp); None for open
+            end: Last fl_date to include; None for open
+            months (list): Month numbers (1-12); None for all
+
+        Returns:
+            np.ndarray: Sorted int64 positions
+        """
+        if origins is not None:
+            positions = np.concatenate([np.arange(first, last) for first, last in
+                                        self._ranges(origins, start, end)] or [np.empty(0, 'int64')])
+        elif start is not None or end is not None:
+            lo, hi = self._date_bounds(start, end)
+            first, last = np.searchsorted(self._sorted_dates, [lo, hi], 'left')
+            positions = np.sort(self._date_order[first:last])
+        elif months is not None:
+            months = np.unique(np.asarray(months, dtype='int64'))
+            firsts = np.searchsorted(self._sorted_months, months, 'left')
+            lasts = np.searchsorted(self._sorted_months, months, 'right')
+            return np.sort(np.concatenate([self._month_order[first:last] for first, last in zip(firsts, lasts)]))
+        else:
+            return np.arange(len(self.data))
+
+        # The month filter is applied to the (already small) candidate rows
+        if months is not None:
+            positions = positions[np.isin(self._months[positions], months)]
+        return positions.astype('int64', copy=False)
+
+    def query(self, origins=None, start=None, end=None, months=None, columns=None):
+        """
+        Flights matching the filters, as a slice of the indexed frame.
+
+        Args:
+            origins (list): Origin airport codes; None for all
+            start: First fl_date to include; None for open
+            end: Last fl_date to include; None for open
+            months (list): Month numbers (1-12); None for all
+            columns (list): Only gather these columns, e.g.
+                ANALYSIS_COLUMNS['descriptive']; None for all
+
+        Returns:
+            pd.DataFrame: Matching rows in (origin, fl_date) order
+
+        Raises:
+            KeyError: A requested column is not in the indexed frame
+        """
+        if columns is None:
+            column_positions = slice(None)
+        else:
+            columns = list(columns)
+            column_positions = self.data.columns.get_indexer_for(columns)
+            # -1 marks an unknown name, which iloc would read as the last column
+            missing = [column for column, position in zip(columns, column_positions) if position == -1]
+            if missing:
+                raise KeyError(f"Columns not in the indexed frame: {missing}")
+        if months is None and (origins is not None or start is None and end is None):
+            ranges = self._ranges(origins, start, end)
+            if len(ranges) == 1:
+                first, last = ranges[0]
+                return self.data.iloc[first:last, column_positions]
+        return self.data.iloc[self.positions(origins, start, end, months), column_positions]
+
+    def run(self, analysis, origins=None, start=None, end=None, months=None, columns=None, **kwargs):
+        """
+        Run an analysis function on a filtered view.
+
+        Args:
+            analysis (callable): Function taking the flight frame, e.g.
+                descriptive_analysis.analyze_airport_performance
+            origins, start, end, months, columns: Filters, see query
+            **kwargs: Extra arguments for ``analysis``
+
+        Returns:
+            The analysis function's result
+        """
+        return analysis(self.query(origins, start, end, months, columns), **kwargs)
+
+# Main execution (only runs when script is executed directly)
+if __name__ == "__main__":
+    from data_cache import load_cached_flight_data
+    from descriptive_analysis import analyze_airport_performance, analyze_monthly_delays
+
+    index = FlightIndex(load_cached_flight_data('data/flight_data_2024.csv'))
+    index.run(analyze_airport_performance, origins=['ATL', 'DFW', 'ORD'], start='2024-01-01', end='2024-03-31')
+    index.run(analyze_monthly_delays, origins=['SEA'], months=[6, 7, 8])
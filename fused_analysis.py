@@ -0,0 +1,354 @@
+# Fused aggregation engine for the descriptive analysis
+
+import numpy as np
+import pandas as pd
+
+DURATION_COLUMNS = ['air_time', 'taxi_out', 'taxi_in', 'distance']
+DELAY_COLUMNS = ['weather_delay', 'late_aircraft_delay']
+PERFORMANCE_COLUMNS = ['air_time', 'taxi_out', 'weather_delay', 'late_aircraft_delay']
+
+# What each perform_complete_analysis section needs from the data:
+# group keys it rolls up to, columns it needs sums/counts of, and columns
+# it describes over the whole frame.
+SECTION_REQUIREMENTS = {
+    'basic_stats': {'keys': [], 'measures': ['cancelled', 'distance'], 'describe': []},
+    'time_analysis': {'keys': ['day_of_week', 'month'], 'measures': [], 'describe': []},
+    'airport_analysis': {'keys': ['origin'], 'measures': [], 'describe': []},
+    'cancellation_analysis': {'keys': ['month', 'origin'], 'measures': ['cancelled'], 'describe': []},
+    'duration_analysis': {'keys': [], 'measures': [], 'describe': DURATION_COLUMNS},
+    'delay_analysis': {'keys': [], 'measures': DELAY_COLUMNS, 'describe': DELAY_COLUMNS},
+    'airport_performance': {'keys': ['origin'], 'measures': PERFORMANCE_COLUMNS, 'describe': []},
+    'monthly_delays': {'keys': ['month'], 'measures': DELAY_COLUMNS, 'describe': []},
+}
+
+ANALYSIS_SECTIONS = list(SECTION_REQUIREMENTS)
+
+# Fixed key order so the grouped table is always laid out the same way
+GROUP_KEY_ORDER = ['origin', 'month', 'day_of_week']
+
+def plan_aggregations(sections=None, columns=None):
+    """
+    Plan the shared aggregations needed for a set of analysis sections.
+
+    Args:
+        sections (list): Section names from ANALYSIS_SECTIONS; None plans all
+        columns (iterable): Columns available in the frame; measures that
+            are missing (as display_basic_stats allows) are skipped
+
+    Returns:
+        dict: Plan with 'sections', 'keys', 'measures' and 'describe' lists
+    """
+    sections = ANALYSIS_SECTIONS if sections is None else list(sections)
+    unknown = [name for name in sections if name not in SECTION_REQUIREMENTS]
+    if unknown:
+        raise ValueError(f"Unknown analysis sections {unknown}; expected any of {ANALYSIS_SECTIONS}")
+
+    keys, measures, describe = set(), [], []
+    for name in sections:
+        requirement = SECTION_REQUIREMENTS[name]
+        keys.update(requirement['keys'])
+        measures += [c for c in requirement['measures'] if c not in measures]
+        describe += [c for c in requirement['describe'] if c not in describe]
+
+    if columns is not None:
+        measures = [c for c in measures if c in columns]
+
+    return {
+        'sections': sections,
+        'keys': [k for k in GROUP_KEY_ORDER if k in keys],
+        'measures': measures,
+        'describe': describe
+    }
+
+# Largest value range for which integer columns get exact counting quantiles
+COUNTING_RANGE_LIMIT = 1_000_000
+
+DESCRIBE_INDEX = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+
+def _key_codes(series):
+    """Integer codes (-1 for missing) and the key values they stand for."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        values = pd.Categorical.from_codes(np.arange(len(series.cat.categories)), dtype=series.dtype)
+        return series.cat.codes.to_numpy(dtype='int64'), values
+    if pd.api.types.is_integer_dtype(series.dtype) and len(series):
+        low, high = int(series.min()), int(series.max())
+        if high - low <= COUNTING_RANGE_LIMIT:
+            values = np.arange(low, high + 1).astype(series.dtype)
+            return series.to_numpy(dtype='int64') - low, values
+    codes, values = pd.factorize(series, sort=True)
+    return codes.astype('int64'), np.asarray(values)
+
+def build_group_table(df, plan):
+    """
+    Aggregate the frame once over the union of the planned group keys.
+
+    The keys are turned into integer codes once and combined into a single
+    flat group id, so every measure is reduced with one np.bincount instead
+    of a separate hashed groupby. Every measure gets a ``<col>_sum`` and
+    ``<col>_count`` column; ``rows`` holds the group size and
+    ``cancelled_flights`` the number of rows with ``cancelled == 1``. All
+    sections are rolled up from this table.
+
+    Columns listed under the optional plan key 'squares' also get a
+    ``<col>_sumsq`` column for variances. When the key space is larger than
+    the frame (e.g. with fl_date as a key), only the occurring combinations
+    are numbered, so memory stays proportional to the rows.
+
+    Args:
+        df (pd.DataFrame): Flight dataset
+        plan (dict): Result of plan_aggregations, or any dict with 'keys'
+            and 'measures' (and optionally 'squares')
+
+    Returns:
+        pd.DataFrame: One row per observed key combination
+    """
+    keys, measures = plan['keys'], plan['measures']
+
+    if keys:
+        coded = [_key_codes(df[key]) for key in keys]
+        # Missing keys get their own trailing slot so the row still counts
+        # towards roll-ups over the other keys
+        codes = [np.where(c >= 0, c, len(v)) for c, v in coded]
+        shape = tuple(len(v) + 1 for _, v in coded)
+        flat = np.ravel_multi_index(codes, shape)
+    else:
+        # Global totals only: a single group
+        shape = (1,)
+        flat = np.zeros(len(df), dtype='int64')
+
+    size = int(np.prod(shape))
+    cells = None
+    if size > len(df):
+        # Sparse key space: number only the combinations that occur
+        cells, flat = np.unique(flat, return_inverse=True)
+        size = len(cells)
+    columns = {'rows': np.bincount(flat, minlength=size)}
+    for col in measures:
+        values = df[col].to_numpy(dtype='float64')
+        observed = ~np.isnan(values)
+        if observed.all():
+            sums = np.bincount(flat, weights=values, minlength=size)
+            columns[f'{col}_count'] = columns['rows']
+        else:
+            sums = np.bincount(flat[observed], weights=values[observed], minlength=size)
+            columns[f'{col}_count'] = np.bincount(flat[observed], minlength=size)
+        if pd.api.types.is_integer_dtype(df[col].dtype) or pd.api.types.is_bool_dtype(df[col].dtype):
+            sums = sums.round().astype('int64')
+        columns[f'{col}_sum'] = sums
+    squares = [col for col in plan.get('squares', []) if col in measures]
+    for col in squares:
+        values = df[col].to_numpy(dtype='float64')
+        observed = ~np.isnan(values)
+        columns[f'{col}_sumsq'] = np.bincount(flat[observed], weights=values[observed] ** 2, minlength=size)
+    if 'cancelled' in measures:
+        is_cancelled = (df['cancelled'] == 1).to_numpy()
+        columns['cancelled_flights'] = np.bincount(flat[is_cancelled], minlength=size)
+
+    order = ['rows'] + [f'{col}_sum' for col in measures] + [f'{col}_count' for col in measures]
+    order += [f'{col}_sumsq' for col in squares]
+    if 'cancelled' in measures:
+        order.append('cancelled_flights')
+
+    # Keep only the key combinations that actually occur
+    if cells is None:
+        groups = cells = np.flatnonzero(columns['rows'])
+    else:
+        groups = np.arange(size)
+    if keys:
+        positions = np.unravel_index(cells, shape)
+        # The missing-key slot maps to code -1, i.e. NaN in the index
+        index = pd.MultiIndex(
+            levels=[values for _, values in coded],
+            codes=[np.where(pos < len(values), pos, -1) for (_, values), pos in zip(coded, positions)],
+            names=keys
+        )
+    else:
+        index = pd.Index([0], name='_all')[:len(groups)]
+    return pd.DataFrame({col: columns[col][groups] for col in order}, index=index)
+
+def describe_columns(df, columns):
+    """
+    describe() for numeric columns, avoiding a full sort where possible.
+
+    Integer-valued columns with a small range get exact quantiles from a
+    counting histogram (O(n) instead of a sort); other columns fall back to
+    np.percentile.
+
+    Args:
+        df (pd.DataFrame): Flight dataset
+        columns (list): Numeric columns to describe
+
+    Returns:
+        pd.DataFrame: Same layout as ``df[columns].describe()``
+    """
+    stats = {}
+    for col in columns:
+        values = df[col].to_numpy(dtype='float64')
+        values = values[~np.isnan(values)]
+        n = len(values)
+        if n == 0:
+            stats[col] = [0] + [np.nan] * 7
+            continue
+
+        low, high = values.min(), values.max()
+        positions = np.array([0.25, 0.5, 0.75]) * (n - 1)
+        if high - low <= COUNTING_RANGE_LIMIT and np.array_equal(values, np.floor(values)):
+            cumulative = np.cumsum(np.bincount((values - low).astype('int64')))
+            lower = np.searchsorted(cumulative, np.floor(positions), side='right') + low
+            upper = np.searchsorted(cumulative, np.ceil(positions), side='right') + low
+            quantiles = lower + (upper - lower) * (positions - np.floor(positions))
+        else:
+            quantiles = np.percentile(values, [25, 50, 75])
+
+        std = values.std(ddof=1) if n > 1 else np.nan
+        stats[col] = [n, values.mean(), std, low, *quantiles, high]
+
+    return pd.DataFrame(stats, index=DESCRIBE_INDEX, columns=columns, dtype='float64')
+
+def _rollup(table, key):
+    # Missing keys (NaN in the index) drop out here, as in a direct groupby
+    return table.groupby(level=key, observed=True).sum()
+
+def _means(rolled, columns):
+    return pd.DataFrame({col: rolled[f'{col}_sum'] / rolled[f'{col}_count'] for col in columns})
+
+def finalize_sections(table, plan, describe_stats=None, total_rows=None):
+    """
+    Turn a grouped partial table into the perform_complete_analysis result dict.
+
+    Args:
+        table (pd.DataFrame): Result of build_group_table (or a merge of them)
+        plan (dict): Result of plan_aggregations
+        describe_stats (pd.DataFrame): describe() output for plan['describe']
+        total_rows (int): Total row count; defaults to the table's row sum
+
+    Returns:
+        dict: Results keyed by section name
+    """
+    results = {}
+    sections = plan['sections']
+    measures = plan['measures']
+    totals = {col: table[col].sum() for col in table.columns}
+    total_rows = int(totals['rows']) if total_rows is None else total_rows
+
+    if 'basic_stats' in sections:
+        results['basic_stats'] = {
+            'total_flights': total_rows,
+            'cancelled_flights': totals['cancelled_sum'] if 'cancelled' in measures else 0,
+            'average_distance': round(totals['distance_sum'] / totals['distance_count'], 2)
+                                if 'distance' in measures else 0
+        }
+
+    if 'time_analysis' in sections:
+        results['time_analysis'] = {
+            'flights_per_dow': _rollup(table, 'day_of_week')['rows'].rename(None),
+            'flights_per_month': _rollup(table, 'month')['rows'].rename(None)
+        }
+
+    if 'airport_analysis' in sections:
+        flights_per_airport = _rollup(table, 'origin')['rows'].sort_values(ascending=False, kind='stable')
+        results['airport_analysis'] = flights_per_airport.rename('count')
+
+    if 'cancellation_analysis' in sections:
+        by_month = _rollup(table, 'month')['cancelled_flights']
+        by_origin = _rollup(table, 'origin')['cancelled_flights']
+        results['cancellation_analysis'] = {
+            'cancel_rate': totals['cancelled_sum'] / totals['cancelled_count'] * 100,
+            'cancel_by_month': by_month[by_month > 0].rename(None),
+            'cancel_by_origin': by_origin[by_origin > 0].rename(None)
+        }
+
+    if 'duration_analysis' in sections:
+        results['duration_analysis'] = describe_stats[DURATION_COLUMNS].round(2)
+
+    if 'delay_analysis' in sections:
+        results['delay_analysis'] = {
+            'delay_summary': describe_stats[DELAY_COLUMNS].round(2),
+            'total_delay': pd.Series({col: totals[f'{col}_sum'] for col in DELAY_COLUMNS})
+        }
+
+    if 'airport_performance' in sections:
+        airport_summary = _means(_rollup(table, 'origin'), PERFORMANCE_COLUMNS)
+        results['airport_performance'] = airport_summary.round(2).sort_values('weather_delay', ascending=False)
+
+    if 'monthly_delays' in sections:
+        results['monthly_delays'] = _means(_rollup(table, 'month'), DELAY_COLUMNS).round(2)
+
+    return results
+
+def print_analysis_results(results):
+    """
+    Print fused results with the same headings as the individual analyses.
+
+    Args:
+        results (dict): Result dict from perform_fused_analysis
+    """
+    if 'basic_stats' in results:
+        stats = results['basic_stats']
+        print(f"Total flights: {stats['total_flights']}")
+        print(f"Cancelled flights: {stats['cancelled_flights']}")
+        print(f"Average distance: {stats['average_distance']} miles")
+    if 'time_analysis' in results:
+        print("\nFlights per Day of Week:")
+        print(results['time_analysis']['flights_per_dow'])
+        print("\nFlights per Month:")
+        print(results['time_analysis']['flights_per_month'])
+    if 'airport_analysis' in results:
+        print("\nFlights per Airport:")
+        print(results['airport_analysis'])
+    if 'cancellation_analysis' in results:
+        cancellations = results['cancellation_analysis']
+        print(f"\nCancellation Rate: {cancellations['cancel_rate']:.2f}%")
+        print("\nCancellations by Month:")
+        print(cancellations['cancel_by_month'])
+        print("\nCancellations by Origin:")
+        print(cancellations['cancel_by_origin'])
+    if 'duration_analysis' in results:
+        print("\nFlight Duration & Distance Distribution:")
+        print(results['duration_analysis'])
+    if 'delay_analysis' in results:
+        print("\nDelay Descriptive Statistics:")
+        print(results['delay_analysis']['delay_summary'])
+        print("\nTotal Delays:")
+        print(results['delay_analysis']['total_delay'])
+    if 'airport_performance' in results:
+        print("\nAirport Performance Summary:")
+        print(results['airport_performance'])
+    if 'monthly_delays' in results:
+        print("\nMonthly Delay Analysis:")
+        print(results['monthly_delays'])
+
+def perform_fused_analysis(df, sections=None, verbose=True, approximate=False):
+    """
+    Compute the perform_complete_analysis results in one fused pass.
+
+    A single groupby over the shared keys (origin, month, day_of_week)
+    collects sizes, sums and counts; each section is then a cheap roll-up of
+    that small table. The describe() sections share one describe_columns
+    call.
+
+    Args:
+        df (pd.DataFrame): Flight dataset
+        sections (list): Sections to compute; None computes all of them
+        verbose (bool): Print the results like the individual analyses do
+        approximate (bool): Sketch the describe() quartiles (see
+            sketches.approximate_describe) instead of computing them exactly
+
+    Returns:
+        dict: Dictionary containing the requested analysis results
+    """
+    plan = plan_aggregations(sections, df.columns)
+    table = build_group_table(df, plan)
+    describe_stats = None
+    if plan['describe']:
+        if approximate:
+            from sketches import approximate_describe
+            describe_stats = approximate_describe(df, plan['describe'])
+        else:
+            describe_stats = describe_columns(df, plan['describe'])
+    results = finalize_sections(table, plan, describe_stats, total_rows=len(df))
+
+    if verbose:
+        print_analysis_results(results)
+
+    return results
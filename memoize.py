@@ -0,0 +1,305 @@
+# Persistent memoization of analysis functions keyed by dataset fingerprint and arguments
+
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import threading
+import time
+import weakref
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from chart_cache import _update_digest, code_digest
+from data_cache import CACHE_DIR
+
+# Bump when memoized result layouts change, or when code in another module that a
+# memoized function calls changes its results, so old entries are ignored
+MEMO_VERSION = 1
+
+# Unregistered frames up to this many cells are content hashed; larger ones
+# would cost about as much to hash as to analyse, so their calls are not memoized
+FULL_HASH_MAX_CELLS = 1_000_000
+
+# Set FLIGHT_MEMO=0 to run every memoized function uncached
+_enabled = os.environ.get('FLIGHT_MEMO', '1') != '0'
+
+# id(frame) -> (weak reference, fingerprint, weak references to its column
+# arrays) of frames with a known fingerprint
+_fingerprints = {}
+
+# Source file path -> ((mtime_ns, size), sha256) of memoized functions' modules
+_source_digests = {}
+
+def set_memoization(enabled):
+    """
+    Turn the memoization layer on or off for this process.
+
+    Args:
+        enabled (bool): False runs every memoized function uncached
+
+    Returns:
+        bool: The previous setting
+    """
+    global _enabled
+    previous, _enabled = _enabled, enabled
+    return previous
+
+def register_frame(df, fingerprint):
+    """
+    Record a cheap fingerprint for a frame, so memoized calls skip hashing its rows.
+
+    load_cached_flight_data registers every frame it returns with its cache
+    key, and memoized functions register the frames they return. The
+    fingerprint only holds while the frame still has the column arrays it
+    had when registered: assigning a column (``df['col'] = ...``), adding
+    or dropping one drops back to content hashing. Writes into the existing
+    arrays (``df.loc[mask, 'col'] = ...``, ``inplace=True``) are not seen,
+    so modify a copy for those.
+
+    Args:
+        df (pd.DataFrame): Frame to register
+        fingerprint (str): Identifier of its contents, e.g. a cache key
+
+    Returns:
+        pd.DataFrame: ``df``
+    """
+    try:
+        arrays = [weakref.ref(array) for array in df._mgr.arrays]
+    except TypeError:
+        # An array type without weak reference support; leave the frame unregistered
+        return df
+    key = id(df)
+    _fingerprints[key] = (weakref.ref(df, lambda _: _fingerprints.pop(key, None)), fingerprint, arrays)
+    return df
+
+def _registered_fingerprint(df):
+    entry = _fingerprints.get(id(df))
+    if entry is None or entry[0]() is not df:
+        return None
+    arrays = df._mgr.arrays
+    if len(arrays) != len(entry[2]) or any(ref() is not array for ref, array in zip(entry[2], arrays)):
+        return None
+    return entry[1]
+
+def frame_fingerprint(df):
+    """
+    Fingerprint of a frame's contents, or None when it is too large to hash cheaply.
+
+    Args:
+        df (pd.DataFrame | pd.Series): Input frame
+
+    Returns:
+        str: Registered fingerprint or content hash; None for unregistered
+            frames over FULL_HASH_MAX_CELLS
+    """
+    fingerprint = _registered_fingerprint(df)
+    if fingerprint is None:
+        if df.size > FULL_HASH_MAX_CELLS:
+            return None
+        digest = hashlib.sha256()
+        _update_digest(digest, df)
+        fingerprint = digest.hexdigest()
+    # The layout also separates frames of equal content but different dtypes or labels
+    dtypes = df.dtypes.to_dict() if isinstance(df, pd.DataFrame) else df.dtype
+    return f'{fingerprint}:{df.shape}:{list(getattr(df, "columns", []))}:{dtypes}'
+
+def _source_digest(func):
+    # Hash of the memoized function's whole module, so edits to helpers it
+    # calls in the same module (e.g. finalize_daily_partials) change the key
+    try:
+        path = inspect.getsourcefile(inspect.unwrap(func))
+        stat = os.stat(path)
+    except (TypeError, OSError):
+        return None
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _source_digests.get(path)
+    if cached is None or cached[0] != signature:
+        with open(path, 'rb') as f:
+            cached = (signature, hashlib.sha256(f.read()).hexdigest())
+        _source_digests[path] = cached
+    return cached[1]
+
+def memo_key(func, args):
+    """
+    Key of one call: the function's code and module source plus its bound arguments.
+
+    Changes to the memoized function or to anything else in its module
+    produce new keys. Code it calls in other modules is not covered, so
+    bump MEMO_VERSION when such a change alters memoized results.
+
+    Args:
+        func (callable): Memoized function
+        args (dict): Bound arguments, with frames replaced by fingerprints
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    _update_digest(digest, (MEMO_VERSION, pd.__version__, np.__version__, f'{func.__module__}.{func.__qualname__}',
+                            code_digest(func), _source_digest(func), args))
+    return digest.hexdigest()
+
+class MemoStore:
+    """
+    Directory of pickled function results with size- and age-based eviction.
+
+    Entries older than ``max_age`` seconds are misses and are removed on
+    the next eviction pass. Beyond that, entries are evicted least recently
+    used first once the directory grows past ``max_bytes``. Writes go
+    through a temporary file, so scripts, notebooks and worker processes
+    can share one directory.
+    """
+
+    def __init__(self, cache_dir=f'{CACHE_DIR}/memo', max_bytes=512 * 1024 * 1024, max_age=30 * 24 * 3600):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+
+    def _entry(self, key):
+        return self.cache_dir / f'{key}.pkl'
+
+    def fetch(self, key):
+        """
+        Load a stored result.
+
+        Args:
+            key (str): Result of memo_key
+
+        Returns:
+            tuple: (True, result) on a hit, (False, None) on a miss
+        """
+        entry = self._entry(key)
+        try:
+            if time.time() - entry.stat().st_mtime > self.max_age:
+                raise FileNotFoundError(entry)
+            with open(entry, 'rb') as f:
+                result = pickle.load(f)
+            os.utime(entry)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, result
+
+    def store(self, key, result):
+        """
+        Add a result and evict expired or excess entries.
+
+        Args:
+            key (str): Result of memo_key
+            result: Picklable function result
+        """
+        entry = self._entry(key)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # Threads of one process (e.g. the analytics service's workers) may write the same key
+            tmp_path = entry.with_name(f'{entry.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, entry)
+        except (OSError, pickle.PicklingError, TypeError, AttributeError) as e:
+            print(f'Warning: could not write memo entry {entry}: {e}')
+            return
+        self.evict()
+
+    def evict(self):
+        """
+        Remove expired entries, then least recently used ones until under max_bytes.
+
+        Returns:
+            int: Number of entries removed
+        """
+        now = time.time()
+        entries, removed = [], 0
+        for path in self.cache_dir.glob('*.pkl'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > self.max_age:
+                path.unlink(missing_ok=True)
+                removed += 1
+            else:
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        """
+        Remove every entry.
+
+        Returns:
+            int: Number of files removed
+        """
+        removed = 0
+        for path in self.cache_dir.glob('*.pkl'):
+            path.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+# Store used by memoized functions that are not given their own
+default_store = MemoStore()
+
+def memoized(ignore=(), store=None):
+    """
+    Decorator persisting a pure function's results across runs.
+
+    Frame arguments are keyed by frame_fingerprint, so a frame loaded via
+    load_cached_flight_data costs a dictionary lookup instead of a pass
+    over its rows; other arguments are hashed by value. Calls with a frame
+    too large to hash cheaply run uncached. Returned frames are registered
+    with the call's key, so chained memoized calls (e.g. a decomposition of
+    a memoized daily table) are keyed cheaply too.
+
+    Args:
+        ignore (tuple): Parameter names that do not affect the result,
+            e.g. ('workers',)
+        store (MemoStore): Where results are kept; default_store when None
+
+    Returns:
+        callable: The decorator
+    """
+    def decorate(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            keyed = {}
+            for name, value in bound.arguments.items():
+                if name in ignore:
+                    continue
+                if isinstance(value, (pd.DataFrame, pd.Series)):
+                    value = frame_fingerprint(value)
+                    if value is None:
+                        return func(*args, **kwargs)
+                keyed[name] = value
+
+            key = memo_key(func, keyed)
+            target = store or default_store
+            hit, result = target.fetch(key)
+            if not hit:
+                result = func(*args, **kwargs)
+                target.store(key, result)
+            if isinstance(result, pd.DataFrame):
+                register_frame(result, key)
+            return result
+
+        return wrapper
+    return decorate
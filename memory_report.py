@@ -0,0 +1,83 @@
+# Memory high-water mark report for the preprocessing and time-series path
+
+import contextlib
+import io
+import tracemalloc
+
+import pandas as pd
+
+from data_preprocess import copy_on_write, fill_missing_values, load_flight_data
+from memoize import set_memoization
+from time_series import prepare_time_series_data
+
+def memory_peak_report(file_path='data/flight_data_2024.csv', copy_free=True, typed=True, verbose=True):
+    """
+    Measure the allocation high-water mark of load, imputation and daily prep.
+
+    Allocations are traced with tracemalloc (which sees NumPy buffers) and
+    each stage's peak is reported next to the size of the loaded frame, so
+    a ``peak_copies`` value near 1.0 means the stage never held much more
+    than one copy of the data.
+
+    String columns are sized with pandas' deep estimate, so the ratio is most
+    meaningful with ``typed=True``. With ``copy_free`` the stages run under
+    pandas copy-on-write, which is switched off again afterwards.
+    prepare_time_series_data runs with memoization off, so its peak is that
+    of the computation rather than of loading a stored result.
+
+    Args:
+        file_path (str): Path to the CSV file
+        copy_free (bool): Copy-on-write with in-place imputation
+        typed (bool): Read with the explicit dtype map
+        verbose (bool): Print the report
+
+    Returns:
+        pd.DataFrame: Per-stage 'peak_mb', 'retained_mb' and 'peak_copies',
+        plus a 'pipeline' row with the overall high-water mark
+    """
+    stages = {}
+    with copy_on_write(copy_free):
+        tracemalloc.start()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                df = load_flight_data(file_path, typed=typed)
+            current, peak = tracemalloc.get_traced_memory()
+            stages['load'] = (peak, current)
+            data_bytes = df.memory_usage(deep=True).sum()
+            overall_peak = peak
+
+            tracemalloc.reset_peak()
+            df = fill_missing_values(df, inplace=copy_free)
+            current, peak = tracemalloc.get_traced_memory()
+            stages['fill_missing_values'] = (peak, current)
+            overall_peak = max(overall_peak, peak)
+
+            # Memoized results would be loaded from disk instead of computed
+            memoize_setting = set_memoization(False)
+            try:
+                tracemalloc.reset_peak()
+                prepare_time_series_data(df)
+                current, peak = tracemalloc.get_traced_memory()
+            finally:
+                set_memoization(memoize_setting)
+            stages['prepare_time_series_data'] = (peak, current)
+            overall_peak = max(overall_peak, peak)
+        finally:
+            tracemalloc.stop()
+
+    stages['pipeline'] = (overall_peak, current)
+    report = pd.DataFrame(
+        [{'stage': name, 'peak_mb': peak / 1e6, 'retained_mb': retained / 1e6, 'peak_copies': peak / data_bytes}
+         for name, (peak, retained) in stages.items()]
+    ).set_index('stage').round(3)
+
+    if verbose:
+        mode = 'copy-free' if copy_free else 'default'
+        print(f"Memory high-water marks ({mode}, loaded frame = {data_bytes / 1e6:.1f} MB):")
+        print(report)
+
+    return report
+
+# Main execution (only runs when script is executed directly)
+if __name__ == "__main__":
+    memory_peak_report('data/flight_data_2024.csv')
@@ -0,0 +1,225 @@
+# Multi-core sharded execution of the analysis pipeline
+
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from chunked_analysis import DescriptiveState
+from data_preprocess import add_temporal_columns, build_read_kwargs, fill_missing_values, resolve_data_file
+from fused_analysis import print_analysis_results
+from streaming_preprocess import FillStatistics
+from time_series import aggregate_daily_partials, finalize_daily_partials, merge_daily_partials
+
+SHARD_STRATEGIES = ['month', 'rows', 'origin']
+
+def default_workers():
+    return os.cpu_count() or 1
+
+def shard_frame(df, workers, by='month'):
+    """
+    Split a frame into at most ``workers`` disjoint shards.
+
+    Args:
+        df (pd.DataFrame): Flight dataset
+        workers (int): Number of shards wanted
+        by (str): 'month' keeps each month in one shard (balanced by row
+            count), 'rows' cuts contiguous row ranges, 'origin' hashes the
+            origin airport
+
+    Returns:
+        list: Non-empty DataFrame shards
+    """
+    if by not in SHARD_STRATEGIES:
+        raise ValueError(f"Unknown shard strategy '{by}'; expected one of {SHARD_STRATEGIES}")
+
+    if by == 'rows':
+        bounds = np.linspace(0, len(df), workers + 1).astype(int)
+        shards = [df.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+    elif by == 'origin':
+        buckets = pd.util.hash_array(df['origin'].astype(str).to_numpy()) % workers
+        shards = [df[buckets == i] for i in range(workers)]
+    else:
+        # Greedy balance: largest months first onto the lightest shard
+        sizes = df.groupby('month', observed=True).size().sort_values(ascending=False)
+        loads = [0] * workers
+        assignment = {}
+        for month, size in sizes.items():
+            target = loads.index(min(loads))
+            assignment[month] = target
+            loads[target] += size
+        buckets = df['month'].map(assignment).to_numpy()
+        shards = [df[buckets == i] for i in range(workers)]
+
+    return [shard for shard in shards if not shard.empty]
+
+def _descriptive_shard(shard, sections, approximate, seed):
+    return DescriptiveState(sections, approximate=approximate, seed=seed).update(shard)
+
+def _daily_shard(shard):
+    return aggregate_daily_partials(shard)
+
+def parallel_complete_analysis(df, workers=None, shard_by='month', sections=None, verbose=True, approximate=False):
+    """
+    perform_complete_analysis over shards in a process pool.
+
+    Each shard is reduced to a DescriptiveState in its own process, and the
+    states are merged exactly in the parent.
+
+    Args:
+        df (pd.DataFrame): Preprocessed flight dataset
+        workers (int): Number of worker processes; defaults to the CPU count
+        shard_by (str): Shard strategy, see shard_frame
+        sections (list): Sections to compute; None computes all of them
+        verbose (bool): Print the results like the individual analyses do
+        approximate (bool): Merge KLL sketches of the shards for the
+            describe() quartiles instead of value histograms
+
+    Returns:
+        dict: Dictionary containing the requested analysis results
+    """
+    workers = workers or default_workers()
+    shards = shard_frame(df, workers, shard_by)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Shard indexes seed the shards' sketches independently
+        states = list(pool.map(_descriptive_shard, shards, [sections] * len(shards),
+                               [approximate] * len(shards), range(len(shards))))
+
+    state = DescriptiveState(sections, approximate=approximate)
+    for shard_state in states:
+        state.merge(shard_state)
+    results = state.finalize()
+
+    if verbose:
+        print_analysis_results(results)
+
+    return results
+
+def parallel_time_series_data(df, workers=None, shard_by='month'):
+    """
+    prepare_time_series_data over shards in a process pool.
+
+    Args:
+        df (pd.DataFrame): Flight data
+        workers (int): Number of worker processes; defaults to the CPU count
+        shard_by (str): Shard strategy, see shard_frame
+
+    Returns:
+        pd.DataFrame: Daily aggregated time series data
+    """
+    workers = workers or default_workers()
+    shards = shard_frame(df, workers, shard_by)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        partials = list(pool.map(_daily_shard, shards))
+    return finalize_daily_partials(merge_daily_partials(partials))
+
+def byte_range_shards(data_file, shards):
+    """
+    Split a CSV file into line-aligned byte ranges after the header.
+
+    Args:
+        data_file (str): Path to the CSV file
+        shards (int): Number of ranges wanted
+
+    Returns:
+        list: (start, end) byte offsets; each range holds whole lines
+    """
+    size = os.path.getsize(data_file)
+    with open(data_file, 'rb') as f:
+        f.readline()
+        data_start = f.tell()
+        offsets = [data_start]
+        for i in range(1, shards):
+            target = max(data_start + (size - data_start) * i // shards, offsets[-1])
+            f.seek(target)
+            if target > data_start:
+                f.readline()
+            offsets.append(min(f.tell(), size))
+        offsets.append(size)
+    return [(start, end) for start, end in zip(offsets[:-1], offsets[1:]) if end > start]
+
+def read_byte_range(data_file, start, end, typed=True):
+    """
+    Parse one byte range of the CSV with the temporal columns added.
+
+    Args:
+        data_file (str): Path to the CSV file
+        start (int): First byte of the range
+        end (int): Byte after the range
+        typed (bool): Read with the explicit dtype map
+
+    Returns:
+        pd.DataFrame: Flight rows in the range
+    """
+    names = pd.read_csv(data_file, nrows=0).columns.tolist()
+    with open(data_file, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    read_kwargs = build_read_kwargs(data_file, typed)
+    df = pd.read_csv(io.BytesIO(data), header=None, names=names, **read_kwargs)
+    return add_temporal_columns(df, typed)
+
+def _fill_statistics_shard(data_file, byte_range, typed):
+    return FillStatistics().update(read_byte_range(data_file, *byte_range, typed))
+
+def _aggregate_shard(data_file, byte_range, typed, fill_values, sections):
+    df = fill_missing_values(read_byte_range(data_file, *byte_range, typed), fill_values)
+    return DescriptiveState(sections).update(df), aggregate_daily_partials(df)
+
+def run_sharded_pipeline(file_path='data/flight_data_2024.csv', workers=None, typed=True, sections=None,
+                         verbose=True):
+    """
+    Preprocess, analyse and aggregate daily series with every core busy.
+
+    The file is cut into line-aligned byte ranges. In the first round each
+    worker parses its range and returns mergeable fill statistics; the
+    merged fill values are then sent back out and each worker imputes its
+    range and returns a DescriptiveState plus daily partials. Only these
+    small partial results cross process boundaries.
+
+    Args:
+        file_path (str): Path to the CSV file
+        workers (int): Number of worker processes; defaults to the CPU count
+        typed (bool): Read with the explicit dtype map
+        sections (list): Descriptive sections to compute; None computes all
+        verbose (bool): Print the descriptive results
+
+    Returns:
+        dict: 'analysis' (perform_complete_analysis results) and
+            'time_series' (prepare_time_series_data table of the
+            preprocessed rows)
+    """
+    workers = workers or default_workers()
+    data_file = resolve_data_file(file_path)
+    ranges = byte_range_shards(data_file, workers)
+    n = len(ranges)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        statistics = FillStatistics()
+        for shard_statistics in pool.map(_fill_statistics_shard, [data_file] * n, ranges, [typed] * n):
+            statistics.merge(shard_statistics)
+        fill_values = statistics.fill_values()
+
+        outputs = list(pool.map(_aggregate_shard, [data_file] * n, ranges, [typed] * n,
+                                [fill_values] * n, [sections] * n))
+
+    state = DescriptiveState(sections)
+    for shard_state, _ in outputs:
+        state.merge(shard_state)
+    results = state.finalize()
+    ts_data = finalize_daily_partials(merge_daily_partials([partials for _, partials in outputs]))
+
+    if verbose:
+        print_analysis_results(results)
+
+    return {
+        'analysis': results,
+        'time_series': ts_data
+    }
+
+# Main execution (only runs when script is executed directly)
+if __name__ == "__main__":
+    pipeline_results = run_sharded_pipeline('data/flight_data_2024.csv')
+    print(f"\nDaily series: {len(pipeline_results['time_series'])} days")
@@ -0,0 +1,279 @@
+# Year/month partitioned flight datasets with month and origin pushdown
+
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_cache import parquet_available
+from data_preprocess import FLIGHT_DTYPES, add_temporal_columns, select_columns
+from profiling import profile_stage
+
+# Rows per Parquet row group; smaller groups prune more finely by origin
+ROW_GROUP_SIZE = 25_000
+
+PARTITION_SUFFIXES = ('.parquet', '.csv')
+
+# Partition directories are either Hive style (year=2024/month=3) or plain numbers (2024/03)
+_PARTITION_DIR = re.compile(r'^(?:(?P<key>year|month)=)?(?P<value>\d+)$')
+
+def _partition_value(name, key):
+    match = _PARTITION_DIR.match(name)
+    if match is None or match.group('key') not in (None, key):
+        return None
+    return int(match.group('value'))
+
+def discover_partitions(root):
+    """
+    List the data files of a year/month partitioned dataset.
+
+    Args:
+        root (str): Dataset directory containing ``year=YYYY/month=M`` (or
+            ``YYYY/MM``) subdirectories of Parquet or CSV files
+
+    Returns:
+        pd.DataFrame: 'year', 'month', 'path' and 'format' per file, in
+            chronological order
+    """
+    files = []
+    for year_dir in Path(root).iterdir():
+        year = _partition_value(year_dir.name, 'year') if year_dir.is_dir() else None
+        if year is None:
+            continue
+        for month_dir in year_dir.iterdir():
+            month = _partition_value(month_dir.name, 'month') if month_dir.is_dir() else None
+            if month is None or not 1 <= month <= 12:
+                continue
+            for path in sorted(month_dir.iterdir()):
+                if path.suffix in PARTITION_SUFFIXES and path.is_file():
+                    files.append((year, month, str(path), path.suffix[1:]))
+
+    partitions = pd.DataFrame(files, columns=['year', 'month', 'path', 'format'])
+    return partitions.sort_values(['year', 'month', 'path'], ignore_index=True)
+
+def month_bounds(months):
+    """
+    Normalize a month filter to an inclusive (first, last) pair of periods.
+
+    Args:
+        months: A single month ('2024-03', a Timestamp or Period) or a
+            (first, last) pair of them, e.g. ('2024-01', '2024-03')
+
+    Returns:
+        tuple: (first, last) as monthly pd.Period
+    """
+    if isinstance(months, (tuple, list)):
+        first, last = months
+    else:
+        first = last = months
+    first, last = pd.Period(first, freq='M'), pd.Period(last, freq='M')
+    if first > last:
+        raise ValueError(f"Month range {first} to {last} is empty")
+    return first, last
+
+def select_partitions(partitions, months=None):
+    """
+    Keep the partitions whose month falls in the requested range.
+
+    Args:
+        partitions (pd.DataFrame): Result of discover_partitions
+        months: Month filter accepted by month_bounds, or None for all
+
+    Returns:
+        pd.DataFrame: The matching partitions
+    """
+    if months is None:
+        return partitions
+    first, last = month_bounds(months)
+    ordinal = partitions['year'] * 12 + partitions['month'] - 1
+    keep = ordinal.between(first.year * 12 + first.month - 1, last.year * 12 + last.month - 1)
+    return partitions[keep]
+
+def matching_row_groups(metadata, column, values):
+    """
+    Row groups of a Parquet file whose min/max statistics admit any value.
+
+    Args:
+        metadata (pyarrow.parquet.FileMetaData): Parquet footer
+        column (str): Column the statistics are checked on
+        values (list): Wanted values
+
+    Returns:
+        list: Indices of the row groups that may contain a wanted value
+    """
+    index = metadata.schema.to_arrow_schema().get_field_index(column)
+    keep = []
+    for i in range(metadata.num_row_groups):
+        stats = metadata.row_group(i).column(index).statistics if index >= 0 else None
+        if (stats is None or not stats.has_min_max
+                or any(stats.min <= value <= stats.max for value in values)):
+            keep.append(i)
+    return keep
+
+def _file_columns(path, file_format):
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+def _read_parquet_partition(path, columns, origins):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    groups = list(range(parquet_file.num_row_groups))
+    if origins is not None:
+        groups = matching_row_groups(parquet_file.metadata, 'origin', origins)
+    table = parquet_file.read_row_groups(groups, columns=columns)
+    if origins is not None:
+        table = table.filter(pc.is_in(table['origin'], value_set=pa.array(origins, type=pa.string())))
+    return table.to_pandas(), len(groups), parquet_file.num_row_groups
+
+def _read_csv_partition(path, columns, origins):
+    # CSV has no row-group statistics, so origins can only be filtered after parsing
+    df = pd.read_csv(path, usecols=columns)
+    if origins is not None:
+        df = df[df['origin'].isin(origins)]
+    return df, 0, 0
+
+def filter_flights(df, months=None, origins=None):
+    """
+    Apply month and origin filters to an already loaded frame.
+
+    Used for single-file sources, where nothing can be pushed down.
+
+    Args:
+        df (pd.DataFrame): Flights with 'fl_date' (or 'year'/'month') and 'origin'
+        months: Month filter accepted by month_bounds, or None
+        origins (list): Origin airport codes, or None
+
+    Returns:
+        pd.DataFrame: The matching rows
+    """
+    keep = np.ones(len(df), dtype=bool)
+    if months is not None:
+        first, last = month_bounds(months)
+        if 'fl_date' in df.columns:
+            ordinal = df['fl_date'].dt.year * 12 + df['fl_date'].dt.month - 1
+        else:
+            ordinal = df['year'] * 12 + df['month'] - 1
+        keep &= ordinal.between(first.year * 12 + first.month - 1, last.year * 12 + last.month - 1).to_numpy()
+    if origins is not None:
+        keep &= df['origin'].isin(origins).to_numpy()
+    return df if keep.all() else df[keep]
+
+def load_partitioned_flight_data(root, months=None, origins=None, typed=False, analyses=None, time_features=False):
+    """
+    Load the flights of a partitioned dataset, reading only what the filters need.
+
+    The month range prunes whole partition directories. For Parquet files
+    the origin list additionally skips every row group whose origin
+    statistics exclude the wanted airports, which is effective because
+    write_partitioned_dataset sorts each partition by origin; CSV partitions
+    are filtered after parsing. The result matches load_flight_data on the
+    same rows, including the temporal columns.
+
+    Args:
+        root (str): Dataset directory, see discover_partitions
+        months: Month filter accepted by month_bounds, or None for all
+        origins (list): Origin airport codes, or None for all
+        typed (bool): Apply the FLIGHT_DTYPES dtype map
+        analyses (list): Only read the columns these analyses need
+        time_features (bool): Add the add_time_features columns
+
+    Returns:
+        pd.DataFrame: Loaded flight rows
+    """
+    partitions = discover_partitions(root)
+    if partitions.empty:
+        raise FileNotFoundError(f"No year/month partitions found under {root}")
+    selected = select_partitions(partitions, months)
+    if origins is not None:
+        origins = list(origins)
+    if (selected['format'] == 'parquet').any() and not parquet_available():
+        raise ImportError("Reading Parquet partitions requires pyarrow")
+
+    frames, groups_read, groups_total = [], 0, 0
+    with profile_stage('read_partitions') as stage:
+        for path, file_format in zip(selected['path'], selected['format']):
+            columns = select_columns(_file_columns(path, file_format), analyses)
+            if origins is not None and 'origin' not in columns:
+                columns = columns + ['origin']
+            reader = _read_parquet_partition if file_format == 'parquet' else _read_csv_partition
+            frame, read, total = reader(path, columns, origins)
+            frames.append(frame)
+            groups_read += read
+            groups_total += total
+        if frames:
+            df = pd.concat(frames, ignore_index=True)
+        else:
+            first = partitions.iloc[0]
+            df = pd.DataFrame(columns=select_columns(_file_columns(first['path'], first['format']), analyses))
+        stage['rows'] = len(df)
+
+    groups = f', {groups_read} of {groups_total} row groups' if groups_total else ''
+    print(f'Using partitioned data: {root} ({len(selected)} of {len(partitions)} files{groups}, {len(df):,} rows)')
+
+    for col in df.select_dtypes('category').columns:
+        df[col] = df[col].astype(object)
+    if typed:
+        df = df.astype({col: FLIGHT_DTYPES[col] for col in df.columns if col in FLIGHT_DTYPES})
+    return add_temporal_columns(df, typed, time_features)
+
+def write_partitioned_dataset(source, root, file_format='parquet', row_group_size=ROW_GROUP_SIZE, verbose=True):
+    """
+    Split a flight CSV (or frame) into year/month partitions.
+
+    Rows are written to ``root/year=YYYY/month=M/part-<name>.<format>``
+    sorted by origin and date, so Parquet row-group statistics on origin
+    are narrow enough for load_partitioned_flight_data to skip most groups.
+    Call it once per yearly source file; a partition that already exists
+    for the same source name is replaced.
+
+    Args:
+        source (str | pd.DataFrame): Flight CSV path or raw flight rows
+        root (str): Dataset directory
+        file_format (str): 'parquet' or 'csv'
+        row_group_size (int): Rows per Parquet row group
+        verbose (bool): Print a summary
+
+    Returns:
+        list: Paths of the files written
+    """
+    if file_format not in ('parquet', 'csv'):
+        raise ValueError(f"Unknown partition format {file_format!r}; expected 'parquet' or 'csv'")
+    if file_format == 'parquet' and not parquet_available():
+        raise ImportError("Writing Parquet partitions requires pyarrow")
+
+    name = 'data'
+    if not isinstance(source, pd.DataFrame):
+        name = Path(source).stem
+        source = pd.read_csv(source)
+    dates = pd.to_datetime(source['fl_date'], errors='coerce')
+
+    paths = []
+    for (year, month), part in source.groupby([dates.dt.year, dates.dt.month]):
+        part = part.iloc[np.lexsort((dates[part.index].to_numpy(), part['origin'].astype(str).to_numpy()))]
+        directory = Path(root) / f'year={int(year)}' / f'month={int(month)}'
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'part-{name}.{file_format}'
+        tmp_path = path.with_name(path.name + '.tmp')
+        if file_format == 'parquet':
+            part.to_parquet(tmp_path, index=False, row_group_size=row_group_size)
+        else:
+            part.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        paths.append(str(path))
+
+    if verbose:
+        print(f'Wrote {len(source):,} rows to {len(paths)} {file_format} partitions under {root}')
+    return paths
+
+# Main execution (only runs when script is executed directly)
+if __name__ == "__main__":
+    write_partitioned_dataset('data/flight_data_2024.csv', 'data/flights')
+    df = load_partitioned_flight_data('data/flights', months=('2024-01', '2024-03'), origins=['ATL', 'DFW', 'ORD'])
+    print(df.groupby('origin')['air_time'].mean())
@@ -0,0 +1,214 @@
+# Per-stage timing and memory instrumentation for the analysis pipeline
+
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Profiler collecting stages in this process; profile_stage is a no-op without one
+_active_profiler = None
+
+def peak_rss_bytes():
+    """High-water mark of this process's resident set size, or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def _cpu_seconds():
+    # User + system time of this process and of any reaped worker processes
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+def profile_stage(name, rows=None):
+    """
+    Time one pipeline stage under the active PipelineProfiler.
+
+    Yields the stage record, so the stage can fill in ``record['rows']``
+    once it knows them. Without an active profiler this is a no-op that
+    yields a throwaway dict.
+
+    Args:
+        name (str): Stage name, e.g. 'read_csv' or 'savefig'
+        rows (int): Rows processed, when known up front
+    """
+    if _active_profiler is None:
+        return contextlib.nullcontext({})
+    return _active_profiler.stage(name, rows)
+
+class PipelineProfiler:
+    """
+    Collects wall time, CPU time, peak RSS growth and rows for each stage.
+
+    Use it as a context manager around a run; every profile_stage call made
+    in this process meanwhile is recorded. Stages executed inside worker
+    processes are not seen, but their CPU time is included in the enclosing
+    stage once the pool has shut down.
+
+    ``peak_rss_delta_mb`` is how far a stage raised the process's RSS
+    high-water mark, so a stage that stays below an earlier peak reports 0.
+    With ``cprofile=True`` every outermost stage runs under cProfile (which
+    inflates its timings) and write() keeps the statistics of the slowest.
+    """
+
+    def __init__(self, cprofile=False):
+        self.cprofile = cprofile
+        self.records = []
+        self.slowest_profile = None
+        self._stack = []
+        self._started = None
+        self._elapsed = None
+        self._previous = None
+
+    def __enter__(self):
+        global _active_profiler
+        self._previous = _active_profiler
+        _active_profiler = self
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        global _active_profiler
+        _active_profiler = self._previous
+        self._elapsed = time.perf_counter() - self._started
+        return False
+
+    @contextlib.contextmanager
+    def stage(self, name, rows=None):
+        """Record one stage; see profile_stage."""
+        record = {
+            'stage': name,
+            'parent': self._stack[-1] if self._stack else None,
+            'rows': rows,
+            'start_s': time.perf_counter() - (self._started or time.perf_counter())
+        }
+        profile = cProfile.Profile() if self.cprofile and not self._stack else None
+        self._stack.append(name)
+        peak_before = peak_rss_bytes()
+        cpu_before = _cpu_seconds()
+        wall_before = time.perf_counter()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield record
+        finally:
+            if profile is not None:
+                profile.disable()
+            record['wall_s'] = time.perf_counter() - wall_before
+            record['cpu_s'] = _cpu_seconds() - cpu_before
+            peak_after = peak_rss_bytes()
+            record['peak_rss_mb'] = peak_after / 1e6 if peak_after is not None else None
+            record['peak_rss_delta_mb'] = ((peak_after - peak_before) / 1e6
+                                           if peak_after is not None else None)
+            self._stack.pop()
+            self.records.append(record)
+            if profile is not None and (self.slowest_profile is None
+                                        or record['wall_s'] > self.slowest_profile[1]):
+                self.slowest_profile = (name, record['wall_s'], profile)
+
+    def to_frame(self):
+        """
+        Stage records in start order.
+
+        Returns:
+            pd.DataFrame: One row per stage call
+        """
+        import pandas as pd
+
+        columns = ['stage', 'parent', 'rows', 'start_s', 'wall_s', 'cpu_s', 'peak_rss_mb', 'peak_rss_delta_mb']
+        frame = pd.DataFrame(self.records, columns=columns).astype({'rows': 'Int64'})
+        return frame.sort_values('start_s', ignore_index=True)
+
+    def summary(self):
+        """
+        Totals per stage name, slowest first.
+
+        Returns:
+            pd.DataFrame: 'calls', 'rows', 'wall_s', 'cpu_s' and the largest
+            'peak_rss_delta_mb' per stage
+        """
+        return self.to_frame().groupby('stage').agg(
+            calls=('wall_s', 'size'),
+            rows=('rows', lambda rows: rows.sum(min_count=1)),
+            wall_s=('wall_s', 'sum'),
+            cpu_s=('cpu_s', 'sum'),
+            peak_rss_delta_mb=('peak_rss_delta_mb', 'max')
+        ).sort_values('wall_s', ascending=False).round(4)
+
+    def write(self, output_dir='outputs/profiles', label='run', **metadata):
+        """
+        Write the run's profile as JSON and CSV (plus .prof with cprofile).
+
+        Args:
+            output_dir (str): Directory for the profile files
+            label (str): Prefix of the file names, e.g. the CLI subcommand
+            **metadata: Extra run information stored in the JSON, e.g. the
+                data file and its size
+
+        Returns:
+            dict: Paths written, keyed 'json', 'csv' and optionally 'cprofile'
+        """
+        import pandas as pd
+
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%dT%H%M%S')
+        base = output_dir / f'profile-{label}-{stamp}'
+        frame = self.to_frame()
+
+        run = {
+            'label': label,
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'total_wall_s': self._elapsed,
+            **metadata
+        }
+        paths = {'json': f'{base}.json', 'csv': f'{base}.csv'}
+        with open(paths['json'], 'w') as f:
+            json.dump({'run': run, 'stages': json.loads(frame.to_json(orient='records'))}, f, indent=2)
+        frame.to_csv(paths['csv'], index=False)
+
+        if self.slowest_profile is not None:
+            name, _, profile = self.slowest_profile
+            paths['cprofile'] = f'{base}-{name}.prof'
+            profile.dump_stats(paths['cprofile'])
+
+        return paths
+
+def profiled(name=None):
+    """
+    Decorator form of profile_stage.
+
+    Rows default to ``len()`` of the first argument when it is a pandas
+    object or array.
+
+    Args:
+        name (str): Stage name; defaults to the function name
+    """
+    def decorate(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _active_profiler is None:
+                return func(*args, **kwargs)
+            rows = len(args[0]) if args and hasattr(args[0], 'shape') else None
+            with _active_profiler.stage(stage_name, rows):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,284 @@
+# Sparse origin-destination route matrices for route-level volume, cancellation and delay metrics
+
+import numpy as np
+import pandas as pd
+
+from profiling import profiled
+
+# Delay columns averaged per route
+ROUTE_DELAY_COLUMNS = ['weather_delay', 'late_aircraft_delay']
+
+class RouteMatrix:
+    """
+    Per-month origin × destination aggregates stored as sparse matrices.
+
+    Airports are integer coded once (origins and destinations share one
+    code space), and each measure is a CSR matrix of shape
+    ``(months * airports, airports)``: month ``m`` is the row block
+    ``m * airports:(m + 1) * airports``. Only routes that were flown take
+    memory, so a year with a few thousand routes among hundreds of airports
+    costs kilobytes where a dense month × origin × destination pivot would
+    be mostly zeros.
+
+    Measures are 'flights', 'cancelled' and, per delay column, '<col>_sum'
+    and '<col>_count' (non-missing values), so rates and means can be
+    derived for any month or for all months together.
+    """
+
+    def __init__(self, airports, months, measures):
+        self.airports = airports
+        self.months = months
+        self.measures = measures
+
+    @classmethod
+    @profiled('build_route_matrix')
+    def build(cls, df, delay_columns=ROUTE_DELAY_COLUMNS):
+        """
+        Aggregate flights into route matrices.
+
+        Args:
+            df (pd.DataFrame): Flights with 'origin', 'dest', 'cancelled' and
+                either a datetime 'fl_date' or a 'month' column
+            delay_columns (list): Delay columns to total per route
+
+        Returns:
+            RouteMatrix: The matrices
+
+        Raises:
+            ValueError: When ``df`` has no 'dest' column
+        """
+        if 'dest' not in df.columns:
+            raise ValueError("Route analytics need a 'dest' column (full BTS/Kaggle export); "
+                             "this dataset only has origin airports")
+        from scipy import sparse
+
+        # Object dtype unifies categorical columns with different categories and
+        # keeps missing airports as NaN, which factorize codes as -1
+        codes, airports = pd.factorize(pd.concat([df['origin'], df['dest']], ignore_index=True).astype(object),
+                                       sort=True)
+        origin, dest = codes[:len(df)], codes[len(df):]
+        if 'fl_date' in df.columns:
+            month_values = df['fl_date'].dt.to_period('M')
+        else:
+            month_values = df['month']
+        month_codes, months = pd.factorize(month_values, sort=True)
+
+        # Rows with an unknown airport or month (code -1) are left out
+        keep = (origin >= 0) & (dest >= 0) & (month_codes >= 0)
+        n = len(airports)
+        rows = month_codes[keep].astype('int64') * n + origin[keep]
+        cols = dest[keep]
+        shape = (len(months) * n, n)
+
+        def matrix(weights):
+            # COO -> CSR sums the weights of repeated (row, col) pairs
+            return sparse.coo_matrix((weights, (rows, cols)), shape=shape).tocsr()
+
+        measures = {'flights': matrix(np.ones(keep.sum(), dtype='float64'))}
+        if 'cancelled' in df.columns:
+            measures['cancelled'] = matrix(df['cancelled'].to_numpy(dtype='float64')[keep])
+        for col in delay_columns:
+            if col in df.columns:
+                values = df[col].to_numpy(dtype='float64')[keep]
+                present = ~np.isnan(values)
+                measures[f'{col}_sum'] = matrix(np.where(present, values, 0.0))
+                measures[f'{col}_count'] = matrix(present.astype('float64'))
+        return cls(pd.Index(airports, name='airport'), pd.Index(months, name='month'), measures)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the sparse matrices."""
+        return sum(m.data.nbytes + m.indices.nbytes + m.indptr.nbytes for m in self.measures.values())
+
+    def _month_code(self, month):
+        try:
+            return self.months.get_loc(pd.Period(month, freq='M') if isinstance(self.months, pd.PeriodIndex)
+                                       else month)
+        except KeyError:
+            raise KeyError(f"Month {month} not in the route matrix ({self.months[0]} to {self.months[-1]})") from None
+
+    def matrix(self, measure='flights', month=None):
+        """
+        One measure as an airports × airports sparse matrix.
+
+        Args:
+            measure (str): Key of ``measures``
+            month: Month label (e.g. '2024-03', or a month number when
+                built without fl_date); None sums every month
+
+        Returns:
+            scipy.sparse.csr_matrix: Rows are origins, columns destinations
+        """
+        stacked = self.measures[measure]
+        n = len(self.airports)
+        if month is not None:
+            code = self._month_code(month)
+            return stacked[code * n:(code + 1) * n]
+        from scipy import sparse
+
+        # Folding every month block onto rows 0..n-1 sums them (COO -> CSR adds duplicates)
+        cells = stacked.tocoo()
+        return sparse.coo_matrix((cells.data, (cells.row % n, cells.col)), shape=(n, n)).tocsr()
+
+    def routes(self, month=None):
+        """
+        Route metrics of every flown route.
+
+        Args:
+            month: Month label, or None for all months
+
+        Returns:
+            pd.DataFrame: 'origin', 'dest', 'flights', 'cancelled',
+                'cancellation_rate' and 'avg_<delay>' per route, by flights
+                descending
+        """
+        flights = self.matrix('flights', month).tocoo()
+        origins, dests = flights.row, flights.col
+        routes = pd.DataFrame({
+            'origin': self.airports[origins],
+            'dest': self.airports[dests],
+            'flights': flights.data.astype('int64'),
+        })
+        for measure in self.measures:
+            if measure == 'flights' or measure.endswith('_count'):
+                continue
+            values = np.asarray(self.matrix(measure, month)[origins, dests]).ravel()
+            if measure == 'cancelled':
+                routes['cancelled'] = values.astype('int64')
+                routes['cancellation_rate'] = (values / flights.data * 100).round(2)
+            else:
+                col = measure[:-len('_sum')]
+                counts = np.asarray(self.matrix(f'{col}_count', month)[origins, dests]).ravel()
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    routes[f'avg_{col}'] = np.round(values / counts, 2)
+        return routes.sort_values(['flights', 'origin', 'dest'], ascending=[False, True, True], ignore_index=True)
+
+    def top_routes(self, k=10, by='flights', month=None):
+        """
+        The k routes with the largest value of a measure.
+
+        Args:
+            k (int): Number of routes
+            by (str): Measure to rank by, e.g. 'flights' or 'cancelled'
+            month: Month label, or None for all months
+
+        Returns:
+            pd.DataFrame: 'origin', 'dest' and the measure, largest first
+        """
+        values = self.matrix(by, month).tocoo()
+        k = min(k, values.nnz)
+        # argpartition selects the k largest stored entries without sorting them all
+        top = np.argpartition(-values.data, k - 1)[:k] if k else np.empty(0, 'int64')
+        top = top[np.lexsort((values.col[top], values.row[top], -values.data[top]))]
+        return pd.DataFrame({
+            'origin': self.airports[values.row[top]],
+            'dest': self.airports[values.col[top]],
+            by: values.data[top],
+        })
+
+    def degree(self, month=None):
+        """
+        Per-airport route degree and flight volume.
+
+        Args:
+            month: Month label, or None for all months
+
+        Returns:
+            pd.DataFrame: 'out_degree' and 'in_degree' (distinct
+                destinations and origins), 'departures' and 'arrivals' per
+                airport, by out_degree descending
+        """
+        flights = self.matrix('flights', month)
+        flights.eliminate_zeros()
+        degree = pd.DataFrame({
+            'out_degree': flights.getnnz(axis=1),
+            'in_degree': flights.getnnz(axis=0),
+            'departures': np.asarray(flights.sum(axis=1)).ravel().astype('int64'),
+            'arrivals': np.asarray(flights.sum(axis=0)).ravel().astype('int64'),
+        }, index=self.airports)
+        return degree.sort_values(['out_degree', 'departures'], ascending=False)
+
+    def month_over_month(self, measure='flights', k=None):
+        """
+        Route changes between consecutive months.
+
+        The difference of two month blocks is itself sparse, so only routes
+        flown in either month appear.
+
+        Args:
+            measure (str): Measure to compare
+            k (int): Keep the k largest absolute changes per month; None keeps all
+
+        Returns:
+            pd.DataFrame: 'month', 'origin', 'dest', 'previous', 'current',
+                'delta' and 'pct_change' (NaN for new routes)
+        """
+        frames = []
+        previous = self.matrix(measure, self.months[0]) if len(self.months) else None
+        for month in self.months[1:]:
+            current = self.matrix(measure, month)
+            delta = (current - previous).tocoo()
+            nonzero = delta.data != 0
+            rows, cols, change = delta.row[nonzero], delta.col[nonzero], delta.data[nonzero]
+            if k is not None and len(change) > k:
+                keep = np.argpartition(-np.abs(change), k - 1)[:k]
+                rows, cols, change = rows[keep], cols[keep], change[keep]
+            before = np.asarray(previous[rows, cols]).ravel()
+            with np.errstate(invalid='ignore', divide='ignore'):
+                pct_change = np.where(before > 0, change / before * 100, np.nan)
+            frames.append(pd.DataFrame({
+                'month': month,
+                'origin': self.airports[rows],
+                'dest': self.airports[cols],
+                'previous': before,
+                'current': before + change,
+                'delta': change,
+                'pct_change': pct_change.round(2),
+            }))
+            previous = current
+
+        columns = ['month', 'origin', 'dest', 'previous', 'current', 'delta', 'pct_change']
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        changes = pd.concat(frames, ignore_index=True)
+        order = np.lexsort((changes['dest'], changes['origin'], -changes['delta'].abs(), changes['month']))
+        return changes.iloc[order].reset_index(drop=True)
+
+@profiled()
+def analyze_routes(df, k=10):
+    """
+    Print and return the busiest routes, airport degrees and largest monthly route changes.
+
+    Args:
+        df (pd.DataFrame): Flight dataset with 'origin' and 'dest'
+        k (int): Routes listed per table
+
+    Returns:
+        dict: 'route_matrix', 'top_routes', 'airport_degree' and 'route_changes'
+    """
+    route_matrix = RouteMatrix.build(df)
+    top_routes = route_matrix.routes().head(k)
+    airport_degree = route_matrix.degree()
+    route_changes = route_matrix.month_over_month(k=k)
+
+    print(f"\nRoutes: {route_matrix.measures['flights'].nnz:,} month-route cells among "
+          f"{len(route_matrix.airports)} airports ({route_matrix.nbytes / 1e3:.1f} kB)")
+    print("\nBusiest Routes:")
+    print(top_routes)
+    print("\nAirport Route Degree:")
+    print(airport_degree.head(k))
+    print("\nLargest Month-over-Month Route Changes:")
+    print(route_changes.groupby('month', sort=False).head(3))
+
+    return {
+        'route_matrix': route_matrix,
+        'top_routes': top_routes,
+        'airport_degree': airport_degree,
+        'route_changes': route_changes
+    }
+
+# Main execution (only runs when script is executed directly)
+if __name__ == "__main__":
+    from data_cache import load_cached_flight_data
+
+    analyze_routes(load_cached_flight_data('data/flight_data_2024.csv'))
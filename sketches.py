@@ -0,0 +1,336 @@
+# Mergeable summary sketches for chunked and sharded processing
+
+import numpy as np
+import pandas as pd
+
+from fused_analysis import DESCRIBE_INDEX
+
+class ValueHistogram:
+    """
+    Mergeable quantile estimate backed by a histogram of rounded values.
+
+    Values are rounded to a fixed ``resolution`` and counted, so two
+    histograms over different chunks merge by adding their counts. Quantiles
+    are exact for data that already lies on the resolution grid (the flight
+    times and delays are whole minutes) and otherwise off by at most half a
+    resolution step. Memory grows with the number of distinct rounded values,
+    not with the number of rows.
+    """
+
+    def __init__(self, resolution=0.01):
+        self.resolution = resolution
+        self.scale = 1 / resolution
+        self.counts = pd.Series(dtype='int64')
+
+    def update(self, values):
+        """
+        Add the non-null values of a Series or array to the histogram.
+
+        Args:
+            values (pd.Series | np.ndarray): Values to count
+
+        Returns:
+            ValueHistogram: self, for chaining
+        """
+        values = pd.Series(values).dropna()
+        if values.empty:
+            return self
+        keys = np.round(values.to_numpy(dtype='float64') * self.scale).astype('int64')
+        self.counts = self.counts.add(pd.Series(keys).value_counts(), fill_value=0).astype('int64')
+        return self
+
+    def merge(self, other):
+        """
+        Fold another histogram with the same resolution into this one.
+
+        Args:
+            other (ValueHistogram): Histogram built over other rows
+
+        Returns:
+            ValueHistogram: self, for chaining
+        """
+        if other.resolution != self.resolution:
+            raise ValueError("Cannot merge histograms with different resolutions")
+        self.counts = self.counts.add(other.counts, fill_value=0).astype('int64')
+        return self
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def quantile(self, q):
+        """
+        Estimate a quantile with pandas' default linear interpolation.
+
+        Args:
+            q (float): Quantile between 0 and 1
+
+        Returns:
+            float: Estimated quantile, NaN when the histogram is empty
+        """
+        n = self.count
+        if n == 0:
+            return np.nan
+        counts = self.counts.sort_index()
+        cumulative = counts.cumsum().to_numpy()
+        keys = counts.index.to_numpy()
+
+        position = q * (n - 1)
+        lower, upper = int(np.floor(position)), int(np.ceil(position))
+        low_value = keys[np.searchsorted(cumulative, lower, side='right')] / self.scale
+        high_value = keys[np.searchsorted(cumulative, upper, side='right')] / self.scale
+        return float(low_value + (high_value - low_value) * (position - lower))
+
+    def median(self):
+        return self.quantile(0.5)
+
+class KLLSketch:
+    """
+    Mergeable quantile sketch after Karnin, Lang and Liberty (KLL).
+
+    Values are kept in a stack of compactors; an item on level h stands for
+    2**h inputs. When a level outgrows its capacity (k on the top level,
+    shrinking by 2/3 per level below, at least 2) it is sorted and every
+    other item, starting at a random offset, is promoted to the next level.
+    Memory is O(k log(n / k)) regardless of n, and sketches built over
+    different chunks, shards or days merge by concatenating levels.
+
+    Batches larger than ``sample_size`` are first reduced to a uniform
+    sample weighted onto a higher level, standing in for the lowest
+    compactors as in the sampler variant of KLL, so an update costs
+    O(sample_size log sample_size) instead of a sort of the whole batch.
+
+    Error bound: a quantile's rank is within about 1.65% of n of the true
+    rank with 99% confidence for k=200 (the bound published for KLL by
+    Apache DataSketches; it scales roughly as 1/k, e.g. ~0.33% for k=1000).
+    Sampled batches add at most ~0.64% more for the default sample size
+    (Dvoretzky-Kiefer-Wolfowitz at 99%). The minimum, maximum and count are
+    exact.
+    """
+
+    def __init__(self, k=200, seed=None, sample_size=1 << 16):
+        self.k = k
+        self.sample_size = sample_size
+        self.levels = [np.empty(0)]
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - 1 - level
+        return max(int(np.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) <= self._capacity(level):
+                level += 1
+                continue
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            # Levels are concatenations of sorted runs, which a stable sort merges quickly
+            items = np.sort(items, kind='stable')
+            odd = len(items) % 2
+            self.levels[level] = items[:odd]
+            promoted = items[odd + self._rng.integers(2)::2]
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            # Capacities shift when a level is added, so recheck from the bottom
+            level = 0
+
+    def update(self, values):
+        """
+        Add the non-null values of a Series or array to the sketch.
+
+        Args:
+            values (pd.Series | np.ndarray): Values to add
+
+        Returns:
+            KLLSketch: self, for chaining
+        """
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.n += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        level = 0
+        if len(values) > self.sample_size:
+            level = int(np.ceil(np.log2(len(values) / self.sample_size)))
+            values = values[self._rng.integers(0, len(values), len(values) >> level)]
+        while len(self.levels) <= level:
+            self.levels.append(np.empty(0))
+        self.levels[level] = np.concatenate([self.levels[level], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """
+        Fold another sketch into this one.
+
+        Args:
+            other (KLLSketch): Sketch built over other rows
+
+        Returns:
+            KLLSketch: self, for chaining
+        """
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    @property
+    def count(self):
+        return self.n
+
+    def quantile(self, q):
+        """
+        Estimate a quantile.
+
+        Args:
+            q (float): Quantile between 0 and 1
+
+        Returns:
+            float: Estimated quantile (exact at 0 and 1), NaN when empty
+        """
+        if self.n == 0:
+            return np.nan
+        if q <= 0:
+            return float(self.min)
+        if q >= 1:
+            return float(self.max)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2 ** level, dtype='int64')
+                                  for level, items in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        position = np.searchsorted(cumulative, q * cumulative[-1], side='right')
+        return float(items[order][min(position, len(items) - 1)])
+
+    def median(self):
+        return self.quantile(0.5)
+
+def _bit_length(values):
+    # Exact bit length of uint64 values by binary search over the shifts
+    values = values.copy()
+    length = np.zeros(len(values), dtype='uint8')
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = values >> np.uint64(shift)
+        found = high > 0
+        length[found] += shift
+        values = np.where(found, high, values)
+    return length + (values > 0)
+
+class HyperLogLog:
+    """
+    Mergeable distinct-count sketch (HyperLogLog with 64-bit hashes).
+
+    Each value is hashed with pandas' stable hash; the first ``precision``
+    bits pick one of m = 2**precision registers, which keeps the longest
+    run of leading zeros seen in the remaining bits. Sketches merge by
+    taking the register-wise maximum, so counts can be combined across
+    shards and days without double counting shared values.
+
+    Error bound: the relative standard error is 1.04 / sqrt(m), i.e. about
+    0.81% for the default precision 14 (16 KiB of registers), so estimates
+    are within ~2.4% with 99% confidence. Small cardinalities use linear
+    counting and are near exact.
+    """
+
+    def __init__(self, precision=14):
+        if not 4 <= precision <= 18:
+            raise ValueError("HyperLogLog precision must be between 4 and 18")
+        self.precision = precision
+        self.registers = np.zeros(2 ** precision, dtype='uint8')
+
+    @property
+    def relative_error(self):
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def update(self, values):
+        """
+        Add the non-null values of a Series or array to the sketch.
+
+        Args:
+            values (pd.Series | np.ndarray): Values to count
+
+        Returns:
+            HyperLogLog: self, for chaining
+        """
+        values = pd.Series(values).dropna()
+        if values.empty:
+            return self
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy(dtype='uint64')
+        tail_bits = 64 - self.precision
+        buckets = (hashes >> np.uint64(tail_bits)).astype('int64')
+        tails = hashes & np.uint64((1 << tail_bits) - 1)
+        ranks = (tail_bits - _bit_length(tails) + 1).astype('uint8')
+        np.maximum.at(self.registers, buckets, ranks)
+        return self
+
+    def merge(self, other):
+        """
+        Fold another sketch with the same precision into this one.
+
+        Args:
+            other (HyperLogLog): Sketch built over other rows
+
+        Returns:
+            HyperLogLog: self, for chaining
+        """
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precisions")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        """
+        Estimated number of distinct values added.
+
+        Returns:
+            int: Distinct count estimate
+        """
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype('int64')))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are empty
+            return int(round(m * np.log(m / zeros)))
+        return int(round(raw))
+
+def approximate_describe(df, columns, k=200):
+    """
+    describe() for numeric columns with sketched instead of sorted quartiles.
+
+    Count, mean, std, min and max are exact single-pass moments; the
+    quartiles come from a KLLSketch per column (see its error bound), so
+    no column is sorted in full.
+
+    Args:
+        df (pd.DataFrame): Flight dataset
+        columns (list): Numeric columns to describe
+        k (int): KLL accuracy parameter
+
+    Returns:
+        pd.DataFrame: Same layout as ``df[columns].describe()``
+    """
+    stats = {}
+    for col in columns:
+        values = df[col].to_numpy(dtype='float64')
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            stats[col] = [0] + [np.nan] * 7
+            continue
+        sketch = KLLSketch(k, seed=0).update(values)
+        std = values.std(ddof=1) if len(values) > 1 else np.nan
+        quartiles = [sketch.quantile(q) for q in (0.25, 0.5, 0.75)]
+        stats[col] = [len(values), values.mean(), std, sketch.min, *quartiles, sketch.max]
+    return pd.DataFrame(stats, index=DESCRIBE_INDEX, columns=columns, dtype='float64')
@@ -0,0 +1,248 @@
+# Streaming, bounded-memory preprocessing for files larger than RAM
+
+from pathlib import Path
+
+import pandas as pd
+
+from data_preprocess import (
+    ESSENTIAL_COLUMNS, FLIGHT_DTYPES, MEAN_FILL_COLUMNS, MEDIAN_FILL_COLUMNS, ZERO_FILL_COLUMNS,
+    add_temporal_columns, build_read_kwargs, fill_missing_values, resolve_data_file
+)
+from sketches import ValueHistogram
+
+# Rows sampled to estimate the in-memory size of one parsed row
+SAMPLE_ROWS = 10_000
+
+# Working copies alive per chunk while it is read, imputed and written
+CHUNK_MEMORY_FACTOR = 4
+
+def estimate_chunksize(data_file, memory_budget_mb=512, typed=False, analyses=None):
+    """
+    Pick a CSV chunk size that keeps one chunk's working set inside the budget.
+
+    Args:
+        data_file (str): Resolved path to the CSV file
+        memory_budget_mb (float): Peak memory allowed for chunk processing
+        typed (bool): Read with the explicit dtype map
+        analyses (list): Only read the columns these analyses need
+
+    Returns:
+        int: Number of rows per chunk
+    """
+    sample = pd.read_csv(data_file, nrows=SAMPLE_ROWS, **build_read_kwargs(data_file, typed, analyses))
+    sample = add_temporal_columns(sample, typed)
+    if sample.empty:
+        return SAMPLE_ROWS
+    bytes_per_row = sample.memory_usage(deep=True).sum() / len(sample)
+    return max(1_000, int(memory_budget_mb * 1024 ** 2 / (bytes_per_row * CHUNK_MEMORY_FACTOR)))
+
+def iter_flight_chunks(file_path='data/flight_data_2024.csv', chunksize=None, memory_budget_mb=512,
+                       typed=False, analyses=None):
+    """
+    Yield the flight dataset in chunks with the temporal columns added.
+
+    Args:
+        file_path (str): Path to the CSV file
+        chunksize (int): Rows per chunk; derived from the budget when omitted
+        memory_budget_mb (float): Peak memory allowed for chunk processing
+        typed (bool): Read with the explicit dtype map
+        analyses (list): Only read the columns these analyses need
+
+    Yields:
+        pd.DataFrame: One chunk of loaded flight rows
+    """
+    data_file = resolve_data_file(file_path)
+    if chunksize is None:
+        chunksize = estimate_chunksize(data_file, memory_budget_mb, typed, analyses)
+    read_kwargs = build_read_kwargs(data_file, typed, analyses)
+    with pd.read_csv(data_file, chunksize=chunksize, **read_kwargs) as reader:
+        for chunk in reader:
+            yield add_temporal_columns(chunk, typed)
+
+class FillStatistics:
+    """
+    Mergeable running state for the fill values fill_missing_values uses.
+
+    Means come from running sums and counts; medians come from a mergeable
+    ValueHistogram, exact for values on the ``resolution`` grid. Rows
+    missing an essential column are excluded, as in fill_missing_values.
+    """
+
+    def __init__(self, resolution=0.01):
+        self.resolution = resolution
+        self.sums = {}
+        self.counts = {}
+        self.histograms = {}
+
+    def update(self, chunk):
+        """
+        Fold one chunk of loaded flight rows into the statistics.
+
+        Args:
+            chunk (pd.DataFrame): Flight rows before imputation
+
+        Returns:
+            FillStatistics: self, for chaining
+        """
+        existing_essentials = [c for c in ESSENTIAL_COLUMNS if c in chunk.columns]
+        if existing_essentials:
+            chunk = chunk.dropna(subset=existing_essentials)
+
+        for col in MEAN_FILL_COLUMNS:
+            if col in chunk.columns:
+                self.sums[col] = self.sums.get(col, 0.0) + chunk[col].sum()
+                self.counts[col] = self.counts.get(col, 0) + chunk[col].count()
+
+        for col in MEDIAN_FILL_COLUMNS:
+            if col in chunk.columns:
+                self.histograms.setdefault(col, ValueHistogram(self.resolution)).update(chunk[col])
+        return self
+
+    def merge(self, other):
+        """
+        Fold statistics computed over other rows into this state.
+
+        Args:
+            other (FillStatistics): Statistics from another chunk or shard
+
+        Returns:
+            FillStatistics: self, for chaining
+        """
+        for col, value in other.sums.items():
+            self.sums[col] = self.sums.get(col, 0.0) + value
+            self.counts[col] = self.counts.get(col, 0) + other.counts[col]
+        for col, histogram in other.histograms.items():
+            self.histograms.setdefault(col, ValueHistogram(self.resolution)).merge(histogram)
+        return self
+
+    def fill_values(self):
+        """
+        Finalize the running state into fill values.
+
+        Returns:
+            dict: Column -> fill value
+        """
+        fill_values = {col: self.sums[col] / self.counts[col] if self.counts[col] else float('nan')
+                       for col in self.sums}
+        fill_values.update({col: hist.median() for col, hist in self.histograms.items()})
+        return fill_values
+
+def compute_fill_statistics(chunks, resolution=0.01):
+    """
+    First pass: compute the fill values fill_missing_values would use.
+
+    Args:
+        chunks (iterable): DataFrames as yielded by iter_flight_chunks
+        resolution (float): Histogram resolution for median columns
+
+    Returns:
+        dict: Column -> fill value
+    """
+    statistics = FillStatistics(resolution)
+    for chunk in chunks:
+        statistics.update(chunk)
+    return statistics.fill_values()
+
+def _parquet_writer(output_path, first_chunk):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # The first chunk fixes the column order and types, except where a later
+    # chunk could differ: imputed columns can get fractional fill values, and
+    # integers that were inferred rather than read with their declared dtype
+    # can get NaNs, so both are written as float64. Columns that are all null
+    # in the first chunk are written as float64 when declared numeric and
+    # as strings otherwise, like declared categories.
+    imputed = set(MEAN_FILL_COLUMNS + MEDIAN_FILL_COLUMNS + ZERO_FILL_COLUMNS)
+    schema = pa.Schema.from_pandas(first_chunk, preserve_index=False)
+    for i, field in enumerate(schema):
+        declared = FLIGHT_DTYPES.get(field.name)
+        if declared == 'category' or declared is None and pa.types.is_null(field.type):
+            schema = schema.set(i, pa.field(field.name, pa.string()))
+        elif pa.types.is_null(field.type) or pa.types.is_integer(field.type) and (
+                field.name in imputed or str(first_chunk[field.name].dtype) != declared):
+            schema = schema.set(i, pa.field(field.name, pa.float64()))
+    return pq.ParquetWriter(output_path, schema), schema
+
+def _plain_columns(chunk):
+    # Category sets differ between chunks, so write them as plain values
+    for col in chunk.select_dtypes('category').columns:
+        chunk[col] = chunk[col].astype(object)
+    return chunk
+
+def stream_preprocess_flight_data(file_path='data/flight_data_2024.csv', output_path='data/flight_data_processed.csv',
+                                  memory_budget_mb=512, chunksize=None, typed=False, analyses=None,
+                                  verbose=True):
+    """
+    Two-pass chunked equivalent of preprocess_flight_data.
+
+    The first pass computes the imputation statistics without holding the
+    file in memory; the second pass imputes each chunk and appends it to
+    ``output_path`` (CSV, or Parquet when the suffix is .parquet and pyarrow
+    is installed). Only one chunk is resident at a time, and the chunk size
+    is derived from ``memory_budget_mb``.
+
+    Args:
+        file_path (str): Path to the CSV file
+        output_path (str): Destination for the preprocessed rows
+        memory_budget_mb (float): Peak memory allowed for chunk processing
+        chunksize (int): Rows per chunk; derived from the budget when omitted
+        typed (bool): Read with the explicit dtype map
+        analyses (list): Only read the columns these analyses need
+        verbose (bool): Print progress and the fill values
+
+    Returns:
+        dict: Summary with 'output_path', 'chunksize', 'rows_written' and 'fill_values'
+    """
+    data_file = resolve_data_file(file_path)
+    if chunksize is None:
+        chunksize = estimate_chunksize(data_file, memory_budget_mb, typed, analyses)
+    if verbose:
+        print(f'Streaming {data_file} in chunks of {chunksize:,} rows')
+
+    # Pass 1: fill statistics
+    fill_values = compute_fill_statistics(iter_flight_chunks(data_file, chunksize, typed=typed, analyses=analyses))
+    if verbose:
+        print("Fill values:")
+        for col, value in fill_values.items():
+            print(f"  {col}: {value:.4f}")
+
+    # Pass 2: impute and write chunk by chunk
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    to_parquet = output_path.suffix == '.parquet'
+    writer, schema = None, None
+    rows_written = 0
+
+    try:
+        for chunk in iter_flight_chunks(data_file, chunksize, typed=typed, analyses=analyses):
+            filled = fill_missing_values(chunk, fill_values)
+            if to_parquet:
+                import pyarrow as pa
+
+                filled = _plain_columns(filled)
+                if writer is None:
+                    writer, schema = _parquet_writer(output_path, filled)
+                writer.write_table(pa.Table.from_pandas(filled, schema=schema, preserve_index=False))
+            else:
+                filled.to_csv(output_path, mode='w' if rows_written == 0 else 'a',
+                              header=rows_written == 0, index=False)
+            rows_written += len(filled)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if verbose:
+        print(f'Wrote {rows_written:,} rows to {output_path}')
+
+    return {
+        'output_path': str(output_path),
+        'chunksize': chunksize,
+        'rows_written': rows_written,
+        'fill_values': fill_values
+    }
+
+# Main execution (only runs when script is executed directly)
+if __name__ == "__main__":
+    summary = stream_preprocess_flight_data('data/flight_data_2024.csv', 'data/flight_data_processed.parquet')
+    print("\nStreaming preprocessing completed successfully!")
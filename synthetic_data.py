@@ -0,0 +1,378 @@
+# Vectorized synthetic flight data with the schema of flight_data_2024.csv
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_cache import parquet_available
+from data_preprocess import FLIGHT_DTYPES
+
+# Column order of the source file: FLIGHT_DTYPES with fl_date after day_of_week
+FLIGHT_COLUMNS = list(FLIGHT_DTYPES)
+FLIGHT_COLUMNS.insert(FLIGHT_COLUMNS.index('day_of_week') + 1, 'fl_date')
+
+# code: (city, state, latitude, longitude, relative departures)
+AIRPORTS = {
+    'ATL': ('Atlanta, GA', 'Georgia', 33.64, -84.43, 1.00),
+    'DFW': ('Dallas/Fort Worth, TX', 'Texas', 32.90, -97.04, 0.93),
+    'DEN': ('Denver, CO', 'Colorado', 39.86, -104.67, 0.90),
+    'ORD': ('Chicago, IL', 'Illinois', 41.98, -87.90, 0.86),
+    'CLT': ('Charlotte, NC', 'North Carolina', 35.21, -80.94, 0.66),
+    'LAX': ('Los Angeles, CA', 'California', 33.94, -118.41, 0.62),
+    'LAS': ('Las Vegas, NV', 'Nevada', 36.08, -115.15, 0.51),
+    'PHX': ('Phoenix, AZ', 'Arizona', 33.43, -112.01, 0.47),
+    'MCO': ('Orlando, FL', 'Florida', 28.43, -81.31, 0.47),
+    'SEA': ('Seattle, WA', 'Washington', 47.45, -122.31, 0.46),
+    'IAH': ('Houston, TX', 'Texas', 29.98, -95.34, 0.45),
+    'SFO': ('San Francisco, CA', 'California', 37.62, -122.38, 0.40),
+    'EWR': ('Newark, NJ', 'New Jersey', 40.69, -74.17, 0.40),
+    'BOS': ('Boston, MA', 'Massachusetts', 42.36, -71.01, 0.38),
+    'LGA': ('New York, NY', 'New York', 40.78, -73.87, 0.38),
+    'JFK': ('New York, NY', 'New York', 40.64, -73.78, 0.37),
+    'MSP': ('Minneapolis, MN', 'Minnesota', 44.88, -93.22, 0.37),
+    'DTW': ('Detroit, MI', 'Michigan', 42.21, -83.35, 0.36),
+    'MIA': ('Miami, FL', 'Florida', 25.79, -80.29, 0.34),
+    'SLC': ('Salt Lake City, UT', 'Utah', 40.79, -111.98, 0.33),
+    'PHL': ('Philadelphia, PA', 'Pennsylvania', 39.87, -75.24, 0.30),
+    'DCA': ('Washington, DC', 'Virginia', 38.85, -77.04, 0.29),
+    'BWI': ('Baltimore, MD', 'Maryland', 39.18, -76.67, 0.27),
+    'BNA': ('Nashville, TN', 'Tennessee', 36.12, -86.68, 0.25),
+    'SAN': ('San Diego, CA', 'California', 32.73, -117.19, 0.24),
+    'FLL': ('Fort Lauderdale, FL', 'Florida', 26.07, -80.15, 0.24),
+    'TPA': ('Tampa, FL', 'Florida', 27.98, -82.53, 0.23),
+    'AUS': ('Austin, TX', 'Texas', 30.19, -97.67, 0.22),
+    'MDW': ('Chicago, IL', 'Illinois', 41.79, -87.75, 0.19),
+    'HNL': ('Honolulu, HI', 'Hawaii', 21.32, -157.92, 0.15),
+    'PDX': ('Portland, OR', 'Oregon', 45.59, -122.60, 0.14),
+    'RDU': ('Raleigh/Durham, NC', 'North Carolina', 35.88, -78.79, 0.13),
+    'STL': ('St. Louis, MO', 'Missouri', 38.75, -90.37, 0.12),
+    'SMF': ('Sacramento, CA', 'California', 38.70, -121.59, 0.10),
+    'MCI': ('Kansas City, MO', 'Missouri', 39.30, -94.71, 0.10),
+    'SJC': ('San Jose, CA', 'California', 37.36, -121.93, 0.08),
+    'SAT': ('San Antonio, TX', 'Texas', 29.53, -98.47, 0.08),
+    'IND': ('Indianapolis, IN', 'Indiana', 39.72, -86.29, 0.07),
+    'CLE': ('Cleveland, OH', 'Ohio', 41.41, -81.85, 0.06),
+    'ANC': ('Anchorage, AK', 'Alaska', 61.17, -149.99, 0.04),
+}
+
+# carrier: relative share of flights
+CARRIERS = {
+    'WN': 0.18, 'DL': 0.15, 'AA': 0.15, 'UA': 0.12, 'OO': 0.11, 'YX': 0.05, 'B6': 0.04, 'MQ': 0.04,
+    'AS': 0.04, '9E': 0.03, 'NK': 0.03, 'OH': 0.03, 'F9': 0.02, 'G4': 0.01,
+}
+
+# Flight volume factors by weekday (Mon..Sun) and month (Jan..Dec)
+WEEKDAY_VOLUME = np.array([1.02, 0.95, 0.97, 1.04, 1.05, 0.85, 0.98])
+MONTH_VOLUME = np.array([0.90, 0.88, 1.00, 1.00, 1.03, 1.08, 1.10, 1.07, 0.95, 1.00, 0.96, 0.98])
+
+# Base cancellation rate and its monthly (winter storms, summer thunderstorms) factors
+CANCEL_RATE = 0.013
+MONTH_CANCEL = np.array([1.8, 1.3, 1.0, 0.8, 1.0, 1.3, 1.6, 1.1, 0.6, 0.5, 0.5, 1.0])
+
+# Share of flights diverted, and of operational values missing at random
+DIVERTED_RATE = 0.0025
+MISSING_RATE = 0.001
+
+# Columns blanked for cancelled flights, and additionally for diverted ones
+DEPARTURE_COLUMNS = ['dep_time', 'dep_delay', 'taxi_out', 'wheels_off']
+ARRIVAL_COLUMNS = ['wheels_on', 'taxi_in', 'arr_time', 'arr_delay', 'actual_elapsed_time', 'air_time']
+
+# Delay causes (reported only for arrivals 15+ minutes late) and their typical weight
+CAUSE_COLUMNS = ['carrier_delay', 'weather_delay', 'nas_delay', 'security_delay', 'late_aircraft_delay']
+
+def _to_hhmm(minutes, midnight=2400):
+    # Minutes since midnight (any range) to the hhmm clock values of the source data
+    hours, mins = np.divmod(np.mod(minutes, 1440).astype(np.int32), 60)
+    hhmm = hours * 100 + mins
+    return np.where(hhmm == 0, midnight, hhmm)
+
+def _categorical(index, values):
+    # Categorical of values[index] for a per-airport attribute that may repeat (cities, states)
+    categories, codes = np.unique(values, return_inverse=True)
+    return pd.Categorical.from_codes(codes[index], categories=categories)
+
+def _great_circle_miles(codes):
+    lat = np.radians([AIRPORTS[code][2] for code in codes])
+    lon = np.radians([AIRPORTS[code][3] for code in codes])
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:, None]) * np.cos(lat[None, :]) * np.sin(dlon / 2) ** 2
+    return np.round(2 * 3958.8 * np.arcsin(np.sqrt(a)))
+
+def daily_volume_weights(year=2024):
+    """
+    Share of the year's flights operated on each day.
+
+    Combines the weekday and month factors with dips on New Year's Day,
+    Thanksgiving and Christmas.
+
+    Args:
+        year (int): Calendar year
+
+    Returns:
+        pd.Series: Weights summing to 1, indexed by date
+    """
+    dates = pd.date_range(f'{year}-01-01', f'{year}-12-31', freq='D')
+    weights = WEEKDAY_VOLUME[dates.dayofweek] * MONTH_VOLUME[dates.month - 1]
+    thanksgiving = pd.Timestamp(f'{year}-11-01') + pd.offsets.WeekOfMonth(week=3, weekday=3)
+    holidays = pd.DatetimeIndex([f'{year}-01-01', thanksgiving, f'{year}-12-25'])
+    weights = np.where(dates.isin(holidays), weights * 0.75, weights)
+    return pd.Series(weights / weights.sum(), index=dates)
+
+def _chunk_days(counts, chunk_rows):
+    # Split the days into consecutive runs of about chunk_rows flights
+    bounds = np.searchsorted(np.cumsum(counts), np.arange(chunk_rows, counts.sum(), chunk_rows), side='left') + 1
+    edges = np.unique(np.concatenate([[0], bounds, [len(counts)]]))
+    return list(zip(edges[:-1], edges[1:]))
+
+def _generate_rows(rng, day, dates, weather, missing_rate):
+    """Generate the flights of one chunk given each row's day of the year."""
+    n = len(day)
+    codes = list(AIRPORTS)
+    n_airports = len(codes)
+    airport_weight = np.array([AIRPORTS[code][4] for code in codes])
+    month = dates.month.to_numpy()[day]
+    severity = weather[day]
+
+    # Airports: skewed origins, destinations drawn the same way but never equal
+    origin = rng.choice(n_airports, n, p=airport_weight / airport_weight.sum())
+    dest = rng.choice(n_airports, n, p=airport_weight / airport_weight.sum())
+    same = dest == origin
+    dest[same] = (dest[same] + rng.integers(1, n_airports, same.sum())) % n_airports
+    distance = _great_circle_miles(codes)[origin, dest]
+    congestion = airport_weight[origin]
+
+    carrier_codes = list(CARRIERS)
+    carrier_share = np.array(list(CARRIERS.values()))
+    carrier = rng.choice(len(carrier_codes), n, p=carrier_share / carrier_share.sum())
+
+    # Schedule: morning and evening departure banks
+    morning = rng.random(n) < 0.55
+    crs_dep_minutes = np.clip(np.where(morning, rng.normal(8.5 * 60, 110, n), rng.normal(17 * 60, 150, n)),
+                              5 * 60, 23 * 60 + 59).round().astype(np.int64)
+    hour_factor = (crs_dep_minutes - 5 * 60) / (18 * 60)
+    sched_air = np.round(distance / 7.8 + 12)
+    crs_elapsed = sched_air + np.round(16 + 10 * congestion) + 8 + 10
+
+    # Departure delays: mostly early/on time, an exponential tail that grows
+    # with bad weather, summer and December traffic and the time of day
+    late_probability = np.clip(0.16 * (1 + 0.6 * severity) * np.where(np.isin(month, [6, 7, 8, 12]), 1.25, 1.0)
+                               + 0.12 * hour_factor, 0, 0.9)
+    late = rng.random(n) < late_probability
+    dep_delay = np.where(late, rng.exponential(30 * (1 + 0.5 * severity), n), rng.normal(-4, 4, n)).round()
+
+    taxi_out = np.round(9 + rng.gamma(2.0, 3.0 + 6.0 * congestion, n) + 3 * severity)
+    air_time = np.maximum(np.round(sched_air * rng.normal(1.0, 0.06, n) - 4), 15)
+    taxi_in = np.round(3 + rng.gamma(2.0, 2.5 + 3.0 * airport_weight[dest], n))
+    actual_elapsed = taxi_out + air_time + taxi_in
+    arr_delay = dep_delay + actual_elapsed - crs_elapsed
+
+    dep_minutes = crs_dep_minutes + dep_delay
+    df = pd.DataFrame({
+        'year': dates.year[0],
+        'month': month,
+        'day_of_month': dates.day.to_numpy()[day],
+        'day_of_week': dates.dayofweek.to_numpy()[day] + 1,
+        'fl_date': pd.Categorical.from_codes(day, categories=dates.strftime('%Y-%m-%d')),
+        'op_unique_carrier': pd.Categorical.from_codes(carrier, categories=carrier_codes),
+        'op_carrier_fl_num': (carrier * 500 + rng.integers(1, 7000, n)).astype('float64'),
+        'origin': pd.Categorical.from_codes(origin, categories=codes),
+        'origin_city_name': _categorical(origin, [AIRPORTS[c][0] for c in codes]),
+        'origin_state_nm': _categorical(origin, [AIRPORTS[c][1] for c in codes]),
+        'dest': pd.Categorical.from_codes(dest, categories=codes),
+        'dest_city_name': _categorical(dest, [AIRPORTS[c][0] for c in codes]),
+        'dest_state_nm': _categorical(dest, [AIRPORTS[c][1] for c in codes]),
+        'crs_dep_time': _to_hhmm(crs_dep_minutes, midnight=0).astype('float64'),
+        'dep_time': _to_hhmm(dep_minutes).astype('float64'),
+        'dep_delay': dep_delay,
+        'taxi_out': taxi_out,
+        'wheels_off': _to_hhmm(dep_minutes + taxi_out).astype('float64'),
+        'wheels_on': _to_hhmm(dep_minutes + taxi_out + air_time).astype('float64'),
+        'taxi_in': taxi_in,
+        'crs_arr_time': _to_hhmm(crs_dep_minutes + crs_elapsed, midnight=0).astype('float64'),
+        'arr_time': _to_hhmm(dep_minutes + actual_elapsed).astype('float64'),
+        'arr_delay': arr_delay,
+        'cancelled': 0,
+        'cancellation_code': pd.Categorical.from_codes(np.full(n, -1), categories=['A', 'B', 'C', 'D']),
+        'diverted': 0,
+        'crs_elapsed_time': crs_elapsed,
+        'actual_elapsed_time': actual_elapsed,
+        'air_time': air_time,
+        'distance': distance
+    })
+
+    # Delay causes: split arrival delays of 15+ minutes across the causes
+    delayed = arr_delay >= 15
+    shapes = np.column_stack([
+        np.full(n, 1.0), 0.1 + 0.4 * severity, np.full(n, 0.6), np.full(n, 0.02), 0.3 + 1.2 * hour_factor
+    ])
+    shares = rng.gamma(shapes)
+    shares /= shares.sum(axis=1, keepdims=True)
+    causes = np.floor(shares * np.maximum(arr_delay, 0)[:, None])
+    causes[:, 0] += np.maximum(arr_delay, 0) - causes.sum(axis=1)
+    causes[~delayed] = np.nan
+    for i, col in enumerate(CAUSE_COLUMNS):
+        df[col] = causes[:, i]
+
+    # Cancellations (mostly weather on stormy days) and diversions blank the operational values
+    cancel_probability = np.clip(CANCEL_RATE * MONTH_CANCEL[month - 1] * (0.4 + 1.2 * severity), 0, 0.5)
+    cancelled = rng.random(n) < cancel_probability
+    diverted = ~cancelled & (rng.random(n) < DIVERTED_RATE)
+    df['cancelled'] = cancelled.astype('int8')
+    df['diverted'] = diverted.astype('int8')
+    reason = np.where(rng.random(n) < 0.3 + 0.5 * np.minimum(severity, 1), 1, rng.choice([0, 2, 3], n,
+                                                                                        p=[0.6, 0.35, 0.05]))
+    df['cancellation_code'] = pd.Categorical.from_codes(np.where(cancelled, reason, -1),
+                                                        categories=['A', 'B', 'C', 'D'])
+    for col in DEPARTURE_COLUMNS + ARRIVAL_COLUMNS:
+        blank = cancelled | (diverted & np.isin(col, ARRIVAL_COLUMNS)) | (rng.random(n) < missing_rate)
+        df[col] = df[col].mask(blank)
+    df.loc[cancelled | diverted, CAUSE_COLUMNS] = np.nan
+
+    return df[FLIGHT_COLUMNS]
+
+def iter_synthetic_flights(rows, seed=0, year=2024, chunk_rows=1_000_000, missing_rate=MISSING_RATE):
+    """
+    Generate synthetic flights in date order, one chunk of days at a time.
+
+    Daily volumes follow daily_volume_weights; each day also gets a random
+    weather severity that drives its cancellations, weather delays and taxi
+    times, so the daily series show weekly and monthly seasonality plus
+    storm spikes. Origins and destinations are skewed towards hub airports
+    and distances are great-circle miles between them. Cancelled flights
+    have no departure/arrival values, diverted flights no arrival values,
+    and cause delays are only filled for arrivals 15+ minutes late, as in
+    the source data.
+
+    The output is fully determined by ``rows``, ``seed``, ``year`` and
+    ``chunk_rows``.
+
+    Args:
+        rows (int): Total number of flights
+        seed (int): Random seed
+        year (int): Calendar year of the flights
+        chunk_rows (int): Approximate rows per yielded chunk
+        missing_rate (float): Share of operational values blanked at random
+            on top of cancellations and diversions
+
+    Yields:
+        pd.DataFrame: Flights with the FLIGHT_COLUMNS schema
+    """
+    seeds = np.random.SeedSequence(seed)
+    rng = np.random.default_rng(seeds.spawn(1)[0])
+    weights = daily_volume_weights(year)
+    dates = weights.index
+    counts = rng.multinomial(rows, weights.to_numpy())
+    weather = rng.gamma(0.6, 0.8, len(dates))
+
+    for (first, last), chunk_seed in zip(_chunk_days(counts, chunk_rows), seeds.spawn(len(dates))):
+        day = np.repeat(np.arange(first, last), counts[first:last])
+        if len(day):
+            yield _generate_rows(np.random.default_rng(chunk_seed), day, dates, weather, missing_rate)
+
+def generate_flight_data(rows, seed=0, year=2024, missing_rate=MISSING_RATE):
+    """
+    Generate a synthetic flight dataset in memory.
+
+    Args:
+        rows (int): Number of flights
+        seed (int): Random seed
+        year (int): Calendar year of the flights
+        missing_rate (float): Share of operational values blanked at random
+
+    Returns:
+        pd.DataFrame: Flights with the FLIGHT_COLUMNS schema, see
+            iter_synthetic_flights
+    """
+    chunks = list(iter_synthetic_flights(rows, seed, year, chunk_rows=max(rows, 1), missing_rate=missing_rate))
+    if not chunks:
+        return pd.DataFrame(columns=FLIGHT_COLUMNS)
+    return chunks[0]
+
+def write_synthetic_flight_data(output_path, rows, seed=0, year=2024, chunk_rows=1_000_000,
+                                missing_rate=MISSING_RATE, verbose=True):
+    """
+    Stream a synthetic flight dataset to CSV or Parquet (by suffix).
+
+    Chunks are written as they are generated, so memory stays bounded by
+    ``chunk_rows``. With pyarrow installed both formats go through Arrow's
+    multithreaded writers; otherwise CSV falls back to pandas.
+
+    Args:
+        output_path (str): Destination ``.csv`` or ``.parquet`` file
+        rows (int): Number of flights
+        seed (int): Random seed
+        year (int): Calendar year of the flights
+        chunk_rows (int): Approximate rows generated and written at a time
+        missing_rate (float): Share of operational values blanked at random
+        verbose (bool): Print progress
+
+    Returns:
+        dict: 'output_path', 'rows', 'chunks' and 'seconds'
+    """
+    output_path = Path(output_path)
+    parquet = output_path.suffix == '.parquet'
+    use_arrow = parquet_available()
+    if parquet and not use_arrow:
+        raise ImportError("Writing Parquet requires pyarrow")
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_name(output_path.name + '.tmp')
+    started = time.perf_counter()
+    written, chunks, writer = 0, 0, None
+    try:
+        for chunk in iter_synthetic_flights(rows, seed, year, chunk_rows, missing_rate):
+            if use_arrow:
+                import pyarrow as pa
+                import pyarrow.csv as pa_csv
+                import pyarrow.parquet as pq
+
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if not parquet:
+                    # The CSV writer needs plain strings, not dictionaries
+                    table = table.cast(pa.schema([
+                        pa.field(f.name, pa.string()) if pa.types.is_dictionary(f.type) else f
+                        for f in table.schema
+                    ]))
+                if writer is None:
+                    writer = (pq.ParquetWriter(tmp_path, table.schema) if parquet
+                              else pa_csv.CSVWriter(tmp_path, table.schema))
+                writer.write_table(table)
+            else:
+                chunk.to_csv(tmp_path, mode='w' if chunks == 0 else 'a', header=chunks == 0, index=False)
+            written += len(chunk)
+            chunks += 1
+            if verbose:
+                print(f"  {written:,}/{rows:,} rows", end='\r', flush=True)
+    finally:
+        if writer is not None:
+            writer.close()
+    if chunks == 0:
+        # A one-row sample gives the empty file the same column types as a generated one
+        empty = generate_flight_data(1, seed, year, missing_rate).iloc[:0]
+        if parquet:
+            empty.to_parquet(tmp_path, index=False)
+        else:
+            empty.to_csv(tmp_path, index=False)
+    tmp_path.replace(output_path)
+
+    seconds = time.perf_counter() - started
+    if verbose:
+        print(f"\nWrote {written:,} synthetic flights to {output_path} in {seconds:.1f}s "
+              f"({written / max(seconds, 1e-9) * 60 / 1e6:.1f}M rows/min)")
+
+    return {'output_path': str(output_path), 'rows': written, 'chunks': chunks, 'seconds': seconds}
+
+# Main execution (only runs when script is executed directly)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate synthetic flight data')
+    parser.add_argument('rows', type=int, help='number of flights')
+    parser.add_argument('output', help='destination .csv or .parquet file')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--year', type=int, default=2024)
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+    write_synthetic_flight_data(args.output, args.rows, args.seed, args.year, args.chunk_rows)
@@ -0,0 +1,30 @@
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+# visualize_flights_by_time contains a generator expression, whose code
+# object repr carries a memory address that differs between processes
+KEY_SCRIPT = '''
+import pandas as pd
+from chart_cache import chart_key
+from descriptive_visualization import visualize_flights_by_time
+
+time_analysis = {
+    'flights_per_dow': pd.Series([5, 3, 4], index=['Mon', 'Tue', 'Wed']),
+    'flights_per_month': pd.Series([10, 12], index=[1, 2]),
+}
+print(chart_key(visualize_flights_by_time, time_analysis))
+'''
+
+def _key_in_subprocess():
+    result = subprocess.run([sys.executable, '-c', KEY_SCRIPT], cwd=REPO_ROOT,
+                            capture_output=True, text=True, check=True)
+    return result.stdout.strip().splitlines()[-1]
+
+def test_chart_key_is_stable_across_processes():
+    first = _key_in_subprocess()
+    second = _key_in_subprocess()
+    assert len(first) == 64
+    assert first == second
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+from daily_rollup import DailyRollupStore
+from data_preprocess import FLIGHT_DTYPES
+
+def _typed_batch(cancelled, days=('2024-03-01', '2024-03-02'), rows_per_day=200):
+    # More cancellations per day than int8 can hold once two batches overlap
+    rows = len(days) * rows_per_day
+    df = pd.DataFrame({
+        'fl_date': pd.to_datetime(np.repeat(days, rows_per_day)),
+        'origin': 'ATL',
+        'dep_time': 900.0,
+        'cancelled': np.full(rows, cancelled),
+        'air_time': 120.0,
+        'distance': 800.0,
+        'weather_delay': 0.0,
+        'late_aircraft_delay': 0.0,
+        'taxi_out': 15.0,
+        'taxi_in': 8.0,
+    })
+    return df.astype({col: FLIGHT_DTYPES[col] for col in df.columns if col in FLIGHT_DTYPES})
+
+def test_overlapping_typed_batches_do_not_overflow(tmp_path):
+    store = DailyRollupStore(tmp_path / 'rollup')
+    store.append(_typed_batch(1), batch_id='first')
+    store.append(_typed_batch(1, days=('2024-03-02', '2024-03-03')), batch_id='second')
+
+    ts_data = DailyRollupStore(tmp_path / 'rollup').time_series()
+    assert ts_data.loc['2024-03-02', 'cancellations_total'] == 400
+    assert ts_data.loc['2024-03-02', 'flight_count'] == 400
+    assert ts_data.loc['2024-03-02', 'cancellation_rate'] == 1.0
+    assert ts_data.loc['2024-03-01', 'cancellations_total'] == 200
@@ -0,0 +1,18 @@
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+def test_cache_probe_does_not_import_pandas(tmp_path):
+    data_file = tmp_path / 'flights.csv'
+    data_file.write_text('fl_date,origin\n2024-01-01,ATL\n')
+    script = (
+        'import sys\n'
+        'from data_cache import cache_entry_path\n'
+        f'cache_entry_path({str(data_file)!r}, typed=True)\n'
+        "print('pandas' in sys.modules)\n"
+    )
+    result = subprocess.run([sys.executable, '-c', script], cwd=REPO_ROOT,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == 'False'
@@ -0,0 +1,30 @@
+import pandas as pd
+import pytest
+
+from flight_index import FlightIndex
+
+def _flights():
+    return pd.DataFrame({
+        'origin': ['ATL', 'ATL', 'ATL', 'DEN', 'DEN'],
+        'fl_date': pd.to_datetime(['2024-01-01', None, '2024-01-03', '2024-01-02', None]),
+        'month': [1, 1, 1, 1, 1],
+        'distance': [100.0, 200.0, 300.0, 400.0, 500.0],
+    })
+
+@pytest.mark.parametrize('origins', [None, ['ATL'], ['ATL', 'DEN']])
+def test_open_start_date_query_excludes_missing_dates(origins):
+    df = _flights()
+    index = FlightIndex(df)
+    result = index.query(origins=origins, end='2024-01-02')
+
+    expected = df[df['fl_date'] <= '2024-01-02']
+    if origins is not None:
+        expected = expected[expected['origin'].isin(origins)]
+    assert sorted(result['distance']) == sorted(expected['distance'])
+
+def test_unfiltered_query_keeps_missing_dates():
+    assert len(FlightIndex(_flights()).query()) == 5
+
+def test_unknown_column_raises():
+    with pytest.raises(KeyError, match='nope'):
+        FlightIndex(_flights()).query(columns=['distance', 'nope'])
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_preprocess import FLIGHT_DTYPES
+from descriptive_analysis import perform_complete_analysis
+from fused_analysis import perform_fused_analysis
+from memoize import set_memoization
+
+@pytest.fixture(autouse=True)
+def no_memoization():
+    # The groupby path memoizes its helpers; compute them fresh every time
+    previous = set_memoization(False)
+    yield
+    set_memoization(previous)
+
+def _flights(typed):
+    rng = np.random.default_rng(0)
+    rows = 300
+    df = pd.DataFrame({
+        'month': rng.integers(1, 4, rows),
+        'day_of_week': rng.integers(1, 8, rows),
+        'origin': rng.choice(['ATL', 'DEN', 'ORD'], rows),
+        'cancelled': (rng.random(rows) < 0.1).astype('int64'),
+        'air_time': rng.normal(120, 30, rows).round(),
+        'taxi_out': rng.normal(15, 4, rows).round(),
+        'taxi_in': rng.normal(8, 2, rows).round(),
+        'distance': rng.normal(800, 200, rows).round(),
+        'weather_delay': rng.exponential(5, rows).round(),
+        'late_aircraft_delay': rng.exponential(10, rows).round(),
+    })
+    # A group whose delay values are all missing, and scattered gaps elsewhere
+    df.loc[df['origin'] == 'ORD', 'weather_delay'] = np.nan
+    df.loc[df.index % 17 == 0, 'taxi_out'] = np.nan
+    if typed:
+        df = df.astype({col: FLIGHT_DTYPES[col] for col in df.columns})
+    return df
+
+def _assert_same(fused, expected, path='results'):
+    if isinstance(expected, dict):
+        assert fused.keys() == expected.keys(), path
+        for key in expected:
+            _assert_same(fused[key], expected[key], f'{path}[{key!r}]')
+    elif isinstance(expected, pd.DataFrame):
+        pd.testing.assert_frame_equal(fused, expected, obj=path)
+    elif isinstance(expected, pd.Series):
+        pd.testing.assert_series_equal(fused, expected, obj=path)
+    else:
+        assert fused == pytest.approx(expected), path
+
+@pytest.mark.parametrize('typed', [False, True])
+def test_fused_analysis_matches_complete_analysis(typed):
+    df = _flights(typed)
+    expected = perform_complete_analysis(df, fused=False, verbose=False)
+    fused = perform_fused_analysis(df, verbose=False)
+    _assert_same(fused, expected)
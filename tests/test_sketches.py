@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+from chunked_analysis import DescriptiveState
+from sketches import HyperLogLog, KLLSketch, approximate_describe
+
+# Documented bounds: KLL rank error for k=200 at 99% confidence, and
+# HyperLogLog's ~3 standard errors at the default precision
+KLL_RANK_ERROR = 0.0165
+HLL_RELATIVE_ERROR = 0.024
+
+QUANTILES = (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+
+def _rank_error(sorted_values, estimate, q):
+    # Distance from q to the range of ranks the estimate occupies
+    low = np.searchsorted(sorted_values, estimate, 'left') / len(sorted_values)
+    high = np.searchsorted(sorted_values, estimate, 'right') / len(sorted_values)
+    return max(low - q, q - high, 0.0)
+
+def _values(n=200_000, seed=7):
+    rng = np.random.default_rng(seed)
+    return rng.lognormal(4, 1, n)
+
+def _duration_frame(values):
+    return pd.DataFrame({'origin': 'ATL', 'month': 1, 'day_of_week': 1, 'air_time': values,
+                         'taxi_out': values, 'taxi_in': values, 'distance': values})
+
+def test_kll_quantiles_within_documented_rank_error():
+    values = _values()
+    sketch = KLLSketch(seed=0).update(values)
+    expected = np.sort(values)
+    for q in QUANTILES:
+        assert _rank_error(expected, sketch.quantile(q), q) <= KLL_RANK_ERROR
+    assert sketch.quantile(0) == expected[0]
+    assert sketch.quantile(1) == expected[-1]
+    assert sketch.count == len(values)
+
+def test_merged_kll_sketches_within_documented_rank_error():
+    values = _values()
+    chunks = np.array_split(values, 50)
+    merged = KLLSketch(seed=0)
+    for i, chunk in enumerate(chunks):
+        merged.merge(KLLSketch(seed=i + 1).update(chunk))
+    expected = np.sort(values)
+    for q in QUANTILES:
+        assert _rank_error(expected, merged.quantile(q), q) <= KLL_RANK_ERROR
+
+def test_chunked_approximate_describe_within_documented_rank_error():
+    values = _values()
+    frame = _duration_frame(values)
+    state = DescriptiveState(['duration_analysis'], approximate=True)
+    for start in range(0, len(frame), len(frame) // 50):
+        state.update(frame.iloc[start:start + len(frame) // 50])
+    described = state.describe()['air_time']
+    expected = np.sort(values)
+    for label, q in (('25%', 0.25), ('50%', 0.5), ('75%', 0.75)):
+        assert _rank_error(expected, described[label], q) <= KLL_RANK_ERROR
+
+def test_approximate_describe_keeps_exact_moments():
+    frame = pd.DataFrame({'air_time': _values(50_000)})
+    frame.loc[::10, 'air_time'] = np.nan
+    approximate = approximate_describe(frame, ['air_time'])['air_time']
+    exact = frame['air_time'].describe()
+    for label in ('count', 'mean', 'std', 'min', 'max'):
+        assert np.isclose(approximate[label], exact[label])
+    expected = np.sort(frame['air_time'].dropna().to_numpy())
+    for label, q in (('25%', 0.25), ('50%', 0.5), ('75%', 0.75)):
+        assert _rank_error(expected, approximate[label], q) <= KLL_RANK_ERROR
+
+def test_hyperloglog_within_documented_error():
+    rng = np.random.default_rng(3)
+    values = rng.integers(0, 10 ** 12, 300_000)
+    distinct = len(np.unique(values))
+    estimate = HyperLogLog().update(values).estimate()
+    assert abs(estimate - distinct) / distinct <= HLL_RELATIVE_ERROR
+
+def test_merged_hyperloglog_does_not_double_count_shared_values():
+    rng = np.random.default_rng(4)
+    values = rng.integers(0, 10 ** 12, 300_000)
+    distinct = len(np.unique(values))
+    # Overlapping shards: every value appears in two of them
+    shards = [np.concatenate(pair) for pair in zip(np.array_split(values, 6), np.roll(np.array_split(values, 6), 1))]
+    merged = HyperLogLog()
+    for shard in shards:
+        merged.merge(HyperLogLog().update(shard))
+    assert abs(merged.estimate() - distinct) / distinct <= HLL_RELATIVE_ERROR
+
+def test_chunk_sketches_are_seeded_independently(monkeypatch):
+    # Sketches sharing a seed make the same compaction choices, so their
+    # errors add up instead of cancelling when merged
+    import chunked_analysis
+
+    seeds = []
+
+    class RecordingSketch(KLLSketch):
+        def __init__(self, *args, seed=None, **kwargs):
+            seeds.append(tuple(np.atleast_1d(seed)))
+            super().__init__(*args, seed=seed, **kwargs)
+
+    monkeypatch.setattr(chunked_analysis, 'KLLSketch', RecordingSketch)
+    frame = _duration_frame(_values(1_000))
+    for shard in range(2):
+        state = DescriptiveState(['duration_analysis'], approximate=True, seed=shard)
+        for start in range(0, len(frame), 250):
+            state.update(frame.iloc[start:start + 250])
+    # One seed per chunk and shard, shared by that chunk's described columns
+    assert len(set(seeds)) == 8
@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+from data_preprocess import preprocess_flight_data
+from streaming_preprocess import stream_preprocess_flight_data
+from synthetic_data import write_synthetic_flight_data
+
+pytest.importorskip('pyarrow')
+
+def test_parquet_schema_survives_nulls_appearing_in_later_chunks(tmp_path):
+    rows = 40
+    df = pd.DataFrame({
+        'fl_date': ['2024-01-01'] * rows,
+        'month': 1,
+        'day_of_week': 1,
+        'origin': 'ATL',
+        'dep_time': 900.0,
+        'air_time': 120.0,
+        'distance': 800.0,
+        # Whole numbers in the first chunk, then missing values imputed with a fractional mean
+        'taxi_out': pd.array([15, 16] * 10 + [None] * 20, dtype='Int64'),
+        # All null in the first chunk
+        'carrier_delay': [None] * 20 + [3.5] * 20,
+    })
+    source = tmp_path / 'flights.csv'
+    df.to_csv(source, index=False)
+
+    output = tmp_path / 'flights.parquet'
+    summary = stream_preprocess_flight_data(source, output, chunksize=20, verbose=False)
+
+    result = pd.read_parquet(output)
+    assert summary['rows_written'] == rows
+    assert result['taxi_out'].iloc[-1] == 15.5
+    assert result['carrier_delay'].iloc[-1] == 3.5
+
+def test_typed_streamed_dtypes_match_the_in_memory_frame(tmp_path):
+    source = tmp_path / 'flights.csv'
+    write_synthetic_flight_data(source, 3_000, seed=1, verbose=False)
+
+    output = tmp_path / 'flights.parquet'
+    stream_preprocess_flight_data(source, output, chunksize=500, typed=True, verbose=False)
+
+    streamed = pd.read_parquet(output).dtypes
+    in_memory = preprocess_flight_data(source, verbose=False, typed=True).dtypes
+    # Category sets differ between chunks, so the stream writes them as plain values
+    compared = in_memory[in_memory != 'category']
+    assert list(streamed.index) == list(in_memory.index)
+    assert streamed[compared.index].to_dict() == compared.to_dict()
@@ -1,27 +1,47 @@
 # Time Series Analysis - Seasonal Decomposition
 
-import matplotlib.pyplot as plt
-from statsmodels.tsa.seasonal import seasonal_decompose
+# matplotlib and statsmodels are imported inside the functions that use
+# them, so the daily aggregation helpers load without them
+import numpy as np
+import pandas as pd
 import warnings
-from data_preprocess import load_flight_data
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from chart_cache import ChartCache, chart_key
+from data_cache import load_cached_flight_data
+from memoize import memoized
+from profiling import profile_stage, profiled
 
 warnings.filterwarnings("ignore")
 
-def prepare_time_series_data(df):
+# Full day names indexed by dayofweek (0=Monday), without a per-date strftime
+WEEKDAY_NAMES = np.array(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'], dtype=object)
+
+# Columns averaged per day; their sums and counts make up the daily partials
+DAILY_MEAN_COLUMNS = ['cancelled', 'air_time', 'distance', 'weather_delay',
+                      'late_aircraft_delay', 'taxi_out', 'taxi_in']
+
+@profiled()
+@memoized(ignore=('workers', 'shard_by'))
+def prepare_time_series_data(df, workers=None, shard_by='month'):
     """
     Prepare time series data by aggregating flight metrics by date.
     
     Args:
         df (pd.DataFrame): Raw flight data
+        workers (int): Aggregate shards in this many processes (see
+            parallel_pipeline); None aggregates in this process
+        shard_by (str): 'month', 'rows' or 'origin' when workers is set
         
     Returns:
         pd.DataFrame: Daily aggregated time series data
     """
-    # Create a copy and ensure fl_date is properly formatted
-    ts_df = df.copy()
+    if workers is not None:
+        from parallel_pipeline import parallel_time_series_data
+        return parallel_time_series_data(df, workers, shard_by)
     
-    # Aggregate data by date
-    daily_flights = ts_df.groupby('fl_date').agg({
+    # Aggregate data by date (groupby never mutates df, so no copy is needed)
+    daily_flights = df.groupby('fl_date').agg({
         'origin': 'count',  # Count of flights
         'cancelled': ['sum', 'mean'],  # Total and rate of cancellations
         'dep_time': 'count',  # Alternative flight count (non-null departures)
@@ -42,6 +62,18 @@ def prepare_time_series_data(df):
         'avg_taxi_out', 'avg_taxi_in'
     ]
     
+    return add_daily_features(daily_flights)
+
+def add_daily_features(daily_flights):
+    """
+    Add derived metrics and temporal features to the daily aggregates.
+    
+    Args:
+        daily_flights (pd.DataFrame): Rounded daily aggregates indexed by fl_date
+        
+    Returns:
+        pd.DataFrame: The same frame with the derived columns added
+    """
     # Add derived metrics
     daily_flights['operational_efficiency'] = (
         daily_flights['avg_air_time'] / daily_flights['avg_distance'] * 1000
@@ -53,11 +85,94 @@ def prepare_time_series_data(df):
     
     # Add day of week and other temporal features
     daily_flights['day_of_week'] = daily_flights.index.dayofweek
-    daily_flights['day_name'] = daily_flights.index.day_name()
+    daily_flights['day_name'] = WEEKDAY_NAMES[daily_flights['day_of_week'].to_numpy()]
     daily_flights['is_weekend'] = daily_flights['day_of_week'].isin([5, 6])
     
     return daily_flights
 
+def aggregate_daily_partials(df):
+    """
+    Aggregate flights into mergeable per-date sums, counts and sums of squares.
+    
+    Partials computed over disjoint sets of rows (shards, chunks, new
+    batches) combine with merge_daily_partials, and
+    finalize_daily_partials turns them into the prepare_time_series_data
+    table.
+    
+    Args:
+        df (pd.DataFrame): Flight rows
+        
+    Returns:
+        pd.DataFrame: Per-date partial aggregates indexed by fl_date
+    """
+    frame = df[['fl_date', 'origin', 'dep_time'] + DAILY_MEAN_COLUMNS]
+    frame = frame.assign(air_time_sq=df['air_time'] ** 2)
+    grouped = frame.groupby('fl_date')
+    
+    sums = grouped[DAILY_MEAN_COLUMNS + ['air_time_sq']].sum()
+    # Widen to 64 bits: a typed int8 'cancelled' would otherwise keep its dtype
+    # and wrap around once partials are added together
+    sums = sums.astype({col: 'int64' if pd.api.types.is_integer_dtype(dtype) else 'float64'
+                        for col, dtype in sums.dtypes.items()}).add_suffix('_sum')
+    counts = grouped[['origin', 'dep_time'] + DAILY_MEAN_COLUMNS].count().add_suffix('_count')
+    return sums.join(counts)
+
+def merge_daily_partials(partials):
+    """
+    Combine daily partials computed over disjoint rows.
+    
+    Args:
+        partials (list): DataFrames from aggregate_daily_partials
+        
+    Returns:
+        pd.DataFrame: Merged partials, one row per date
+    """
+    partials = [p for p in partials if p is not None and not p.empty]
+    if not partials:
+        return pd.DataFrame()
+    if len(partials) == 1:
+        return partials[0]
+    return pd.concat(partials).groupby(level='fl_date').sum()
+
+def finalize_daily_partials(partials):
+    """
+    Turn daily partials into the prepare_time_series_data table.
+    
+    Args:
+        partials (pd.DataFrame): Result of aggregate_daily_partials or
+            merge_daily_partials
+        
+    Returns:
+        pd.DataFrame: Daily aggregated time series data
+    """
+    def mean(col):
+        return partials[f'{col}_sum'] / partials[f'{col}_count']
+    
+    n = partials['air_time_count']
+    variance = (partials['air_time_sq_sum'] - partials['air_time_sum'] ** 2 / n) / (n - 1)
+    air_time_std = np.sqrt(variance.clip(lower=0)).where(n > 1)
+    
+    daily_flights = pd.DataFrame({
+        'flight_count': partials['origin_count'],
+        'cancellations_total': partials['cancelled_sum'],
+        'cancellation_rate': mean('cancelled'),
+        'departed_flights': partials['dep_time_count'],
+        'avg_air_time': mean('air_time'),
+        'air_time_std': air_time_std,
+        'avg_distance': mean('distance'),
+        'total_distance': partials['distance_sum'],
+        'weather_delay_total': partials['weather_delay_sum'],
+        'avg_weather_delay': mean('weather_delay'),
+        'late_delay_total': partials['late_aircraft_delay_sum'],
+        'avg_late_delay': mean('late_aircraft_delay'),
+        'avg_taxi_out': mean('taxi_out'),
+        'avg_taxi_in': mean('taxi_in')
+    }).round(2)
+    
+    return add_daily_features(daily_flights)
+
+@profiled()
+@memoized()
 def seasonal_decomposition_analysis(ts_data, column, model='additive', period=7):
     """
     Perform seasonal decomposition on a time series.
@@ -82,6 +197,7 @@ def seasonal_decomposition_analysis(ts_data, column, model='additive', period=7)
     series = ts_data[column].fillna(method='ffill').fillna(method='bfill')
     
     # Perform decomposition
+    from statsmodels.tsa.seasonal import seasonal_decompose
     decomposition = seasonal_decompose(
         series, 
         model=model, 
@@ -91,6 +207,7 @@ def seasonal_decomposition_analysis(ts_data, column, model='additive', period=7)
     
     return decomposition
 
+@profiled()
 def plot_seasonal_decomposition(decomposition, title="Seasonal Decomposition", figsize=(15, 12)):
     """
     Plot seasonal decomposition results.
@@ -100,6 +217,8 @@ def plot_seasonal_decomposition(decomposition, title="Seasonal Decomposition", f
         title (str): Plot title
         figsize (tuple): Figure size
     """
+    import matplotlib.pyplot as plt
+    
     fig, axes = plt.subplots(4, 1, figsize=figsize)
     
     # Original series
@@ -125,53 +244,132 @@ def plot_seasonal_decomposition(decomposition, title="Seasonal Decomposition", f
     plt.tight_layout()
     return fig
 
-def analyze_seasonal_patterns(ts_data, metrics=['flight_count', 'cancellation_rate', 'avg_air_time']):
+# Names used in result keys, titles and file names for common periods
+PERIOD_LABELS = {7: 'weekly', 30: 'monthly'}
+
+def period_label(period):
+    return PERIOD_LABELS.get(period, f'period{period}')
+
+def _use_agg_backend():
+    # Worker processes render off-screen only
+    import matplotlib.pyplot as plt
+    plt.switch_backend('Agg')
+
+def decompose_and_render(ts_data, metric, period=7, output_dir='outputs', show=False, cache=None):
+    """
+    Decompose one metric, measure its seasonal strength and save the figure.
+    
+    This is one unit of work for analyze_seasonal_patterns; it can run in a
+    worker process. Errors are returned rather than raised so one failing
+    metric does not abort the others.
+    
+    Args:
+        ts_data (pd.DataFrame): Time series data holding ``metric``
+        metric (str): Column to decompose
+        period (int): Seasonal period
+        output_dir (str): Directory for the PNG
+        show (bool): Call plt.show() instead of closing the figure
+        cache (chart_cache.ChartCache): Reuse the PNG when the decomposition
+            is unchanged
+        
+    Returns:
+        dict: 'metric', 'period', 'decomposition', 'seasonal_strength',
+        'trend_direction' and 'path', or 'metric', 'period' and 'error'
+    """
+    label = period_label(period)
+    try:
+        decomposition = seasonal_decomposition_analysis(ts_data, metric, period=period)
+        
+        # Calculate seasonal strength
+        seasonal_strength = 1 - (decomposition.resid.var() / 
+                                 (decomposition.seasonal + decomposition.resid).var())
+        trend = decomposition.trend.dropna()
+        trend_direction = 'Increasing' if trend.iloc[-1] > trend.iloc[0] else 'Decreasing'
+        
+        # Visualize
+        title = f'{metric.replace("_", " ").title()} - {label.title()} Patterns'
+        path = f'{output_dir}/seasonal_decomp_{metric}_{label}.png'
+        
+        def render():
+            import matplotlib.pyplot as plt
+            Path(output_dir).mkdir(parents=True, exist_ok=True)
+            fig = plot_seasonal_decomposition(decomposition, title=title)
+            with profile_stage('savefig'):
+                fig.savefig(path, dpi=300, bbox_inches='tight')
+            if show:
+                plt.show()
+            else:
+                plt.close(fig)
+        
+        if cache is None:
+            render()
+        else:
+            cache.render(chart_key(plot_seasonal_decomposition, decomposition, title=title, dpi=300), path, render)
+    except Exception as e:
+        return {'metric': metric, 'period': period, 'error': e}
+    
+    return {
+        'metric': metric,
+        'period': period,
+        'decomposition': decomposition,
+        'seasonal_strength': seasonal_strength,
+        'trend_direction': trend_direction,
+        'path': path
+    }
+
+def analyze_seasonal_patterns(ts_data, metrics=['flight_count', 'cancellation_rate', 'avg_air_time'],
+                              periods=(7,), workers=None, cache=None):
     """
     Analyze seasonal patterns for multiple metrics.
     
     Args:
         ts_data (pd.DataFrame): Time series data
         metrics (list): List of metrics to analyze
+        periods (tuple): Seasonal periods to decompose each metric with
+        workers (int): Decompose and render every metric/period pair in a
+            pool of this many processes (Agg backend, no plt.show()); None
+            runs them one after another in this process
+        cache (chart_cache.ChartCache): Reuse unchanged decomposition plots
         
     Returns:
         dict: Dictionary containing decomposition results and insights
     """
     results = {}
+    tasks = []
     
     for metric in metrics:
         if metric in ts_data.columns:
-            print(f"\n{'='*50}")
-            print(f"Analyzing Seasonal Patterns: {metric}")
-            print(f"{'='*50}")
-            
-            # Weekly patterns (period=7)
-            try:
-                weekly_decomp = seasonal_decomposition_analysis(ts_data, metric, period=7)
-                results[f'{metric}_weekly'] = weekly_decomp
-                
-                # Calculate seasonal strength
-                seasonal_strength = 1 - (weekly_decomp.resid.var() / 
-                                       (weekly_decomp.seasonal + weekly_decomp.resid).var())
-                
-                print(f"Weekly Seasonal Strength: {seasonal_strength:.3f}")
-                print(f"Trend Direction: {'Increasing' if weekly_decomp.trend.dropna().iloc[-1] > weekly_decomp.trend.dropna().iloc[0] else 'Decreasing'}")
-                
-                # Visualize
-                plot_seasonal_decomposition(
-                    weekly_decomp, 
-                    title=f'{metric.replace("_", " ").title()} - Weekly Patterns'
-                )
-                plt.savefig(f'outputs/seasonal_decomp_{metric}_weekly.png', dpi=300, bbox_inches='tight')
-                plt.show()
-                
-            except Exception as e:
-                print(f"Error in weekly decomposition for {metric}: {e}")
-        
+            tasks += [(metric, period) for period in periods]
         else:
             print(f"Warning: Column '{metric}' not found in data")
     
+    if workers is not None:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_use_agg_backend) as pool:
+            futures = [pool.submit(decompose_and_render, ts_data[[metric]], metric, period, cache=cache)
+                       for metric, period in tasks]
+            # Collected in submission order, so the report reads the same as a serial run
+            outcomes = (future.result() for future in futures)
+    else:
+        outcomes = (decompose_and_render(ts_data, metric, period, show=True, cache=cache)
+                    for metric, period in tasks)
+    
+    for outcome in outcomes:
+        metric, label = outcome['metric'], period_label(outcome['period'])
+        print(f"\n{'='*50}")
+        print(f"Analyzing Seasonal Patterns: {metric}" + (f" ({label})" if len(periods) > 1 else ""))
+        print(f"{'='*50}")
+        
+        if 'error' in outcome:
+            print(f"Error in {label} decomposition for {metric}: {outcome['error']}")
+            continue
+        
+        results[f'{metric}_{label}'] = outcome['decomposition']
+        print(f"{label.title()} Seasonal Strength: {outcome['seasonal_strength']:.3f}")
+        print(f"Trend Direction: {outcome['trend_direction']}")
+    
     return results
 
+@profiled()
 def day_of_week_analysis(ts_data):
     """
     Analyze day-of-week patterns in detail.
@@ -199,18 +397,26 @@ def day_of_week_analysis(ts_data):
     
     return dow_stats
 
-def plot_weekly_patterns(ts_data, figsize=(15, 10)):
+def plot_weekly_patterns(ts_data, figsize=(15, 10), cache=None):
     """
     Create comprehensive weekly pattern visualizations.
     
     Args:
         ts_data (pd.DataFrame): Time series data
         figsize (tuple): Figure size
+        cache (chart_cache.ChartCache): Reuse the PNG when the day-of-week
+            statistics are unchanged
     """
-    fig, axes = plt.subplots(2, 2, figsize=figsize)
-    
     # Day of week patterns
     dow_stats = day_of_week_analysis(ts_data)
+    path = 'outputs/weekly_patterns_analysis.png'
+    if cache is not None:
+        key = chart_key(plot_weekly_patterns, dow_stats, figsize=figsize)
+        if cache.fetch(key, path):
+            return dow_stats
+    
+    import matplotlib.pyplot as plt
+    fig, axes = plt.subplots(2, 2, figsize=figsize)
     
     # Flight count by day of week
     dow_stats['mean_flight_count'].plot(kind='bar', ax=axes[0,0], color='skyblue')
@@ -237,15 +443,26 @@ def plot_weekly_patterns(ts_data, figsize=(15, 10)):
     axes[1,1].tick_params(axis='x', rotation=45)
     
     plt.tight_layout()
-    plt.savefig('outputs/weekly_patterns_analysis.png', dpi=300, bbox_inches='tight')
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with profile_stage('savefig'):
+        plt.savefig(path, dpi=300, bbox_inches='tight')
     plt.show()
+    if cache is not None:
+        cache.store(key, path)
     
     return dow_stats
 
-def comprehensive_seasonal_analysis():
+def comprehensive_seasonal_analysis(ts_data=None, workers=None, cache=None):
     """
     Run complete seasonal decomposition analysis pipeline.
     
+    Args:
+        ts_data (pd.DataFrame): Prepared daily data, e.g. from
+            daily_rollup.DailyRollupStore.time_series(); loaded and prepared
+            from the raw flights when omitted
+        workers (int): Decompose and render the key metrics in parallel
+        cache (chart_cache.ChartCache): Reuse charts whose data is unchanged
+    
     Returns:
         dict: Complete analysis results
     """
@@ -254,8 +471,9 @@ def comprehensive_seasonal_analysis():
     
     # Load and prepare data
     print("1. Loading and preparing time series data...")
-    raw_data = load_flight_data()
-    ts_data = prepare_time_series_data(raw_data)
+    if ts_data is None:
+        raw_data = load_cached_flight_data(impute=False)
+        ts_data = prepare_time_series_data(raw_data)
     
     print(f"   ✓ Data prepared: {len(ts_data)} days from {ts_data.index.min().strftime('%Y-%m-%d')} to {ts_data.index.max().strftime('%Y-%m-%d')}")
     
@@ -266,11 +484,11 @@ def comprehensive_seasonal_analysis():
     # Analyze seasonal patterns
     print("\n3. Performing Seasonal Decomposition Analysis...")
     key_metrics = ['flight_count', 'cancellation_rate', 'avg_air_time', 'delay_intensity']
-    decomposition_results = analyze_seasonal_patterns(ts_data, key_metrics)
+    decomposition_results = analyze_seasonal_patterns(ts_data, key_metrics, workers=workers, cache=cache)
     
     # Day of week analysis
     print("\n4. Analyzing Day-of-Week Patterns...")
-    dow_patterns = plot_weekly_patterns(ts_data)
+    dow_patterns = plot_weekly_patterns(ts_data, cache=cache)
     print("\nDay of Week Statistics:")
     print(dow_patterns)
     
@@ -327,5 +545,5 @@ def generate_seasonal_insights(ts_data, decomposition_results):
 
 # Example usage and main execution
 if __name__ == "__main__":
-    # Run comprehensive analysis
-    results = comprehensive_seasonal_analysis()
\ No newline at end of file
+    # Run comprehensive analysis, reusing charts whose data is unchanged
+    results = comprehensive_seasonal_analysis(cache=ChartCache())
\ No newline at end of file